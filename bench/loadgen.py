@@ -0,0 +1,141 @@
+# bench/loadgen.py
+"""
+Load generation for the benchmark harness.
+
+Two load models:
+
+- closed loop: `concurrency` workers each send a request, wait for the answer
+  and send the next one. Throughput is whatever the system sustains, so this
+  measures capacity.
+- open loop: requests are sent at a fixed `rate` per second (Poisson arrivals),
+  whether or not earlier ones have finished. Latency is measured from the
+  moment each request was due, so time spent waiting for a free sender counts
+  too (no coordinated omission). This measures latency at a given load.
+
+Each request picks a service and a payload size from a Workload mix.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+
+class Workload:
+    """Weighted mix of services and payload sizes, sent to one target."""
+
+    def __init__(self, urls, services, sizes, seed=0):
+        self.urls = urls                # service -> URL (gateway route or the service's /process)
+        self.services = services        # service -> weight
+        self.sizes = sizes              # payload bytes -> weight
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._payloads = {size: {"input": "x" * size} for size in sizes}
+
+    def next(self):
+        """Return (service, size, url, payload) for the next request."""
+        with self._lock:
+            service = self._random.choices(list(self.services), weights=list(self.services.values()))[0]
+            size = self._random.choices(list(self.sizes), weights=list(self.sizes.values()))[0]
+        return service, size, self.urls[service], self._payloads[size]
+
+
+class Recorder:
+    """Collect per-request outcomes."""
+
+    def __init__(self):
+        self.samples = []  # (service, size, latency seconds, ok)
+        self._lock = threading.Lock()
+
+    def add(self, service, size, latency, ok):
+        with self._lock:
+            self.samples.append((service, size, latency, ok))
+
+
+_local = threading.local()
+
+
+def _session():
+    # One keep-alive session per sender thread.
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def send(workload, recorder, due=None, timeout=10):
+    """Send one request; latency counts from `due` (default: now)."""
+    service, size, url, payload = workload.next()
+    started = due if due is not None else time.perf_counter()
+    try:
+        response = _session().post(url, json=payload, timeout=timeout)
+        ok = response.status_code < 400
+    except requests.exceptions.RequestException:
+        ok = False
+    recorder.add(service, size, time.perf_counter() - started, ok)
+
+
+def closed_loop(workload, concurrency, duration, warmup=1.0):
+    """Run `concurrency` back-to-back senders for `duration` seconds."""
+    recorder = Recorder()
+    warmup_end = time.perf_counter() + warmup
+    end = warmup_end + duration
+
+    def worker():
+        while time.perf_counter() < warmup_end:
+            send(workload, Recorder())
+        while time.perf_counter() < end:
+            send(workload, recorder)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, duration
+
+
+def open_loop(workload, rate, duration, max_senders=256, warmup=1.0, seed=0):
+    """Send Poisson arrivals at `rate` requests per second for `duration` seconds."""
+    recorder = Recorder()
+    arrivals = random.Random(seed)
+    with ThreadPoolExecutor(max_senders) as pool:
+        for target, length in ((Recorder(), warmup), (recorder, duration)):
+            start = time.perf_counter()
+            due = start
+            while True:
+                due += arrivals.expovariate(rate)
+                if due - start >= length:
+                    break
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(send, workload, target, due)
+    return recorder, duration
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, int(round(pct / 100.0 * len(values))) - 1))
+    return values[index]
+
+
+def summarize(samples, duration):
+    """RPS, error rate and latency percentiles (milliseconds) of a set of samples."""
+    latencies = sorted(latency for _, _, latency, _ in samples)
+    errors = sum(1 for *_, ok in samples if not ok)
+    summary = {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "rps": round((len(samples) - errors) / duration, 1),
+        "latency_ms": None,
+    }
+    if latencies:
+        summary["latency_ms"] = {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2),
+            **{f"p{p}": round(percentile(latencies, p) * 1000, 2) for p in (50, 95, 99)},
+            "max": round(latencies[-1] * 1000, 2),
+        }
+    return summary
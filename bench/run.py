@@ -0,0 +1,245 @@
+# bench/run.py
+"""
+Benchmark the gateway and the services.
+
+    python -m bench.run --start --duration 10 --concurrency 1,8,32
+    python -m bench.run --load open --rate 100,400 --output bench.json
+    python -m bench.run --baseline bench.json       # exits 1 on a regression
+
+Every load level runs against the gateway (`/route/<service>`) and directly
+against each service's `/process`, so the difference between the two is the
+cost of the gateway hop. With --start the stack is launched through
+start_local.py for the run and stopped afterwards; otherwise it must already
+be running.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import signal
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+import requests
+from config import CONFIG, DATA_DIR
+from bench.loadgen import Workload, closed_loop, open_loop, summarize
+
+GATEWAY_URL = f"http://localhost:{CONFIG['GATEWAY_PORT']}"
+
+
+def service_urls(service):
+    """
+    The /process URLs of a service's replicas, as reached from this host
+    (none for a service embedded in the gateway).
+    """
+    cfg = CONFIG["SERVICE_CONFIG"][service]
+    if cfg["mode"] == "embedded":
+        return []
+    return [f"http://localhost:{cfg['port'] + i}/process" for i in range(max(1, cfg["replicas"]))]
+
+
+def target_urls(target, services):
+    """service -> URL for the gateway or for direct calls (first replica)."""
+    if target == "gateway":
+        return {s: f"{GATEWAY_URL}/route/{s}" for s in services}
+    return {s: service_urls(s)[0] for s in services}
+
+
+def wait_ready(services, timeout):
+    """Wait until the gateway and every service replica answer."""
+    urls = [f"{GATEWAY_URL}/ready"]
+    for service in services:
+        urls += [url.rsplit("/process", 1)[0] + "/ready" for url in service_urls(service)]
+    deadline = time.monotonic() + timeout
+    pending = list(urls)
+    while pending:
+        try:
+            if requests.get(pending[0], timeout=1).status_code == 200:
+                pending.pop(0)
+                continue
+        except requests.exceptions.RequestException:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Stack not ready after {timeout}s: {pending[0]}")
+        time.sleep(0.5)
+
+
+@contextmanager
+def local_stack(mode, services, timeout=60):
+    """Run start_local.py for the duration of the block (output in DATA_DIR/bench-stack.log)."""
+    log_path = os.path.join(DATA_DIR, "bench-stack.log")
+    with open(log_path, "w") as log:
+        proc = subprocess.Popen([sys.executable, "start_local.py", "--mode", mode],
+                                cwd=CONFIG["BASE_DIR"], stdout=log, stderr=subprocess.STDOUT)
+        try:
+            wait_ready(services, timeout)
+            yield
+        finally:
+            proc.send_signal(signal.SIGINT)
+            try:
+                proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def parse_weights(value, key=str):
+    """Parse "a=3,b=1" (weight defaults to 1) into {key(a): 3.0, key(b): 1.0}."""
+    weights = {}
+    for item in value.split(","):
+        name, _, weight = item.strip().partition("=")
+        weights[key(name)] = float(weight or 1)
+    return weights
+
+
+def run_scenarios(args, services, sizes):
+    results = []
+    levels = args.concurrency if args.load == "closed" else args.rate
+    targets = list(args.targets)
+    embedded = [s for s in services if not service_urls(s)]
+    if "direct" in targets and embedded:
+        # Embedded services have no /process of their own to call directly.
+        print(f"⚠️ Direct scenarios not applicable, embedded in the gateway: {', '.join(embedded)}")
+        targets.remove("direct")
+    for level in levels:
+        for target in targets:
+            workload = Workload(target_urls(target, services), services, sizes, seed=args.seed)
+            if args.load == "closed":
+                recorder, duration = closed_loop(workload, int(level), args.duration, args.warmup)
+            else:
+                recorder, duration = open_loop(workload, level, args.duration, args.max_senders, args.warmup, args.seed)
+            result = {
+                "name": f"{target}/{args.load}-{level:g}",
+                "target": target,
+                "load": args.load,
+                "level": level,
+                **summarize(recorder.samples, duration),
+                "by_service": {s: summarize([x for x in recorder.samples if x[0] == s], duration) for s in services},
+                "by_size": {str(n): summarize([x for x in recorder.samples if x[1] == n], duration) for n in sizes},
+            }
+            results.append(result)
+            print_result(result)
+    return results
+
+
+def hop_overhead(results):
+    """Gateway minus direct latency (ms) for each load level run against both."""
+    by_name = {r["name"]: r for r in results}
+    overhead = {}
+    for result in results:
+        if result["target"] != "gateway":
+            continue
+        direct = by_name.get(result["name"].replace("gateway/", "direct/", 1))
+        if direct and result["latency_ms"] and direct["latency_ms"]:
+            overhead[f"{result['load']}-{result['level']:g}"] = {
+                p: round(result["latency_ms"][p] - direct["latency_ms"][p], 2) for p in ("p50", "p95", "p99")
+            }
+    return overhead
+
+
+def compare(results, baseline, tolerance):
+    """Print changes against a baseline; return the names of regressed scenarios."""
+    previous = {r["name"]: r for r in baseline["results"]}
+    regressions = []
+    print(f"\nAgainst baseline ({baseline['meta'].get('commit')}, {baseline['meta'].get('timestamp')}):")
+    for result in results:
+        before = previous.get(result["name"])
+        if before is None or not before["latency_ms"] or not result["latency_ms"]:
+            continue
+        rps_change = (result["rps"] - before["rps"]) / before["rps"] if before["rps"] else 0.0
+        p95_before = before["latency_ms"]["p95"]
+        p95_change = (result["latency_ms"]["p95"] - p95_before) / p95_before if p95_before else 0.0
+        regressed = (rps_change < -tolerance or p95_change > tolerance
+                     or result["error_rate"] > before["error_rate"] + 0.01)
+        if regressed:
+            regressions.append(result["name"])
+        print(f"  {result['name']:<22} rps {rps_change:+7.1%}  p95 {p95_change:+7.1%}  "
+              f"errors {before['error_rate']:.2%} -> {result['error_rate']:.2%}"
+              f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def print_result(result):
+    latency = result["latency_ms"] or {}
+    print(f"{result['name']:<22} {result['rps']:>9.1f} rps  p50 {latency.get('p50', 0):>8.2f}  "
+          f"p95 {latency.get('p95', 0):>8.2f}  p99 {latency.get('p99', 0):>8.2f} ms  "
+          f"errors {result['error_rate']:.2%}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=CONFIG["BASE_DIR"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API Hub gateway and services.")
+    parser.add_argument("--start", action="store_true", help="Start the stack with start_local.py for the run")
+    parser.add_argument("--mode", choices=["development", "production"], default=CONFIG["SERVING_MODE"],
+                        help="Serving mode used with --start")
+    parser.add_argument("--load", choices=["closed", "open"], default="closed",
+                        help="closed: fixed concurrency; open: fixed arrival rate")
+    parser.add_argument("--concurrency", default="1,8,32", help="Closed-loop concurrency levels")
+    parser.add_argument("--rate", default="50,200", help="Open-loop rates (requests per second)")
+    parser.add_argument("--max-senders", type=int, default=256, help="Open-loop sender threads")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds measured per scenario")
+    parser.add_argument("--warmup", type=float, default=1, help="Unmeasured seconds before each scenario")
+    parser.add_argument("--services", default=",".join(CONFIG["SERVICES_LIST"]),
+                        help="Service mix, e.g. service1=3,service2=1")
+    parser.add_argument("--sizes", default="16=8,1024=2,65536=1",
+                        help="Payload size mix in bytes, e.g. 16=8,65536=1")
+    parser.add_argument("--targets", default="gateway,direct", help="gateway, direct or both")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against a previous --output file")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Allowed relative drop in RPS / rise in p95 before a scenario counts as regressed")
+    args = parser.parse_args()
+    args.concurrency = [float(c) for c in args.concurrency.split(",")]
+    args.rate = [float(r) for r in args.rate.split(",")]
+    args.targets = [t.strip() for t in args.targets.split(",")]
+    services = parse_weights(args.services)
+    sizes = parse_weights(args.sizes, key=int)
+    unknown = [s for s in services if s not in CONFIG["SERVICE_CONFIG"]]
+    if unknown:
+        sys.exit(f"❌ Unknown services: {', '.join(unknown)}")
+
+    meta = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "serving_mode": args.mode if args.start else CONFIG["SERVING_MODE"],
+        "gateway_engine": CONFIG["GATEWAY_ENGINE"],
+        "duration": args.duration,
+        "services": services,
+        "sizes": {str(n): w for n, w in sizes.items()},
+    }
+    if args.start:
+        with local_stack(args.mode, services):
+            results = run_scenarios(args, services, sizes)
+    else:
+        wait_ready(services, timeout=5)
+        results = run_scenarios(args, services, sizes)
+
+    report = {"meta": meta, "results": results, "hop_overhead": hop_overhead(results)}
+    if report["hop_overhead"]:
+        print("\nGateway hop overhead (ms):")
+        for level, overhead in report["hop_overhead"].items():
+            print(f"  {level:<12} " + "  ".join(f"{p} {v:+.2f}" for p, v in overhead.items()))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            sys.exit(f"❌ Regressions: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,403 @@
 import requests
 import logging
+import random
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from client.wire import ACCEPT_ENCODING, NDJSON, SSE, TRACEPARENT, iter_events, parse_server_timing, start_trace
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
-class APIClient:
+
+class APIError(Exception):
     """
-    A Python client to interact with API Hub's microservices via the Gateway.
+    A failed call. `status` is the HTTP status (None when no response
+    arrived) and `payload` the decoded error body, if any.
     """
-    def __init__(self, gateway_url="http://localhost:5001"):
+    transient = False  # worth retrying
+
+    def __init__(self, service, message, status=None, payload=None, retry_after=None):
+        super().__init__(f"{service}: {message}" + (f" (HTTP {status})" if status else ""))
+        self.service = service
+        self.message = message
+        self.status = status
+        self.payload = payload
+        self.retry_after = retry_after
+
+
+class ServiceNotFound(APIError):
+    """The gateway does not know the service (404)."""
+
+
+class BadRequest(APIError):
+    """The request was rejected as invalid (other 4xx answers)."""
+
+
+class ServiceOverloaded(APIError):
+    """The gateway shed the request (429); `retry_after` is in seconds."""
+    transient = True
+
+
+class ServiceUnavailable(APIError):
+    """The service failed or could not be reached (5xx, connection errors)."""
+    transient = True
+
+
+class RequestTimeout(APIError):
+    """No answer within the client's timeout."""
+    transient = True
+
+
+def error_from_response(service, status, payload=None, headers=None):
+    """Build the typed error for an HTTP error answer."""
+    message = payload.get("error") if isinstance(payload, dict) else None
+    retry_after = (headers or {}).get("Retry-After")
+    retry_after = float(retry_after) if retry_after and retry_after.isdigit() else None
+    if status == 404:
+        cls = ServiceNotFound
+    elif status == 429:
+        cls = ServiceOverloaded
+    elif status >= 500:
+        cls = ServiceUnavailable
+    else:
+        cls = BadRequest
+    return cls(service, message or f"HTTP {status}", status, payload, retry_after)
+
+
+def _json_or_none(response):
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+
+class RetryPolicy:
+    """
+    Retry transient errors (overload, 5xx, connection errors, timeouts) up to
+    `retries` times, sleeping a random time up to an exponentially growing
+    cap (full jitter) between attempts, or the server's Retry-After if longer.
+    """
+
+    def __init__(self, retries=2, backoff=0.1, max_backoff=5.0):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def delay(self, attempt, error):
+        """Seconds to wait before retry number `attempt` (1-based)."""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+        if error.retry_after:
+            delay = max(delay, min(error.retry_after, self.max_backoff))
+        return delay
+
+
+def bounded_map(fn, inputs, concurrency, ordered=True, return_exceptions=False):
+    """
+    Apply `fn` to `inputs` from a thread pool with at most `concurrency` calls
+    in flight, yielding results in input order, or as (index, result) pairs in
+    completion order when `ordered` is false. Inputs are consumed lazily. With
+    `return_exceptions`, an APIError is yielded in place of its result instead
+    of being raised.
+    """
+    def outcome(future):
+        try:
+            return future.result()
+        except APIError as e:
+            if return_exceptions:
+                return e
+            raise
+
+    items = enumerate(inputs)
+    in_flight = deque() if ordered else {}
+    with ThreadPoolExecutor(concurrency) as pool:
+        def fill():
+            while len(in_flight) < concurrency:
+                item = next(items, None)
+                if item is None:
+                    return
+                future = pool.submit(fn, item[1])
+                if ordered:
+                    in_flight.append(future)
+                else:
+                    in_flight[future] = item[0]
+
+        try:
+            fill()
+            while in_flight:
+                if ordered:
+                    future = in_flight.popleft()
+                    result = outcome(future)
+                    fill()
+                    yield result
+                    continue
+                done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = in_flight.pop(future)
+                    result = outcome(future)
+                    fill()
+                    yield index, result
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+
+class _ClientBase:
+    """Settings, tracing and timing shared by APIClient and AsyncAPIClient."""
+
+    def __init__(self, gateway_url, batch_size, trace_sample_rate, timeout, retries, backoff, max_connections,
+                 accept_encoding):
         self.gateway_url = gateway_url
-    
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.retry = RetryPolicy(retries, backoff)
+        # Content codings answers may use (None = every codec this client can decode).
+        self.accept_encoding = ACCEPT_ENCODING if accept_encoding is None else accept_encoding
+        # Share of calls that start a recorded trace (None = TRACE_SAMPLE_RATE).
+        self.trace_sample_rate = trace_sample_rate
+        # Latency breakdown of the last call, in seconds (see `timing`).
+        self.last_timing = None
+        # Trace ID of the last call, to find its spans in the gateway and services.
+        self.last_trace_id = None
+
+    @contextmanager
+    def traced(self, name):
+        """
+        Start a trace for a call; yields the headers that carry its trace
+        context (`traceparent`) to the gateway, which records the spans.
+        """
+        self.last_trace_id, traceparent = start_trace(self.trace_sample_rate)
+        yield {TRACEPARENT: traceparent}
+
+    def timing(self, response):
+        """
+        Break a gateway response's latency down into phases.
+
+        Combines the gateway's Server-Timing header (total, gateway, upstream,
+        service) with the client-side round trip; "network" is the part of the
+        round trip spent outside the gateway.
+        """
+        phases = parse_server_timing(response.headers.get("Server-Timing"))
+        round_trip = response.elapsed.total_seconds()
+        phases["client"] = round_trip
+        if "total" in phases:
+            phases["network"] = max(0.0, round_trip - phases["total"])
+        self.last_timing = phases
+        return phases
+
+    def _retry_or_raise(self, error, attempt):
+        """Return the delay before the next attempt, or raise `error` if there is none."""
+        if not error.transient or attempt >= self.retry.retries:
+            raise error
+        delay = self.retry.delay(attempt + 1, error)
+        logger.warning(f"Retrying {error.service} in {delay:.2f}s (attempt {attempt + 1}): {error}")
+        return delay
+
+
+class APIClient(_ClientBase):
+    """
+    A Python client to interact with API Hub's microservices via the Gateway.
+
+    Calls share one keep-alive connection pool (up to `max_connections`
+    connections), so the client can be used from many threads at once.
+    Transient failures are retried `retries` times with jittered exponential
+    backoff; anything else raises an APIError subclass. Large answers come
+    compressed with a codec from `accept_encoding` ("identity" turns that off).
+    """
+    def __init__(self, gateway_url="http://localhost:5001", batch_size=256, trace_sample_rate=None,
+                 timeout=5, retries=2, backoff=0.1, max_connections=32, accept_encoding=None):
+        super().__init__(gateway_url, batch_size, trace_sample_rate, timeout, retries, backoff, max_connections,
+                         accept_encoding)
+        self.session = requests.Session()
+        self.session.headers["Accept-Encoding"] = self.accept_encoding
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _post(self, operation, service_name, path="", headers=None, **kwargs):
+        """POST to the gateway with retries; returns the response or raises APIError."""
+        url = f"{self.gateway_url}/route/{service_name}{path}"
+        with self.traced(f"{operation} {service_name}") as trace_headers:
+            headers = {**(headers or {}), **trace_headers}
+            attempt = 0
+            while True:
+                try:
+                    response = self.session.post(url, headers=headers, timeout=self.timeout, **kwargs)
+                except requests.exceptions.Timeout as e:
+                    error = RequestTimeout(service_name, str(e))
+                except requests.exceptions.RequestException as e:
+                    error = ServiceUnavailable(service_name, str(e))
+                else:
+                    if response.status_code < 400:
+                        self.timing(response)
+                        return response
+                    error = error_from_response(service_name, response.status_code,
+                                                _json_or_none(response), response.headers)
+                time.sleep(self._retry_or_raise(error, attempt))
+                attempt += 1
+
     def call_service(self, service_name, input_data):
-        url = f"{self.gateway_url}/route/{service_name}"
-        try:
-            response = requests.post(url, json={"input": input_data}, timeout=5)
-            response.raise_for_status()
-            logger.info(f"Success: {response.json()}")
+        response = self._post("call_service", service_name, json={"input": input_data})
+        logger.debug(f"Success: {service_name}")
+        return response.json()
+
+    def stream(self, service_name, input_data, ndjson=False):
+        """
+        Call a service in streaming mode and iterate over its partial outputs
+        as they arrive (server-sent events, or NDJSON with `ndjson=True`).
+
+        Opening the stream is retried like any call; an error reported by the
+        service mid-stream raises ServiceUnavailable from the iterator.
+        """
+        mimetype = NDJSON if ndjson else SSE
+        response = self._post("stream", service_name, json={"input": input_data},
+                              headers={"Accept": mimetype}, stream=True)
+
+        def outputs():
+            with response:
+                for payload in iter_events(response.iter_lines(chunk_size=None), mimetype):
+                    if "error" in payload:
+                        raise ServiceUnavailable(service_name, payload["error"], payload=payload)
+                    yield payload["output"]
+        return outputs()
+
+    def map(self, service_name, inputs, concurrency=8, ordered=True, return_exceptions=False):
+        """
+        Call a service once per input with at most `concurrency` calls in
+        flight, yielding each output (the "output" field) as it is ready.
+
+        Outputs come in input order, or as (index, output) pairs in completion
+        order when `ordered` is false. With `return_exceptions`, a failed input
+        yields its APIError instead of stopping the iteration.
+        """
+        def call(item):
+            return self.call_service(service_name, item)["output"]
+        return bounded_map(call, inputs, concurrency, ordered, return_exceptions)
+
+    def call_service_array(self, service_name, array):
+        """
+        Send a NumPy array to a service as raw `.npy` bytes.
+
+        Returns an ndarray when the service answers with an array, otherwise
+        the decoded JSON response.
+        """
+        from common.arrays import decode_array, encode_array
+
+        body, headers = encode_array(array)
+        response = self._post("call_service_array", service_name, data=body, headers=headers)
+        mimetype = response.headers.get("Content-Type", "").split(";")[0].strip()
+        if mimetype == "application/json":
             return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to connect to {service_name}: {e}")
-            return {"error": "Service unavailable"}
\ No newline at end of file
+        return decode_array(response.content, mimetype, response.headers)
+
+    def put_array(self, array, ttl=None):
+        """
+        Write an array into the shared object store and return its ID.
+
+        The caller holds one reference; call `release_array` when done, or let
+        the TTL clean it up. Requires access to the shared DATA_DIR volume.
+        """
+        from common.objstore import get_store
+
+        return get_store().put(array, ttl=ttl)
+
+    def open_array(self, ref):
+        """Open an object-store array memory-mapped (read-only)."""
+        from common.objstore import get_store
+
+        return get_store().open(ref)
+
+    def release_array(self, ref):
+        """Drop a reference to an object-store array."""
+        from common.objstore import get_store
+
+        return get_store().release(ref)
+
+    def call_service_ref(self, service_name, ref):
+        """Call a service with an object-store ID instead of the array itself."""
+        response = self._post("call_service_ref", service_name, json={"input_ref": ref})
+        logger.debug(f"Success: {service_name}")
+        return response.json()
+
+    def submit_job(self, service_name, input_data, path=""):
+        """
+        Queue a call as an asynchronous gateway job (for calls longer than
+        the client timeout) and return its ID; see `wait_job`.
+        """
+        body = {"inputs": input_data} if path == "/batch" else {"input": input_data}
+        with self.traced(f"submit_job {service_name}") as trace_headers:
+            try:
+                response = self.session.post(f"{self.gateway_url}/jobs/{service_name}{path}", json=body,
+                                             headers=trace_headers, timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                raise ServiceUnavailable(service_name, str(e))
+        if response.status_code >= 400:
+            raise error_from_response(service_name, response.status_code, _json_or_none(response), response.headers)
+        return response.json()["id"]
+
+    def wait_job(self, job_id, timeout=300, poll=30):
+        """
+        Long-poll a job until it finishes (at most `timeout` seconds) and
+        return its result: the decoded JSON answer, or an ndarray for array
+        answers. A failed or cancelled job raises the matching APIError.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            wait_for = max(0.0, min(poll, deadline - time.monotonic()))
+            try:
+                response = self.session.get(f"{self.gateway_url}/jobs/{job_id}", params={"wait": wait_for},
+                                            timeout=self.timeout + wait_for)
+            except requests.exceptions.RequestException as e:
+                raise ServiceUnavailable("jobs", str(e))
+            if response.status_code >= 400:
+                raise error_from_response("jobs", response.status_code, _json_or_none(response), response.headers)
+            job = response.json()
+            if job["status"] in ("done", "failed", "cancelled"):
+                break
+            if time.monotonic() >= deadline:
+                raise RequestTimeout(job["service"], f"job {job_id} still {job['status']} after {timeout}s")
+
+        if job["status"] == "cancelled":
+            raise BadRequest(job["service"], "Job cancelled", 409)
+        if job["status"] == "failed":
+            # Records failed by the gateway itself may carry no status code.
+            raise error_from_response(job["service"], job.get("status_code") or 502, job.get("result"))
+        if "result" in job:
+            return job["result"]
+        from common.arrays import decode_array
+
+        response = self.session.get(self.gateway_url + job["result_url"], timeout=self.timeout)
+        mimetype = response.headers.get("Content-Type", "").split(";")[0].strip()
+        return decode_array(response.content, mimetype, response.headers)
+
+    def call_service_batch(self, service_name, inputs, batch_size=None, concurrency=1):
+        """
+        Process a list of inputs through a service's batch endpoint.
+
+        Large lists are split into chunks of `batch_size` (one round trip
+        per chunk, up to `concurrency` at once) and the outputs are
+        concatenated in input order.
+        """
+        batch_size = batch_size or self.batch_size
+        chunks = (inputs[start:start + batch_size] for start in range(0, len(inputs), batch_size))
+
+        def send(chunk):
+            return self._post("call_service_batch", service_name, "/batch", json={"inputs": chunk}).json()["outputs"]
+
+        outputs = []
+        for chunk_outputs in bounded_map(send, chunks, concurrency):
+            outputs.extend(chunk_outputs)
+        logger.info(f"Success: {len(outputs)} outputs from {service_name}")
+        return {"service": service_name, "outputs": outputs}
@@ -0,0 +1,165 @@
+"""
+Asyncio client for API Hub, built on httpx.
+
+    async with AsyncAPIClient() as client:
+        result = await client.call_service("service1", "Hello")
+        async for output in client.map("service1", inputs, concurrency=64):
+            ...
+
+Same contract as APIClient: one pooled connection set, retries of transient
+failures with jittered backoff, and APIError subclasses for everything else.
+"""
+import asyncio
+import httpx
+from client.api_client import (
+    APIError, RequestTimeout, ServiceUnavailable, _ClientBase, _json_or_none, error_from_response, logger,
+)
+from client.wire import NDJSON, SSE, EventParser
+
+
+async def bounded_map(fn, inputs, concurrency, ordered=True, return_exceptions=False):
+    """
+    Async counterpart of api_client.bounded_map: run coroutine function `fn`
+    over `inputs` with at most `concurrency` calls in flight.
+    """
+    async def outcome(task):
+        try:
+            return await task
+        except APIError as e:
+            if return_exceptions:
+                return e
+            raise
+
+    items = enumerate(inputs)
+    in_flight = {}  # task -> input index, in submission order
+
+    def fill():
+        while len(in_flight) < concurrency:
+            item = next(items, None)
+            if item is None:
+                return
+            in_flight[asyncio.ensure_future(fn(item[1]))] = item[0]
+
+    try:
+        fill()
+        while in_flight:
+            if ordered:
+                task = next(iter(in_flight))
+                del in_flight[task]
+                result = await outcome(task)
+                fill()
+                yield result
+                continue
+            done, _ = await asyncio.wait(list(in_flight), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = in_flight.pop(task)
+                result = await outcome(task)
+                fill()
+                yield index, result
+    finally:
+        for task in in_flight:
+            task.cancel()
+
+
+class AsyncAPIClient(_ClientBase):
+    """Non-blocking API Hub client; use as an async context manager or call `aclose`."""
+
+    def __init__(self, gateway_url="http://localhost:5001", batch_size=256, trace_sample_rate=None,
+                 timeout=5, retries=2, backoff=0.1, max_connections=100, accept_encoding=None):
+        super().__init__(gateway_url, batch_size, trace_sample_rate, timeout, retries, backoff, max_connections,
+                         accept_encoding)
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+            headers={"Accept-Encoding": self.accept_encoding},
+        )
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def _post(self, operation, service_name, path="", headers=None, stream=False, **kwargs):
+        """
+        POST to the gateway with retries; returns the response or raises
+        APIError. With `stream` the response body is left unread.
+        """
+        url = f"{self.gateway_url}/route/{service_name}{path}"
+        with self.traced(f"{operation} {service_name}") as trace_headers:
+            headers = {**(headers or {}), **trace_headers}
+            attempt = 0
+            while True:
+                try:
+                    if stream:
+                        request = self.client.build_request("POST", url, headers=headers, **kwargs)
+                        response = await self.client.send(request, stream=True)
+                    else:
+                        response = await self.client.post(url, headers=headers, **kwargs)
+                except httpx.TimeoutException as e:
+                    error = RequestTimeout(service_name, str(e) or "timed out")
+                except httpx.HTTPError as e:
+                    error = ServiceUnavailable(service_name, str(e) or type(e).__name__)
+                else:
+                    if response.status_code < 400:
+                        if not stream:  # a streamed response has no timing until it is read
+                            self.timing(response)
+                        return response
+                    if stream:
+                        await response.aread()
+                    error = error_from_response(service_name, response.status_code,
+                                                _json_or_none(response), response.headers)
+                await asyncio.sleep(self._retry_or_raise(error, attempt))
+                attempt += 1
+
+    async def call_service(self, service_name, input_data):
+        response = await self._post("call_service", service_name, json={"input": input_data})
+        logger.debug(f"Success: {service_name}")
+        return response.json()
+
+    async def stream(self, service_name, input_data, ndjson=False):
+        """Async iterator over a streamed call's partial outputs; see APIClient.stream."""
+        mimetype = NDJSON if ndjson else SSE
+        response = await self._post("stream", service_name, json={"input": input_data},
+                                    headers={"Accept": mimetype}, stream=True)
+
+        async def outputs():
+            parser = EventParser(mimetype)
+            try:
+                async for line in response.aiter_lines():
+                    payload = parser.feed(line)
+                    if payload is None:
+                        continue
+                    if "error" in payload:
+                        raise ServiceUnavailable(service_name, payload["error"], payload=payload)
+                    yield payload["output"]
+            finally:
+                await response.aclose()
+        return outputs()
+
+    def map(self, service_name, inputs, concurrency=32, ordered=True, return_exceptions=False):
+        """
+        Async iterator over one call per input, with at most `concurrency` in
+        flight; see APIClient.map for the ordering and error options.
+        """
+        async def call(item):
+            return (await self.call_service(service_name, item))["output"]
+        return bounded_map(call, inputs, concurrency, ordered, return_exceptions)
+
+    async def call_service_batch(self, service_name, inputs, batch_size=None, concurrency=4):
+        """Process a list of inputs through the batch endpoint, `concurrency` chunks at a time."""
+        batch_size = batch_size or self.batch_size
+        chunks = (inputs[start:start + batch_size] for start in range(0, len(inputs), batch_size))
+
+        async def send(chunk):
+            response = await self._post("call_service_batch", service_name, "/batch", json={"inputs": chunk})
+            return response.json()["outputs"]
+
+        outputs = []
+        async for chunk_outputs in bounded_map(send, chunks, concurrency):
+            outputs.extend(chunk_outputs)
+        logger.info(f"Success: {len(outputs)} outputs from {service_name}")
+        return {"service": service_name, "outputs": outputs}
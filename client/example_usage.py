@@ -1,4 +1,4 @@
-from api_client import APIClient
+from client.api_client import APIClient, APIError
 
 client = APIClient()  # -> calls http://localhost:5001 by default
 
@@ -12,4 +12,14 @@ print("Service 2 Response:", response2)
 
 # Call Service 3
 response3 = client.call_service("service3", "Another Another test input")
-print("Service 2 Response:", response3)
\ No newline at end of file
+print("Service 3 Response:", response3)
+
+# Many inputs, 8 calls in flight at a time, outputs in input order
+outputs = list(client.map("service1", [f"input {i}" for i in range(100)], concurrency=8))
+print("Mapped outputs:", outputs[:3], "...")
+
+# Failures raise typed errors
+try:
+    client.call_service("no_such_service", "???")
+except APIError as e:
+    print("Error:", type(e).__name__, e)
@@ -0,0 +1,101 @@
+# client/wire.py
+"""
+The parts of the gateway's wire protocol the client needs: accepted content
+codings, `traceparent` propagation, Server-Timing parsing and the SSE / NDJSON
+stream format.
+
+They mirror common/compression.py, common/tracing.py, common/metrics.py and
+common/streaming.py, which belong to the server tree (and mostly load its
+config); copies here keep the client usable without that tree or its `.env`.
+"""
+import json
+import os
+import random
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# What this client can decode (requests and httpx use the same packages).
+ACCEPT_ENCODING = ", ".join(["gzip", "deflate"] + (["br"] if brotli else []) + (["zstd"] if zstandard else []))
+
+TRACEPARENT = "traceparent"
+
+SSE = "text/event-stream"
+NDJSON = "application/x-ndjson"
+
+
+def start_trace(sample_rate=None):
+    """
+    Start a trace for one call; returns (trace_id, traceparent header value).
+    Whether it is recorded downstream is decided here, with probability
+    `sample_rate` (None = the TRACE_SAMPLE_RATE environment variable, or 0.01).
+    """
+    if sample_rate is None:
+        sample_rate = float(os.environ.get("TRACE_SAMPLE_RATE", "0.01"))
+    trace_id = os.urandom(16).hex()
+    sampled = random.random() < sample_rate
+    return trace_id, f"00-{trace_id}-{os.urandom(8).hex()}-{'01' if sampled else '00'}"
+
+
+def parse_server_timing(header):
+    """Parse a Server-Timing header into {name: seconds}."""
+    phases = {}
+    for entry in (header or "").split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur":
+                try:
+                    phases[name] = float(value) / 1000.0
+                except ValueError:
+                    pass
+    return phases
+
+
+class EventParser:
+    """
+    Incremental stream parser: feed it the lines of a stream (str or bytes,
+    without line endings) and it returns each complete JSON payload, or None
+    while an event is still incomplete.
+    """
+
+    def __init__(self, mimetype):
+        self.mimetype = mimetype
+        self._data = []
+
+    def feed(self, line):
+        if isinstance(line, bytes):
+            line = line.decode()
+        if self.mimetype == NDJSON:
+            return json.loads(line) if line.strip() else None
+        if line.startswith("data:"):
+            self._data.append(line[5:].strip())
+        elif not line and self._data:
+            return self.close()
+        return None
+
+    def close(self):
+        """Return the last, unterminated SSE event if there is one."""
+        if not self._data:
+            return None
+        payload = json.loads("\n".join(self._data))
+        self._data = []
+        return payload
+
+
+def iter_events(lines, mimetype):
+    """Parse an iterable of stream lines into JSON payloads."""
+    parser = EventParser(mimetype)
+    for line in lines:
+        payload = parser.feed(line)
+        if payload is not None:
+            yield payload
+    payload = parser.close()
+    if payload is not None:
+        yield payload
@@ -0,0 +1,117 @@
+# common/arrays.py
+"""
+Binary array payloads.
+
+Arrays travel as raw bytes instead of base64/JSON lists:
+
+- `application/x-npy`: a NumPy `.npy` file (header + raw data).
+- `application/octet-stream`: raw data described by the `X-Array-Dtype` and
+  `X-Array-Shape` headers (e.g. "float32" and "3,224,224").
+- `image/*`: encoded image bytes, decoded with PIL.
+
+Decoding uses `np.frombuffer` on the request body, so `.npy` and raw tensors are
+read without copying; the resulting arrays are read-only views of the body.
+NumPy (and PIL, for images) are imported on first use, so importing this
+module does not slow down a service's start.
+"""
+import io
+
+NPY_CONTENT_TYPE = "application/x-npy"
+RAW_CONTENT_TYPE = "application/octet-stream"
+DTYPE_HEADER = "X-Array-Dtype"
+SHAPE_HEADER = "X-Array-Shape"
+
+# Headers the gateway forwards unchanged on the binary path.
+ARRAY_HEADERS = ("Content-Type", DTYPE_HEADER, SHAPE_HEADER)
+
+
+def is_binary(mimetype):
+    """True for the content types handled by decode_array."""
+    return mimetype in (NPY_CONTENT_TYPE, RAW_CONTENT_TYPE) or mimetype.startswith("image/")
+
+
+def _parse_shape(value):
+    try:
+        return tuple(int(dim) for dim in value.split(",") if dim.strip()) if value else (-1,)
+    except ValueError:
+        raise ValueError(f"Invalid {SHAPE_HEADER}: {value!r}") from None
+
+
+def _parse_dtype(value):
+    import numpy as np
+
+    try:
+        dtype = np.dtype(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {DTYPE_HEADER}: {value!r}") from None
+    _check_dtype(dtype)
+    return dtype
+
+
+def _check_dtype(dtype):
+    # Object arrays would have to be unpickled: never accepted from a request.
+    if dtype.hasobject:
+        raise ValueError(f"Unsupported array dtype: {dtype}")
+
+
+def decode_array(body, mimetype, headers=None):
+    """
+    Turn a binary body into an ndarray.
+
+    :param body: The raw body (bytes, bytearray or memoryview).
+    :param mimetype: The body's content type without parameters.
+    :param headers: Mapping holding X-Array-Dtype / X-Array-Shape for raw bodies.
+    """
+    import numpy as np
+
+    headers = headers or {}
+    if mimetype == NPY_CONTENT_TYPE:
+        stream = io.BytesIO(body)
+        version = np.lib.format.read_magic(stream)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+        elif version == (2, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+        else:
+            raise ValueError(f"Unsupported .npy format version: {version}")
+        _check_dtype(dtype)
+        count = int(np.prod(shape)) if shape else 1
+        array = np.frombuffer(body, dtype=dtype, count=count, offset=stream.tell())
+        return array.reshape(shape, order="F" if fortran_order else "C")
+    if mimetype == RAW_CONTENT_TYPE:
+        dtype = _parse_dtype(headers.get(DTYPE_HEADER, "uint8"))
+        return np.frombuffer(body, dtype=dtype).reshape(_parse_shape(headers.get(SHAPE_HEADER)))
+    if mimetype.startswith("image/"):
+        from PIL import Image
+        return np.asarray(Image.open(io.BytesIO(body)))
+    raise ValueError(f"Unsupported array content type: {mimetype}")
+
+
+def encode_array(array):
+    """Return (body, headers) encoding an array as `.npy`."""
+    import numpy as np
+
+    array = np.asarray(array)
+    if not (array.flags.c_contiguous or array.flags.f_contiguous):
+        array = np.ascontiguousarray(array)
+    fortran_order = array.flags.f_contiguous and not array.flags.c_contiguous
+    header = io.BytesIO()
+    np.lib.format.write_array_header_1_0(
+        header, {"descr": np.lib.format.dtype_to_descr(array.dtype),
+                 "fortran_order": fortran_order, "shape": array.shape}
+    )
+    body = header.getvalue() + array.tobytes(order="F" if fortran_order else "C")
+    return body, {"Content-Type": NPY_CONTENT_TYPE}
+
+
+def array_from_request(request):
+    """Decode the body of a Flask request into an ndarray without extra copies."""
+    return decode_array(request.get_data(cache=False), request.mimetype, request.headers)
+
+
+def array_response(array, status=200):
+    """Build a Flask response carrying an array as `.npy`."""
+    from flask import Response
+
+    body, headers = encode_array(array)
+    return Response(body, status=status, headers=headers)
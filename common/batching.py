@@ -0,0 +1,119 @@
+# common/batching.py
+"""
+Server-side dynamic micro-batching.
+
+A MicroBatcher sits in front of a service's batch handler. Single requests
+submitted from concurrent request threads are queued, grouped until either
+`max_batch_size` items are waiting or `max_wait_ms` has passed since the
+first one arrived, run through the handler in one call, and each caller gets
+its own result back.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """Group individual items into batches for a `handle_batch(list) -> list` function."""
+
+    def __init__(self, handle_batch, max_batch_size=32, max_wait_ms=5.0, name="microbatch"):
+        self.handle_batch = handle_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pid = None
+
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.batch_sizes = {}
+        self.total_wait = 0.0
+        self.max_queue_wait = 0.0
+
+    def _ensure_worker(self):
+        # The worker thread is started lazily (and restarted after a fork), so
+        # batchers created at import time work under pre-forking servers.
+        if self._pid == os.getpid() and self._worker is not None:
+            return
+        with self._lock:
+            if self._pid != os.getpid() or self._worker is None:
+                self._queue = queue.Queue()
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._pid = os.getpid()
+                self._worker.start()
+
+    def submit(self, item):
+        """Queue one item and return a Future for its result."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future, time.monotonic()))
+        return future
+
+    def __call__(self, item, timeout=None):
+        """Submit one item and block until its result is ready."""
+        return self.submit(item).result(timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = batch[0][2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+            waits = [started - enqueued for _, _, enqueued in batch]
+            inputs = [item for item, _, _ in batch]
+            try:
+                outputs = self.handle_batch(inputs)
+                if len(outputs) != len(inputs):
+                    raise RuntimeError(
+                        f"handle_batch returned {len(outputs)} outputs for {len(inputs)} inputs"
+                    )
+            except Exception as e:
+                self._record(len(batch), waits, failed=True)
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            self._record(len(batch), waits)
+            for (_, future, _), output in zip(batch, outputs):
+                future.set_result(output)
+
+    def _record(self, size, waits, failed=False):
+        with self._lock:
+            self.batches += 1
+            self.items += size
+            self.errors += int(failed)
+            self.batch_sizes[size] = self.batch_sizes.get(size, 0) + 1
+            self.total_wait += sum(waits)
+            self.max_queue_wait = max(self.max_queue_wait, max(waits))
+
+    def stats(self):
+        """Return batch-size and queue-wait metrics."""
+        with self._lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "batches": self.batches,
+                "items": self.items,
+                "errors": self.errors,
+                "queue_depth": self._queue.qsize(),
+                "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+                "batch_sizes": dict(sorted(self.batch_sizes.items())),
+                "avg_queue_wait_ms": 1000.0 * self.total_wait / self.items if self.items else 0.0,
+                "max_queue_wait_ms": 1000.0 * self.max_queue_wait,
+            }
@@ -0,0 +1,137 @@
+# common/codec.py
+"""
+Body encodings for /process and /route.
+
+- JSON goes through the JSON_BACKEND library: orjson when it is installed
+  ("auto"), otherwise the standard library. `init_app` makes it Flask's JSON
+  provider, so `request.json` and `jsonify` use it too.
+- MessagePack is a compact binary alternative, picked by the caller per
+  request. A body sent as `application/msgpack` (or `application/x-msgpack`)
+  is decoded as MessagePack, and `Accept: application/msgpack` asks for a
+  MessagePack answer. It needs the optional `msgpack` package; without it,
+  answers stay JSON.
+"""
+import json
+from config import CONFIG
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the standard library
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional: MessagePack is then not offered
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack")
+
+BACKEND = CONFIG["JSON_BACKEND"]
+if BACKEND == "auto":
+    BACKEND = "orjson" if orjson is not None else "json"
+if BACKEND == "orjson" and orjson is None:
+    raise ImportError("JSON_BACKEND=orjson but orjson is not installed")
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY if orjson is not None else 0
+
+
+def _default(obj):
+    """Fallback for types the JSON library cannot encode (dates, UUIDs, dataclasses, ...)."""
+    from flask.json.provider import DefaultJSONProvider
+
+    return DefaultJSONProvider.default(obj)
+
+
+def dumps(obj):
+    """Encode an object as compact JSON bytes."""
+    if BACKEND == "orjson":
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(obj, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def loads(data):
+    """Decode JSON from bytes or str; raises ValueError on invalid input."""
+    if BACKEND == "orjson":
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def is_msgpack(mimetype):
+    return (mimetype or "").lower() in MSGPACK_TYPES
+
+
+def negotiate(accept):
+    """Return the answer media type for an Accept header: MessagePack if asked for (and available), else JSON."""
+    if msgpack is None:
+        return JSON
+    for part in (accept or "").split(","):
+        if is_msgpack(part.split(";")[0].strip()):
+            return MSGPACK
+    return JSON
+
+
+def encode(obj, mimetype=JSON):
+    """Encode an object as a JSON or MessagePack body."""
+    if is_msgpack(mimetype):
+        return msgpack.packb(obj, use_bin_type=True, default=_default)
+    return dumps(obj)
+
+
+def decode(body, mimetype=JSON):
+    """Decode a JSON or MessagePack body; raises ValueError on invalid input."""
+    if is_msgpack(mimetype):
+        if msgpack is None:
+            raise ValueError("MessagePack bodies need the msgpack package")
+        return msgpack.unpackb(body, raw=False)
+    return loads(body)
+
+
+# -- Flask integration --------------------------------------------------
+def init_app(app):
+    """Use the fast JSON backend for `request.json` and `jsonify`."""
+    if BACKEND == "json":
+        return
+    from flask.json.provider import DefaultJSONProvider
+
+    class FastJSONProvider(DefaultJSONProvider):
+        def dumps(self, obj, **kwargs):
+            return dumps(obj).decode("utf-8")
+
+        def loads(self, s, **kwargs):
+            return loads(s)
+
+        def response(self, *args, **kwargs):
+            obj = self._prepare_response_obj(args, kwargs)
+            return self._app.response_class(dumps(obj), mimetype=self.mimetype)
+
+    app.json = FastJSONProvider(app)
+
+
+def request_payload(request):
+    """The decoded body of a Flask request, JSON or MessagePack."""
+    if is_msgpack(request.mimetype):
+        return decode(request.get_data(), request.mimetype)
+    return request.get_json()
+
+
+def request_inputs(request):
+    """The "inputs" list of a batch request body; None unless the body is an object holding a list."""
+    payload = request_payload(request)
+    inputs = payload.get("inputs") if isinstance(payload, dict) else None
+    return inputs if isinstance(inputs, list) else None
+
+
+def payload_response(payload, status=200, headers=None):
+    """A Flask response for `payload`, encoded as the request's Accept header asks."""
+    from flask import current_app, request
+
+    mimetype = negotiate(request.headers.get("Accept"))
+    if mimetype == JSON:
+        response = current_app.json.response(payload)
+    else:
+        response = current_app.response_class(encode(payload, mimetype), mimetype=mimetype)
+    response.status_code = status
+    response.headers.extend(headers or {})
+    return response
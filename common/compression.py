@@ -0,0 +1,180 @@
+# common/compression.py
+"""
+Response compression (HTTP Content-Encoding) for the services.
+
+A service compresses a response when the caller's Accept-Encoding allows it
+and the body is at least `min_size` bytes. It uses its configured codec when
+the caller accepts it, and gzip otherwise. Streamed responses, bodies that
+are already compressed (JPEG, PNG, ...) and answers that would not shrink
+are sent as they are.
+
+    compressor = Compressor("service1", codec="gzip", level=0, min_size=1024, registry=metrics.registry)
+    compressor.init_app(app)
+
+Codecs: "gzip" and "deflate" (standard library), "br" (needs `brotli`) and
+"zstd" (needs `zstandard`); "none" disables compression. The gateway relays
+compressed bodies as they are, and clients (requests, httpx) decode them.
+"""
+import logging
+import threading
+import time
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Compressed / original body size
+RATIO_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+
+# Media types that are compressed already
+INCOMPRESSIBLE = (
+    "image/jpeg", "image/png", "image/gif", "image/webp", "image/avif",
+    "application/gzip", "application/zip", "application/zstd", "application/x-brotli",
+)
+
+
+def _gzip(data, level):
+    compressor = zlib.compressobj(level or 6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    return compressor.compress(data) + compressor.flush()
+
+
+def _deflate(data, level):
+    return zlib.compress(data, level or 6)
+
+
+def _br(data, level):
+    return brotli.compress(data, quality=level or 4)
+
+
+def _zstd(data, level):
+    return zstandard.ZstdCompressor(level=level or 3).compress(data)
+
+
+CODECS = {"gzip": _gzip, "deflate": _deflate}
+if brotli is not None:
+    CODECS["br"] = _br
+if zstandard is not None:
+    CODECS["zstd"] = _zstd
+
+# What a client in this environment can decode (requests and httpx use the same packages).
+ACCEPT_ENCODING = ", ".join(CODECS)
+
+
+def compress(codec, data, level=0):
+    """Compress bytes with a codec; level 0 uses the codec's default."""
+    return CODECS[codec](data, level)
+
+
+def parse_accept_encoding(header):
+    """Parse an Accept-Encoding header into {codec: q}."""
+    accepted = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name.strip().lower()] = q
+    return accepted
+
+
+def negotiate(header, preferred):
+    """Return the first codec of `preferred` the Accept-Encoding header allows, or None."""
+    accepted = parse_accept_encoding(header)
+    for codec in preferred:
+        q = accepted.get(codec, accepted.get("*", 0.0))
+        if q > 0 and codec in CODECS:
+            return codec
+    return None
+
+
+class Compressor:
+    """Compress a Flask service's responses for callers that accept it."""
+
+    def __init__(self, service, codec="gzip", level=0, min_size=1024, registry=None):
+        if codec != "none" and codec not in CODECS:
+            logger.warning("Compression codec %r is not available, using gzip", codec)
+            codec = "gzip"
+        self.service = service
+        self.codec = codec
+        self.level = level
+        self.min_size = min_size
+        self.preferred = () if codec == "none" else tuple(dict.fromkeys((codec, "gzip")))
+        self._lock = threading.Lock()
+        self.counts = {"compressed": 0, "skipped": 0, "bytes_in": 0, "bytes_out": 0}
+        self.metrics = None
+        if registry is not None:
+            labels = ["service", "codec"]
+            self.metrics = (
+                registry.counter("compressed_responses_total", "Responses sent compressed", labels),
+                registry.counter("compression_input_bytes_total", "Body bytes before compression", labels),
+                registry.counter("compression_output_bytes_total", "Body bytes after compression", labels),
+                registry.histogram("compression_ratio", "Compressed / original body size", labels, RATIO_BUCKETS),
+                registry.histogram("compression_seconds", "Time spent compressing a body", labels),
+            )
+
+    def init_app(self, app):
+        from flask import request
+
+        @app.after_request
+        def _compress(response):
+            return self.compress_response(response, request)
+
+    def compress_response(self, response, request):
+        if (not self.preferred or request.method == "HEAD" or response.is_streamed
+                or response.direct_passthrough or "Content-Encoding" in response.headers
+                or not 200 <= response.status_code < 300 or response.status_code == 204
+                or response.mimetype in INCOMPRESSIBLE):
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+        response.vary.add("Accept-Encoding")
+        codec = negotiate(request.headers.get("Accept-Encoding"), self.preferred)
+        if codec is None:
+            return response
+
+        started = time.perf_counter()
+        compressed = compress(codec, data, self.level)
+        elapsed = time.perf_counter() - started
+        if len(compressed) >= len(data):
+            with self._lock:
+                self.counts["skipped"] += 1
+            return response
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = codec
+        with self._lock:
+            self.counts["compressed"] += 1
+            self.counts["bytes_in"] += len(data)
+            self.counts["bytes_out"] += len(compressed)
+        if self.metrics is not None:
+            responses, bytes_in, bytes_out, ratio, seconds = self.metrics
+            series = {"service": self.service, "codec": codec}
+            responses.labels(**series).inc()
+            bytes_in.labels(**series).inc(len(data))
+            bytes_out.labels(**series).inc(len(compressed))
+            ratio.labels(**series).observe(len(compressed) / len(data))
+            seconds.labels(**series).observe(elapsed)
+        return response
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        ratio = counts["bytes_out"] / counts["bytes_in"] if counts["bytes_in"] else None
+        return {"codec": self.codec, "level": self.level, "min_size": self.min_size, **counts,
+                "ratio": None if ratio is None else round(ratio, 4)}
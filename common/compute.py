@@ -0,0 +1,423 @@
+# common/compute.py
+"""
+Process pool for CPU-bound handler work.
+
+Request threads share one GIL, so NumPy / PIL work on a request thread
+stalls the worker's other threads, and its I/O with them. A ComputePool runs
+such functions in a few warm worker processes instead:
+
+    compute = ComputePool(SERVICE_NAME, workers=2, registry=metrics.registry)
+    lifecycle.on_startup(compute.start)
+    lifecycle.on_shutdown(compute.shutdown)
+
+    @compute.task
+    def handle_array(array):
+        return heavy_numpy_work(array)   # runs in a pool process
+
+    handle_array(array)                  # called as usual, from a request thread
+
+Array arguments and results of at least `shm_min_bytes` go through
+`multiprocessing.shared_memory` (one copy in, one copy out) instead of being
+pickled through the pool's pipe. The shared blocks are kept and reused, so
+their pages stay mapped in both processes and later calls only copy.
+
+The pool processes are forked from the service worker by `start()` (its
+startup hook, before the worker runs any threads), so they begin with the
+service's modules already imported; tasks must be registered (at import time)
+before that. A pool (re)built later, after a pool process died or without
+`start()`, comes from a fork server instead, since forking a threaded process
+is unsafe; its processes import the tasks' modules again. `workers=0` runs
+tasks inline in the calling thread, and so does every pool after
+`force_inline()`.
+
+A task that has not finished after `timeout` seconds raises ComputeTimeout in
+the caller; the pool process finishes it in the background.
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker, shared_memory
+from common.serving import resolve_workers
+
+logger = logging.getLogger(__name__)
+
+# Shared blocks are allocated in multiples of this, so similar arrays reuse them
+BLOCK_ALIGN = 1 << 20
+# Blocks a pool process keeps mapped
+MAX_ATTACHED = 16
+
+_tasks = {}  # "<pool>.<function>" -> function; looked up again in the pool processes
+_in_pool = False  # True inside a pool process: nested tasks run inline
+_forced_inline = False  # see force_inline()
+_attached = OrderedDict()  # pool process: mapped blocks by name, least recently used first
+
+
+class ComputeTimeout(Exception):
+    """Raised when a task does not finish within the pool's timeout."""
+
+    def __init__(self, service, timeout):
+        super().__init__(f"{service} compute task timed out after {timeout}s")
+        self.service = service
+        self.timeout = timeout
+
+
+def force_inline():
+    """
+    Run every pool's tasks inline in this process. For hosts that must not fork
+    their (multi-threaded) process, like the gateway running embedded services.
+    """
+    global _forced_inline
+    _forced_inline = True
+
+
+def _is_large_array(value, min_bytes):
+    np = sys.modules.get("numpy")  # no NumPy loaded: no arrays to share
+    return (np is not None and isinstance(value, np.ndarray) and not value.dtype.hasobject
+            and value.nbytes >= max(1, min_bytes))
+
+
+def _close(block):
+    try:
+        block.close()
+    except BufferError:  # a task kept a view of it; unmapped when the process exits
+        pass
+
+
+def _attach(name):
+    """Map a block by name, reusing the mapping of an earlier call (pool processes)."""
+    block = _attached.pop(name, None)
+    if block is None:
+        block = shared_memory.SharedMemory(name=name)
+        while len(_attached) >= MAX_ATTACHED:
+            _close(_attached.popitem(last=False)[1])
+    _attached[name] = block
+    return block
+
+
+class SharedArray:
+    """An array in a shared memory block; pickles as the block's name and the array's shape and dtype."""
+
+    def __init__(self, name, shape, dtype):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+
+    @classmethod
+    def write(cls, block, array):
+        """Copy an array into a block (at least as large) and return its handle."""
+        import numpy as np
+
+        np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+        return cls(block.name, array.shape, array.dtype.str)
+
+    def view(self, block):
+        """The array, read in place from its (mapped) block."""
+        import numpy as np
+
+        return np.ndarray(self.shape, np.dtype(self.dtype), buffer=block.buf)
+
+
+def _init_process(modules):
+    global _in_pool
+    _in_pool = True
+    # The parent worker drains and stops the pool; signals sent to the whole
+    # process group (CTRL+C, SIGTERM) must not kill tasks under way.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    # Already imported when forked from the worker; registers the tasks when
+    # started by a fork server.
+    for module in modules:
+        __import__(module)
+
+    # The parent is the worker (fork) or the fork server, which exits with it.
+    parent = os.getppid()
+
+    def exit_with_parent():
+        while os.getppid() == parent:
+            time.sleep(1.0)
+        os._exit(0)
+
+    threading.Thread(target=exit_with_parent, name="compute-parent", daemon=True).start()
+
+
+def _warm():
+    return os.getpid()
+
+
+def _run_task(key, args, kwargs, min_bytes, out):
+    """
+    Pool process side: read shared inputs in place, run the task and write a
+    large result into the caller's `out` block (or a new one if it does not fit).
+    """
+    started = time.monotonic()
+
+    def read(value):
+        return value.view(_attach(value.name)) if isinstance(value, SharedArray) else value
+
+    result = _tasks[key](*[read(value) for value in args], **{name: read(value) for name, value in kwargs.items()})
+    if _is_large_array(result, min_bytes):
+        block = _attach(out) if out is not None else None
+        if block is not None and block.size >= result.nbytes:
+            result = SharedArray.write(block, result)
+        else:
+            block = shared_memory.SharedMemory(create=True, size=result.nbytes)
+            result = SharedArray.write(block, result)
+            _close(block)  # the caller unlinks it once it has copied the result out
+    return result, started, time.monotonic()
+
+
+class ComputePool:
+    """A per-worker pool of processes for a service's CPU-bound functions."""
+
+    # Bytes of idle shared blocks kept for reuse; larger arrays get a block per call
+    max_cached_bytes = 64 << 20
+
+    def __init__(self, service, workers=0, shm_min_bytes=65536, timeout=None, registry=None):
+        self.service = service
+        self.workers = 0 if str(workers).strip() == "0" else resolve_workers(workers)
+        self.shm_min_bytes = shm_min_bytes
+        self.timeout = timeout
+        self._modules = set()  # modules defining this pool's tasks
+        self._executor = None
+        self._pid = None
+        self._free = []  # idle shared blocks
+        self._free_bytes = 0
+        self._lock = threading.Lock()
+
+        self.tasks = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_queue_depth = 0
+        self.total_queue_wait = 0.0
+        self.max_queue_wait = 0.0
+        self.total_run = 0.0
+        self.shared_bytes = 0
+
+        self.metrics = None
+        if registry is not None:
+            self.metrics = (
+                registry.counter("compute_tasks_total", "Compute pool tasks", ["service", "task", "status"]),
+                registry.histogram("compute_queue_seconds", "Time a task waited for a pool process", ["service", "task"]),
+                registry.histogram("compute_run_seconds", "Time a task ran in a pool process", ["service", "task"]),
+                registry.counter("compute_shared_bytes_total", "Array bytes passed through shared memory", ["service"]),
+                registry.gauge("compute_queue_depth", "Tasks waiting for a free pool process", ["service"]),
+                registry.gauge("compute_busy_workers", "Pool processes running a task", ["service"]),
+            )
+            registry.gauge("compute_workers", "Pool processes", ["service"]).labels(service=service).set(self.workers)
+
+    # -- pool -----------------------------------------------------------
+    @property
+    def inline(self):
+        return self.workers == 0 or _in_pool or _forced_inline
+
+    def _ensure_executor(self, method="forkserver"):
+        # Created lazily (and again after a fork or a crashed pool process), so
+        # pools built at import time work under pre-forking servers. Only
+        # start() forks the worker itself; see the module docstring.
+        if self._pid == os.getpid() and self._executor is not None:
+            return self._executor
+        with self._lock:
+            if self._pid != os.getpid():
+                self._free, self._free_bytes = [], 0  # the parent's blocks
+            if self._pid != os.getpid() or self._executor is None:
+                # One resource tracker shared with the pool processes, so blocks
+                # they create and this process unlinks are accounted once.
+                resource_tracker.ensure_running()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(method),
+                    initializer=_init_process,
+                    initargs=(sorted(self._modules),),
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def start(self):
+        """Start the pool processes now, before the worker serves traffic."""
+        if self.inline:
+            return
+        started = time.monotonic()
+        executor = self._ensure_executor("fork")
+        for future in [executor.submit(_warm) for _ in range(self.workers)]:
+            future.result()
+        logger.info("%s compute pool ready in %.2fs (%s processes)",
+                    self.service, time.monotonic() - started, self.workers)
+
+    def shutdown(self):
+        """Stop the pool processes (tasks still queued are cancelled) and free the shared blocks."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            free, self._free, self._free_bytes = self._free, [], 0
+        if self._pid != os.getpid():
+            return
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        for block in free:
+            block.close()
+            block.unlink()
+
+    def _acquire(self, nbytes):
+        """An idle shared block of at least `nbytes`, or a new one."""
+        with self._lock:
+            fits = [block for block in self._free if block.size >= nbytes]
+            if fits:
+                block = min(fits, key=lambda block: block.size)
+                self._free.remove(block)
+                self._free_bytes -= block.size
+                return block
+        return shared_memory.SharedMemory(create=True, size=-(-nbytes // BLOCK_ALIGN) * BLOCK_ALIGN)
+
+    def _release(self, block):
+        with self._lock:
+            if self._free_bytes + block.size <= self.max_cached_bytes:
+                self._free.append(block)
+                self._free_bytes += block.size
+                return
+        block.close()
+        block.unlink()
+
+    # -- tasks ----------------------------------------------------------
+    def task(self, fn):
+        """Decorator: calls to `fn` run in the pool and block the calling thread until done."""
+        if self._executor is not None:
+            raise RuntimeError(f"{fn.__qualname__}: register compute tasks before the pool starts")
+        key = f"{self.service}.{fn.__qualname__}"
+        _tasks[key] = fn
+        self._modules.add(fn.__module__)
+
+        def run(*args, **kwargs):
+            return self.run(key, *args, **kwargs)
+
+        run.__name__ = fn.__name__
+        run.__qualname__ = fn.__qualname__
+        run.__doc__ = fn.__doc__
+        run.__wrapped__ = fn
+        return run
+
+    def run(self, key, *args, **kwargs):
+        """Run a registered task and return its result."""
+        submitted = time.monotonic()
+        if self.inline:
+            try:
+                result = _tasks[key](*args, **kwargs)
+            except Exception:
+                self._record(key, submitted, submitted, time.monotonic(), 0, failed=True)
+                raise
+            self._record(key, submitted, submitted, time.monotonic(), 0)
+            return result
+
+        blocks = []
+        shared = 0
+        abandoned = False
+
+        def share(value):
+            nonlocal shared
+            if _is_large_array(value, self.shm_min_bytes):
+                block = self._acquire(value.nbytes)
+                blocks.append(block)
+                shared += value.nbytes
+                return SharedArray.write(block, value)
+            return value
+
+        executor = self._ensure_executor()
+        self._track(+1)
+        try:
+            args = tuple(share(value) for value in args)
+            kwargs = {name: share(value) for name, value in kwargs.items()}
+            # Room for a large result, sized like the largest input (enough for same-shape outputs)
+            out = self._acquire(max(block.size for block in blocks)) if blocks else None
+            if out is not None:
+                blocks.append(out)
+            future = executor.submit(_run_task, key, args, kwargs, self.shm_min_bytes, out and out.name)
+            try:
+                result, started, finished = future.result(self.timeout)
+            except FutureTimeout:
+                if not future.cancel():
+                    abandoned = True  # still running: its blocks may yet be written
+                raise ComputeTimeout(self.service, self.timeout) from None
+            if isinstance(result, SharedArray):
+                if out is not None and result.name == out.name:
+                    result = result.view(out).copy()
+                else:
+                    block = shared_memory.SharedMemory(name=result.name)
+                    result = result.view(block).copy()
+                    block.close()
+                    block.unlink()
+                shared += result.nbytes
+        except BrokenProcessPool:
+            logger.error("%s compute pool broke (a pool process died); starting a new one", self.service)
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False)
+            self._record(key, submitted, submitted, time.monotonic(), shared, failed=True)
+            raise
+        except Exception:
+            self._record(key, submitted, submitted, time.monotonic(), shared, failed=True)
+            raise
+        finally:
+            self._track(-1)
+            for block in blocks:
+                if abandoned:
+                    block.close()
+                    block.unlink()
+                else:
+                    self._release(block)
+        self._record(key, submitted, started, finished, shared)
+        return result
+
+    # -- metrics --------------------------------------------------------
+    def _track(self, delta):
+        with self._lock:
+            self.in_flight += delta
+            queued = max(0, self.in_flight - self.workers)
+            busy = min(self.in_flight, self.workers)
+            self.max_queue_depth = max(self.max_queue_depth, queued)
+        if self.metrics is not None:
+            self.metrics[4].labels(service=self.service).set(queued)
+            self.metrics[5].labels(service=self.service).set(busy)
+
+    def _record(self, key, submitted, started, finished, shared, failed=False):
+        queue_wait = max(0.0, started - submitted)
+        run = max(0.0, finished - started)
+        with self._lock:
+            self.tasks += 1
+            self.errors += int(failed)
+            self.total_queue_wait += queue_wait
+            self.max_queue_wait = max(self.max_queue_wait, queue_wait)
+            self.total_run += run
+            self.shared_bytes += shared
+        if self.metrics is not None:
+            tasks, queue_seconds, run_seconds, shared_bytes, _, _ = self.metrics
+            task = key.partition(".")[2]
+            tasks.labels(service=self.service, task=task, status="error" if failed else "ok").inc()
+            if not failed:
+                queue_seconds.labels(service=self.service, task=task).observe(queue_wait)
+                run_seconds.labels(service=self.service, task=task).observe(run)
+            if shared:
+                shared_bytes.labels(service=self.service).inc(shared)
+
+    def stats(self):
+        """Return pool size, queue depth, wait / run times and shared-memory traffic."""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "inline": self.inline,
+                "tasks": self.tasks,
+                "errors": self.errors,
+                "in_flight": self.in_flight,
+                "queue_depth": max(0, self.in_flight - self.workers),
+                "max_queue_depth": self.max_queue_depth,
+                "avg_queue_wait_ms": 1000.0 * self.total_queue_wait / self.tasks if self.tasks else 0.0,
+                "max_queue_wait_ms": 1000.0 * self.max_queue_wait,
+                "avg_run_ms": 1000.0 * self.total_run / self.tasks if self.tasks else 0.0,
+                "shared_bytes": self.shared_bytes,
+                "cached_bytes": self._free_bytes,
+            }
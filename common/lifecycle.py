@@ -0,0 +1,162 @@
+# common/lifecycle.py
+"""
+Service lifecycle: warm loading, readiness and graceful drain.
+
+    lifecycle = Lifecycle(SERVICE_NAME)
+
+    @lifecycle.resource("model")
+    def load_model():
+        return load_expensive_model()       # runs once per worker process
+
+    def handle_batch(inputs):
+        model = lifecycle.resources["model"]  # shared by the worker's threads
+
+Startup hooks and resource loaders run once per worker process before it
+accepts traffic (Gunicorn's post_worker_init, or before app.run in
+development). `GET /ready` answers 503 until they have finished and again
+once the worker starts draining on SIGTERM; `GET /health` is a plain
+liveness check. On SIGTERM the worker keeps serving in-flight requests for up
+to `drain_timeout` seconds, then runs the shutdown hooks and exits.
+"""
+import logging
+import os
+import signal
+import threading
+import time
+from flask import jsonify
+
+logger = logging.getLogger(__name__)
+
+
+class Lifecycle:
+    """Per-process startup/shutdown hooks, shared resources and readiness state."""
+
+    def __init__(self, name, drain_timeout=10.0):
+        self.name = name
+        self.drain_timeout = drain_timeout
+        self.resources = {}
+        self._startup_hooks = []
+        self._shutdown_hooks = []
+        self._lock = threading.Lock()
+        self._started_pid = None
+        self.ready = False
+        self.draining = False
+        self.in_flight = 0
+
+    # -- registration ---------------------------------------------------
+    def on_startup(self, fn):
+        """Register a function to run once per worker before it serves traffic."""
+        self._startup_hooks.append(fn)
+        return fn
+
+    def on_shutdown(self, fn):
+        """Register a function to run when the worker exits."""
+        self._shutdown_hooks.append(fn)
+        return fn
+
+    def resource(self, name):
+        """Register a loader whose result is stored in `resources[name]` at startup."""
+        def decorator(fn):
+            def load():
+                self.resources[name] = fn()
+            load.__name__ = f"load_{name}"
+            self._startup_hooks.append(load)
+            return fn
+        return decorator
+
+    # -- running --------------------------------------------------------
+    def start(self):
+        """Run the startup hooks (once per process) and mark the worker ready."""
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self.ready = False
+            self.draining = False
+            self.in_flight = 0
+            started = time.monotonic()
+            try:
+                for hook in self._startup_hooks:
+                    hook()
+            except Exception as e:
+                # Not started: a later start() runs every hook again from a clean slate.
+                logger.error("%s startup hook %s failed: %s", self.name, getattr(hook, "__name__", hook), e)
+                self.resources.clear()
+                raise
+            self._started_pid = os.getpid()
+            self.ready = True
+        logger.info("%s ready in %.2fs (pid %s)", self.name, time.monotonic() - started, os.getpid())
+
+    def stop(self):
+        """Run the shutdown hooks and release the shared resources."""
+        self.ready = False
+        for hook in reversed(self._shutdown_hooks):
+            try:
+                hook()
+            except Exception as e:
+                logger.error("Shutdown hook %s failed: %s", getattr(hook, "__name__", hook), e)
+        self.resources.clear()
+
+    def drain(self, timeout=None):
+        """Stop reporting ready and wait for in-flight requests to finish."""
+        self.draining = True
+        deadline = time.monotonic() + (self.drain_timeout if timeout is None else timeout)
+        while self.in_flight > 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        logger.info("%s drained (%s requests still in flight)", self.name, self.in_flight)
+
+    # -- integration ----------------------------------------------------
+    def init_app(self, app):
+        """Track in-flight requests and add /ready and /health to a Flask app."""
+        @app.before_request
+        def _count_request():
+            with self._lock:
+                self.in_flight += 1
+
+        @app.teardown_request
+        def _uncount_request(exc):
+            with self._lock:
+                self.in_flight -= 1
+
+        @app.route("/ready", methods=["GET"])
+        def ready():
+            if self.ready and not self.draining:
+                return jsonify({"status": "ready", "service": self.name})
+            status = "draining" if self.draining else "starting"
+            return jsonify({"status": status, "service": self.name}), 503
+
+        @app.route("/health", methods=["GET"])
+        def health():
+            return jsonify({"status": "ok", "service": self.name})
+
+    def gunicorn_hooks(self):
+        """Gunicorn server hooks that run the lifecycle inside each worker."""
+        def post_worker_init(worker):
+            self.start()
+            previous = signal.getsignal(signal.SIGTERM)
+
+            def on_sigterm(signum, frame):
+                def drain_then_exit():
+                    self.drain()
+                    previous(signum, frame)  # Gunicorn's handler stops the worker loop
+                threading.Thread(target=drain_then_exit, daemon=True).start()
+
+            signal.signal(signal.SIGTERM, on_sigterm)
+
+        def worker_exit(server, worker):
+            self.stop()
+
+        return {"post_worker_init": post_worker_init, "worker_exit": worker_exit}
+
+    def run_dev(self, app, host, port, **kwargs):
+        """Start the lifecycle and serve with the Flask development server."""
+        self.start()
+
+        def on_sigterm(signum, frame):
+            def drain_then_exit():
+                self.drain()
+                self.stop()
+                os._exit(0)
+            threading.Thread(target=drain_then_exit, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, on_sigterm)
+        app.run(host=host, port=port, **kwargs)
@@ -0,0 +1,166 @@
+# common/logs.py
+"""
+Non-blocking logging shared by the gateway and the services.
+
+Request threads only put log records on a bounded in-memory queue; a
+background QueueListener thread formats them and does the stdout/file I/O.
+Records are formatted lazily (use %-style arguments, not f-strings), large
+payloads are wrapped in `Payload` so they are truncated only if actually
+emitted, low-severity records can be sampled, and output can be plain text
+or one JSON object per line.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from config import CONFIG
+
+LOG_FORMAT = CONFIG["LOG_FORMAT"]
+LOG_PAYLOAD_LIMIT = CONFIG["LOG_PAYLOAD_LIMIT"]
+LOG_SAMPLE_RATE = CONFIG["LOG_SAMPLE_RATE"]
+LOG_QUEUE_SIZE = CONFIG["LOG_QUEUE_SIZE"]
+
+
+class Payload:
+    """Defer rendering (and truncate) a request/response payload until the record is emitted."""
+
+    __slots__ = ("obj", "limit")
+
+    def __init__(self, obj, limit=None):
+        self.obj = obj
+        self.limit = LOG_PAYLOAD_LIMIT if limit is None else limit
+
+    def __str__(self):
+        try:
+            text = json.dumps(self.obj, default=str, ensure_ascii=False)
+        except (TypeError, ValueError):
+            text = repr(self.obj)
+        if self.limit and len(text) > self.limit:
+            return f"{text[:self.limit]}...({len(text) - self.limit} more chars)"
+        return text
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of records below WARNING; warnings and errors always pass."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1.0 or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record as a single-line JSON object."""
+
+    def __init__(self, service):
+        super().__init__()
+        self.service = service
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "service": self.service,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """A QueueHandler that never blocks or formats in the calling thread."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Formatting happens in the listener thread; the record is handed over as is.
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_lock = threading.Lock()
+_state = {}
+
+
+def _start_listener():
+    listener = logging.handlers.QueueListener(
+        _state["queue"], *_state["handlers"], respect_handler_level=True
+    )
+    listener.start()
+    _state["listener"] = listener
+
+
+def _stop_listener():
+    # Flush whatever is still queued when the process exits.
+    listener = _state.get("listener")
+    if listener is not None:
+        listener.stop()
+
+
+def _after_fork_in_child():
+    # Threads do not survive fork(): give each pre-forked worker its own queue and listener.
+    if "listener" in _state:
+        _state["queue"] = queue.Queue(LOG_QUEUE_SIZE)
+        _state["queue_handler"].queue = _state["queue"]
+        _start_listener()
+
+
+def setup_logging(name, level, log_file=None, service=None, fmt="%(asctime)s - %(levelname)s - %(message)s"):
+    """
+    Route all logging through a background queue and return the named logger.
+
+    :param name: Logger name to return.
+    :param level: Root log level (e.g. "INFO").
+    :param log_file: Optional file that receives the same output as stdout.
+    :param service: Service name included in JSON records.
+    :param fmt: Format string used for text output.
+    """
+    with _lock:
+        if "listener" not in _state:
+            formatter = JsonFormatter(service or name) if LOG_FORMAT == "json" else logging.Formatter(fmt)
+            handlers = [logging.StreamHandler(sys.stdout)]
+            if log_file:
+                handlers.append(logging.FileHandler(log_file))
+            for handler in handlers:
+                handler.setFormatter(formatter)
+
+            _state["queue"] = queue.Queue(LOG_QUEUE_SIZE)
+            _state["handlers"] = handlers
+            queue_handler = NonBlockingQueueHandler(_state["queue"])
+            if LOG_SAMPLE_RATE < 1.0:
+                queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE))
+            _state["queue_handler"] = queue_handler
+
+            root = logging.getLogger()
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            root.addHandler(queue_handler)
+            root.setLevel(level)
+
+            _start_listener()
+            os.register_at_fork(after_in_child=_after_fork_in_child)
+            atexit.register(_stop_listener)
+    return logging.getLogger(name)
+
+
+def dropped_records():
+    """Number of records dropped because the log queue was full."""
+    handler = _state.get("queue_handler")
+    return handler.dropped if handler is not None else 0
@@ -0,0 +1,364 @@
+# common/metrics.py
+"""
+Prometheus-style metrics for the gateway and the services.
+
+    metrics = MetricsRegistry("service1", subsystem="service")
+    requests_total = metrics.counter("requests_total", "Requests handled", ["service", "code"])
+    requests_total.labels(service="service1", code="200").inc()
+    text = metrics.render()          # Prometheus text exposition format
+
+Counters, gauges and histograms live in process memory. Under a multi-worker
+server (common.serving sets MODELHUB_SERVER_PID before forking), each worker
+also writes a snapshot to METRICS_DIR every METRICS_FLUSH_INTERVAL seconds and
+`render` merges the snapshots of all live workers of the same server, so any
+worker answers a scrape with server-wide totals.
+
+Timing between hops travels in `Server-Timing` response headers
+(`service;dur=1.8`, in milliseconds); see `server_timing` and
+`parse_server_timing`.
+"""
+import atexit
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+from config import CONFIG
+
+METRICS_DIR = CONFIG["METRICS_DIR"]
+METRICS_FLUSH_INTERVAL = CONFIG["METRICS_FLUSH_INTERVAL"]
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bytes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+
+class _Child:
+    """One labelled series of a metric."""
+
+    def __init__(self, metric, key):
+        self._metric = metric
+        self._key = key
+
+    def inc(self, amount=1):
+        self._metric._add(self._key, amount)
+
+    def dec(self, amount=1):
+        self._metric._add(self._key, -amount)
+
+    def set(self, value):
+        self._metric._set(self._key, value)
+
+    def observe(self, value):
+        self._metric._observe(self._key, value)
+
+
+class Metric:
+    """A counter, gauge or histogram with a fixed set of label names."""
+
+    def __init__(self, name, help, kind, labelnames=(), buckets=None):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) if buckets else None
+        self.values = {}  # label values tuple -> number, or [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        return _Child(self, tuple(str(labels[name]) for name in self.labelnames))
+
+    # Unlabelled shortcuts
+    def inc(self, amount=1):
+        self._add((), amount)
+
+    def dec(self, amount=1):
+        self._add((), -amount)
+
+    def set(self, value):
+        self._set((), value)
+
+    def observe(self, value):
+        self._observe((), value)
+
+    def _add(self, key, amount):
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def _set(self, key, value):
+        with self._lock:
+            self.values[key] = value
+
+    def _observe(self, key, value):
+        with self._lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            values = [[list(k), list(v) if isinstance(v, list) else v] for k, v in self.values.items()]
+        return {"help": self.help, "kind": self.kind, "labelnames": list(self.labelnames),
+                "buckets": list(self.buckets or ()), "values": values}
+
+
+def _merge(snapshots):
+    """Sum the series of several registry snapshots."""
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, dict(metric, values={}))
+            for key, value in metric["values"]:
+                key = tuple(key)
+                if isinstance(value, list):
+                    current = target["values"].get(key)
+                    target["values"][key] = value if current is None else [a + b for a, b in zip(current, value)]
+                else:
+                    target["values"][key] = target["values"].get(key, 0) + value
+    return merged
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}"
+
+
+def _format_number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def format_text(metrics):
+    """Render merged snapshots in the Prometheus text exposition format."""
+    lines = []
+    for name, metric in sorted(metrics.items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        names = metric["labelnames"]
+        for key, value in sorted(metric["values"].items()):
+            if metric["kind"] != "histogram":
+                lines.append(f"{name}{_labels(names, key)} {_format_number(value)}")
+                continue
+            for bound, count in zip(metric["buckets"], value):
+                lines.append(f"{name}_bucket{_labels(names, key, [('le', _format_number(float(bound)))])} {count}")
+            lines.append(f"{name}_bucket{_labels(names, key, [('le', '+Inf')])} {value[-1]}")
+            lines.append(f"{name}_sum{_labels(names, key)} {_format_number(value[-2])}")
+            lines.append(f"{name}_count{_labels(names, key)} {value[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsRegistry:
+    """The metrics of one component (the gateway or a service)."""
+
+    def __init__(self, component, subsystem=None, namespace="modelhub"):
+        self.component = component
+        self.prefix = f"{namespace}_{(subsystem or component).replace('-', '_')}_"
+        self.metrics = {}
+        self._lock = threading.Lock()
+        self._flusher_pid = None
+
+    def _register(self, name, help, kind, labelnames, buckets=None):
+        full_name = self.prefix + name
+        with self._lock:
+            if full_name not in self.metrics:
+                self.metrics[full_name] = Metric(full_name, help, kind, labelnames, buckets)
+            return self.metrics[full_name]
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(name, help, "counter", labelnames)
+
+    def gauge(self, name, help, labelnames=()):
+        return self._register(name, help, "gauge", labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(name, help, "histogram", labelnames, buckets)
+
+    def snapshot(self):
+        with self._lock:
+            metrics = list(self.metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    # -- multi-process --------------------------------------------------
+    def _shared_dir(self):
+        server_pid = os.environ.get("MODELHUB_SERVER_PID")
+        if not server_pid or int(server_pid) == os.getpid():
+            return None  # single process: nothing to share
+        return os.path.join(METRICS_DIR, f"{self.component}-{server_pid}")
+
+    def flush(self):
+        """Write this worker's snapshot for its sibling workers to merge."""
+        directory = self._shared_dir()
+        if directory is None:
+            return
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, os.path.join(directory, f"{os.getpid()}.json"))
+
+    def start_flushing(self):
+        """Flush periodically (and at exit) from a background thread, once per worker."""
+        if self._shared_dir() is None or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return  # another request thread got here first
+            self._flusher_pid = os.getpid()
+
+        def run():
+            while True:
+                time.sleep(METRICS_FLUSH_INTERVAL)
+                self.flush()
+
+        threading.Thread(target=run, name="metrics-flush", daemon=True).start()
+        atexit.register(self.flush)
+
+    @staticmethod
+    def _alive(pid):
+        try:
+            os.kill(int(pid), 0)
+        except (ValueError, ProcessLookupError):
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _remove_stale_groups(self):
+        """Delete the snapshot directories of servers that are no longer running."""
+        for name in os.listdir(METRICS_DIR):
+            component, _, server_pid = name.rpartition("-")
+            if component != self.component or self._alive(server_pid):
+                continue
+            directory = os.path.join(METRICS_DIR, name)
+            # Sibling workers clean up the same directories concurrently.
+            with contextlib.suppress(OSError):
+                for entry in os.listdir(directory):
+                    with contextlib.suppress(OSError):
+                        os.remove(os.path.join(directory, entry))
+                os.rmdir(directory)
+
+    def _sibling_snapshots(self, directory):
+        snapshots = []
+        for name in os.listdir(directory):
+            if not name.endswith(".json") or name == f"{os.getpid()}.json":
+                continue
+            path = os.path.join(directory, name)
+            if not self._alive(name[:-len(".json")]):
+                with contextlib.suppress(OSError):  # a sibling may have removed it already
+                    os.remove(path)  # worker is gone; drop its series
+                continue
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def render(self):
+        """Return every metric (merged across workers) in the text format."""
+        snapshots = [self.snapshot()]
+        directory = self._shared_dir()
+        if directory is not None:
+            self.start_flushing()
+            self.flush()
+            self._remove_stale_groups()
+            snapshots += self._sibling_snapshots(directory)
+        return format_text(_merge(snapshots))
+
+
+def server_timing(**phases):
+    """Build a Server-Timing header value from phase durations in seconds."""
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in phases.items() if seconds is not None)
+
+
+def parse_server_timing(header):
+    """Parse a Server-Timing header into {name: seconds}."""
+    phases = {}
+    for entry in (header or "").split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur":
+                try:
+                    phases[name] = float(value) / 1000.0
+                except ValueError:
+                    pass
+    return phases
+
+
+class ServiceMetrics:
+    """Request metrics, /metrics and a Server-Timing header for a Flask service."""
+
+    SKIP_PATHS = ("/metrics", "/ready", "/health")
+
+    def __init__(self, service):
+        self.service = service
+        self.registry = MetricsRegistry(service, subsystem="service")
+        labels = ["service", "endpoint"]
+        self.requests = self.registry.counter("requests_total", "Requests handled", labels + ["code"])
+        self.errors = self.registry.counter("errors_total", "Requests answered with a 4xx/5xx status", labels)
+        self.duration = self.registry.histogram("processing_seconds", "Time spent handling a request", labels)
+        self.in_flight = self.registry.gauge("in_flight", "Requests being handled", labels)
+        self.request_bytes = self.registry.histogram("request_bytes", "Request body size", labels, SIZE_BUCKETS)
+        self.response_bytes = self.registry.histogram("response_bytes", "Response body size", labels, SIZE_BUCKETS)
+
+    def init_app(self, app):
+        from flask import Response, g, request
+
+        def labels():
+            rule = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            return {"service": self.service, "endpoint": rule}
+
+        @app.before_request
+        def _start_timer():
+            if request.path in self.SKIP_PATHS:
+                return
+            self.registry.start_flushing()
+            g.metrics_started = time.perf_counter()
+            self.in_flight.labels(**labels()).inc()
+
+        @app.after_request
+        def _record(response):
+            started = g.pop("metrics_started", None)
+            if started is None:
+                return response
+            elapsed = time.perf_counter() - started
+            series = labels()
+            self.in_flight.labels(**series).dec()
+            self.requests.labels(code=response.status_code, **series).inc()
+            if response.status_code >= 400:
+                self.errors.labels(**series).inc()
+            self.duration.labels(**series).observe(elapsed)
+            if request.content_length:
+                self.request_bytes.labels(**series).observe(request.content_length)
+            # calculate_content_length() would buffer a streamed body; skip those.
+            size = None if response.is_streamed else response.calculate_content_length()
+            if size is not None:
+                self.response_bytes.labels(**series).observe(size)
+            response.headers["Server-Timing"] = server_timing(service=elapsed)
+            return response
+
+        @app.teardown_request
+        def _abandoned(exc):
+            # after_request is skipped when a view raises; keep the gauge right.
+            if g.pop("metrics_started", None) is not None:
+                self.in_flight.labels(**labels()).dec()
+
+        @app.route("/metrics", methods=["GET"])
+        def metrics():
+            return Response(self.registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,151 @@
+# common/objstore.py
+"""
+Shared-data object store for handing large arrays over by reference.
+
+A producer writes an array once under DATA_DIR/objects (the volume every
+container mounts) and passes only its ID in requests, e.g.
+`{"input_ref": "<id>"}`. Consumers open the `.npy` file memory-mapped, so only
+the pages they touch are read.
+
+Each object carries a reference count and an expiry time in a JSON sidecar.
+`put` hands the producer one reference; when `release` drops the count to
+zero the object is deleted. Objects that are never released are removed once
+their TTL has passed, by the periodic sweep that runs from `put`.
+"""
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from config import CONFIG
+from common.storage import atomic_write
+
+OBJECT_STORE_DIR = CONFIG["OBJECT_STORE_DIR"]
+OBJECT_STORE_TTL = CONFIG["OBJECT_STORE_TTL"]
+
+_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class ObjectNotFound(KeyError):
+    """Raised when an object ID is unknown, malformed or already cleaned up."""
+
+
+class ObjectStore:
+    """Reference-counted, TTL-bounded `.npy` objects in a shared directory."""
+
+    SWEEP_INTERVAL = 60.0  # seconds between sweeps triggered by put()
+
+    def __init__(self, root=OBJECT_STORE_DIR, ttl=OBJECT_STORE_TTL):
+        self.root = root
+        self.ttl = ttl
+        os.makedirs(root, exist_ok=True)
+        self._last_sweep = 0.0
+        self._sweep_lock = threading.Lock()
+
+    def _path(self, object_id, suffix):
+        if not isinstance(object_id, str) or not _ID_PATTERN.match(object_id):
+            raise ObjectNotFound(object_id)
+        return os.path.join(self.root, f"{object_id}{suffix}")
+
+    @contextmanager
+    def _meta(self, object_id):
+        """Lock an object's metadata for a read-modify-write cycle."""
+        try:
+            f = open(self._path(object_id, ".json"), "r+")
+        except FileNotFoundError:
+            raise ObjectNotFound(object_id)
+        with f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            meta = json.load(f)
+            yield meta
+            f.seek(0)
+            f.truncate()
+            json.dump(meta, f)
+
+    def put(self, array, ttl=None):
+        """Write an array once and return its ID (holding one reference)."""
+        import numpy as np
+
+        self._maybe_sweep()
+        object_id = uuid.uuid4().hex
+        array = np.asanyarray(array)
+        atomic_write(self._path(object_id, ".npy"), lambda f: np.save(f, array))
+        meta = {
+            "refs": 1,
+            "expires_at": time.time() + (self.ttl if ttl is None else ttl),
+            "shape": list(array.shape),
+            "dtype": array.dtype.str,
+        }
+        atomic_write(self._path(object_id, ".json"), lambda f: json.dump(meta, f), mode="w")
+        return object_id
+
+    def open(self, object_id):
+        """Open an object as a read-only memory-mapped array."""
+        import numpy as np
+
+        try:
+            return np.load(self._path(object_id, ".npy"), mmap_mode="r")
+        except FileNotFoundError:
+            raise ObjectNotFound(object_id)
+
+    def acquire(self, object_id):
+        """Take an extra reference (e.g. before handing the ID to another consumer)."""
+        with self._meta(object_id) as meta:
+            meta["refs"] += 1
+            return meta["refs"]
+
+    def release(self, object_id):
+        """Drop a reference; the object is deleted when none are left."""
+        with self._meta(object_id) as meta:
+            meta["refs"] = max(0, meta["refs"] - 1)
+            refs = meta["refs"]
+        if refs == 0:
+            self.delete(object_id)
+        return refs
+
+    def delete(self, object_id):
+        for suffix in (".npy", ".json"):
+            try:
+                os.remove(self._path(object_id, suffix))
+            except FileNotFoundError:
+                pass
+
+    def sweep(self):
+        """Delete every object whose TTL has passed; returns the number removed."""
+        now = time.time()
+        removed = 0
+        for name in os.listdir(self.root):
+            if not name.endswith(".json"):
+                continue
+            object_id = name[:-len(".json")]
+            try:
+                with open(os.path.join(self.root, name)) as f:
+                    expired = json.load(f)["expires_at"] <= now
+            except (OSError, ValueError, KeyError):
+                continue
+            if expired:
+                self.delete(object_id)
+                removed += 1
+        return removed
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        with self._sweep_lock:
+            if now - self._last_sweep < self.SWEEP_INTERVAL:
+                return
+            self._last_sweep = now
+        self.sweep()
+
+
+_store = None
+
+
+def get_store():
+    """Return the process-wide store rooted at OBJECT_STORE_DIR."""
+    global _store
+    if _store is None:
+        _store = ObjectStore()
+    return _store
@@ -0,0 +1,62 @@
+# common/serving.py
+"""
+Production serving for the gateway and the services.
+
+WSGI (Flask) apps run under Gunicorn with multiple pre-forked workers, each
+with a pool of threads; the ASGI gateway runs under Uvicorn with multiple
+worker processes. Both are started programmatically so `python app.py` stays
+the entry point locally and in Docker.
+"""
+import os
+
+HOST = "0.0.0.0"
+
+
+def resolve_workers(value):
+    """Turn a worker count setting ("auto" or a number) into an int."""
+    if str(value).strip().lower() == "auto":
+        return os.cpu_count() or 1
+    return max(1, int(value))
+
+
+def serve_wsgi(app, port, workers=1, threads=1, timeout=30, keepalive=5, hooks=None):
+    """
+    Serve a WSGI app with Gunicorn's threaded workers.
+
+    `hooks` are extra Gunicorn server hooks, e.g. `Lifecycle.gunicorn_hooks()`.
+    """
+    from gunicorn.app.base import BaseApplication
+
+    options = {
+        "bind": f"{HOST}:{port}",
+        "workers": resolve_workers(workers),
+        "threads": max(1, int(threads)),
+        "worker_class": "gthread",
+        "timeout": timeout,
+        "keepalive": keepalive,
+        # Newer Gunicorn releases open a control socket at a fixed path shared by
+        # every instance on the host; the gateway and services don't use it.
+        "control_socket_disable": True,
+    }
+    options.update(hooks or {})
+    # Lets the workers find each other's metrics snapshots (common/metrics.py).
+    os.environ["MODELHUB_SERVER_PID"] = str(os.getpid())
+
+    class _Application(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                if key in self.cfg.settings:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    _Application().run()
+
+
+def serve_asgi(app_path, port, workers=1, log_level="warning"):
+    """Serve an ASGI app (given as "module:attribute") with Uvicorn worker processes."""
+    import uvicorn
+
+    os.environ["MODELHUB_SERVER_PID"] = str(os.getpid())
+    uvicorn.run(app_path, host=HOST, port=port, workers=resolve_workers(workers), log_level=log_level)
@@ -0,0 +1,196 @@
+# common/storage.py
+"""
+Pluggable array persistence for services.
+
+Backends (selected by name, see `get_storage`):
+
+- "npy": uncompressed `.npy`, readable memory-mapped.
+- "fast": `.npz` compressed with a fast deflate level (np.load compatible).
+- "chunked": uncompressed `.npy` written a block of rows at a time, so
+  arrays produced piecewise never need a second full-size buffer.
+
+Every write goes to a temporary file in the target directory and is renamed
+into place, so readers never see a partial file. `save_if_changed` skips the
+work entirely when the source file has not changed since the last run.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+
+
+def atomic_write(path, write, mode="wb"):
+    """Call `write(f)` on a temp file next to `path`, then rename it into place."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+        os.chmod(tmp_path, 0o644)  # mkstemp creates 0600 files; other containers read these
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class NpyStorage:
+    """Uncompressed `.npy` files; `load` memory-maps them by default."""
+
+    extension = ".npy"
+
+    def save(self, path, array):
+        import numpy as np
+
+        atomic_write(path, lambda f: np.save(f, np.asanyarray(array)))
+
+    def load(self, path, mmap=True):
+        import numpy as np
+
+        return np.load(path, mmap_mode="r" if mmap else None)
+
+
+class CompressedStorage:
+    """`.npz` archives (one array stored under `key`) with a fast compression level."""
+
+    extension = ".npz"
+
+    def __init__(self, level=1, key="arr"):
+        self.level = level
+        self.key = key
+
+    def save(self, path, array):
+        import numpy as np
+
+        def write(f):
+            with zipfile.ZipFile(f, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=self.level) as archive:
+                with archive.open(f"{self.key}.npy", "w", force_zip64=True) as member:
+                    np.lib.format.write_array(member, np.asanyarray(array), allow_pickle=False)
+
+        atomic_write(path, write)
+
+    def load(self, path, mmap=False):
+        import numpy as np
+
+        with np.load(path) as archive:
+            return archive[self.key]
+
+
+class ChunkedNpyStorage(NpyStorage):
+    """`.npy` files written `chunk_rows` rows at a time through a memory map."""
+
+    def __init__(self, chunk_rows=1024):
+        self.chunk_rows = chunk_rows
+
+    def save(self, path, array):
+        import numpy as np
+
+        array = np.asanyarray(array)
+        self.save_chunks(path, array.shape, array.dtype, self._split(array))
+
+    def _split(self, array):
+        if array.ndim == 0:
+            yield array.reshape(1)
+            return
+        for start in range(0, array.shape[0], self.chunk_rows):
+            yield array[start:start + self.chunk_rows]
+
+    def save_chunks(self, path, shape, dtype, chunks):
+        """Write an array of known shape/dtype from an iterable of row blocks."""
+        import numpy as np
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        os.close(fd)
+        try:
+            out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=shape)
+            flat = out.reshape(1) if out.ndim == 0 else out
+            row = 0
+            for chunk in chunks:
+                flat[row:row + len(chunk)] = chunk
+                row += len(chunk)
+            out.flush()
+            del out, flat
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+STORAGE_BACKENDS = {
+    "npy": NpyStorage,
+    "fast": CompressedStorage,
+    "chunked": ChunkedNpyStorage,
+}
+
+
+def get_storage(name="npy", **options):
+    """Instantiate an array storage backend by name."""
+    try:
+        return STORAGE_BACKENDS[name](**options)
+    except KeyError:
+        raise ValueError(f"Unknown array storage backend: {name!r} (choose from {sorted(STORAGE_BACKENDS)})")
+
+
+def fingerprint(path, method="mtime"):
+    """Identify a source file's version by mtime/size ("mtime") or content ("hash")."""
+    if method == "hash":
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+# (source, target) -> stat of the source when this process last found `target` up to date
+_up_to_date = {}
+
+
+def _stat_key(path):
+    stat = os.stat(path)
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def _read_stamp(stamp_path):
+    try:
+        with open(stamp_path) as f:
+            return json.load(f).get("source")
+    except (OSError, ValueError):
+        return None
+
+
+def save_if_changed(storage, source, target, compute, method="mtime"):
+    """
+    Persist `compute()` to `target` unless it is already up to date with `source`.
+
+    The source fingerprint is kept in a hidden `.<target>.src` sidecar. While the
+    source file is unchanged since this process last checked, the call costs two
+    stat() calls: no lock, no sidecar read and no hashing. Otherwise the sidecar is
+    read first, and only a changed fingerprint takes the lock file, which makes
+    concurrent requests and workers wait for a single computation instead of
+    repeating it. Returns True if the array was (re)computed.
+    """
+    directory, name = os.path.split(target)
+    stamp_path = os.path.join(directory, f".{name}.src")
+    key = (source, target)
+    stat = _stat_key(source)
+    if _up_to_date.get(key) == stat and os.path.exists(target):
+        return False
+    current = fingerprint(source, method)
+    if _read_stamp(stamp_path) == current and os.path.exists(target):
+        _up_to_date[key] = stat
+        return False
+    with open(os.path.join(directory, f".{name}.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        # Another worker may have finished the same computation while we waited.
+        if _read_stamp(stamp_path) == current and os.path.exists(target):
+            _up_to_date[key] = stat
+            return False
+        storage.save(target, compute())
+        atomic_write(stamp_path, lambda f: json.dump({"source": current, "method": method}, f), mode="w")
+    _up_to_date[key] = stat
+    return True
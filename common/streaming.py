@@ -0,0 +1,106 @@
+# common/streaming.py
+"""
+Streamed (incremental) responses from /process.
+
+A caller asks for a stream with its Accept header:
+
+- `text/event-stream`: server-sent events, one `data: {"output": ...}` event
+  per partial output;
+- `application/x-ndjson`: one `{"output": ...}` JSON line per partial output.
+
+A failure after the stream has started is sent in-band, as an `error` event
+(SSE) or an `{"error": ...}` line (NDJSON), since the status code is already
+gone. Every chunk is written as soon as it is produced; the gateway relays
+chunks as they arrive, and `X-Accel-Buffering: no` keeps nginx from
+buffering them.
+"""
+import logging
+from common.codec import dumps, loads
+
+SSE = "text/event-stream"
+NDJSON = "application/x-ndjson"
+STREAM_TYPES = (SSE, NDJSON)
+
+# Response headers relayed by the gateway for streamed answers
+STREAM_HEADERS = ("Content-Type", "Cache-Control", "X-Accel-Buffering")
+
+logger = logging.getLogger(__name__)
+
+
+def stream_type(accept):
+    """Return the streaming media type requested by an Accept header, or None."""
+    for part in (accept or "").split(","):
+        mimetype = part.split(";")[0].strip().lower()
+        if mimetype in STREAM_TYPES:
+            return mimetype
+    return None
+
+
+def encode_event(mimetype, payload, event=None):
+    """Frame one JSON payload for the given stream type."""
+    data = dumps(payload)
+    if mimetype == NDJSON:
+        return data + b"\n"
+    prefix = f"event: {event}\n" if event else ""
+    return prefix.encode() + b"data: " + data + b"\n\n"
+
+
+def encode_stream(outputs, mimetype):
+    """Frame each output of a generator; errors end the stream with an error event."""
+    try:
+        for output in outputs:
+            yield encode_event(mimetype, {"output": output})
+    except Exception as e:
+        logger.error("Streaming error: %s", e)
+        yield encode_event(mimetype, {"error": "Internal server error"}, event="error")
+
+
+def stream_response(outputs, mimetype):
+    """Flask response that streams a generator of outputs."""
+    from flask import Response
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(encode_stream(outputs, mimetype), mimetype=mimetype, headers=headers)
+
+
+class EventParser:
+    """
+    Incremental stream parser for the client: feed it the lines of a stream
+    (str or bytes, without line endings) and it returns each complete JSON
+    payload, or None while an event is still incomplete.
+    """
+
+    def __init__(self, mimetype):
+        self.mimetype = mimetype
+        self._data = []
+
+    def feed(self, line):
+        if isinstance(line, bytes):
+            line = line.decode()
+        if self.mimetype == NDJSON:
+            return loads(line) if line.strip() else None
+        if line.startswith("data:"):
+            self._data.append(line[5:].strip())
+        elif not line and self._data:
+            return self.close()
+        return None
+
+    def close(self):
+        """Return the last, unterminated SSE event if there is one."""
+        if not self._data:
+            return None
+        payload = loads("\n".join(self._data))
+        self._data = []
+        return payload
+
+
+def iter_events(lines, mimetype):
+    """Parse an iterable of stream lines into JSON payloads."""
+    parser = EventParser(mimetype)
+    for line in lines:
+        payload = parser.feed(line)
+        if payload is not None:
+            yield payload
+    payload = parser.close()
+    if payload is not None:
+        yield payload
@@ -0,0 +1,439 @@
+# common/tracing.py
+"""
+Lightweight distributed tracing with W3C trace-context propagation.
+
+    tracer = get_tracer("service1")
+    tracer.init_app(app)                  # server span per request (Flask)
+
+    with tracer.span("parse_json"):       # child of the current span
+        data = request.json
+
+    headers = tracer.inject({})           # adds `traceparent` for the next hop
+
+The client, the gateway and the services pass a `traceparent` header along,
+so every hop of a request shares one trace ID (also returned to callers in
+`X-Trace-Id`). Whether a trace is recorded is decided once, where it starts,
+with probability TRACE_SAMPLE_RATE, and carried in the header's flags.
+Recorded spans are queued and written by a background thread, never on the
+request path, either as JSON lines under TRACE_DIR ("file") or in batches to
+the collector at TRACE_COLLECTOR_URL ("http").
+
+    python -m common.tracing collect      # collector stand-in
+    python -m common.tracing report       # slowest span names and traces
+"""
+import argparse
+import atexit
+import contextvars
+import functools
+import glob
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from config import CONFIG
+
+TRACE_SAMPLE_RATE = CONFIG["TRACE_SAMPLE_RATE"]
+TRACE_EXPORTER = CONFIG["TRACE_EXPORTER"]
+TRACE_DIR = CONFIG["TRACE_DIR"]
+TRACE_COLLECTOR_URL = CONFIG["TRACE_COLLECTOR_URL"]
+
+TRACEPARENT = "traceparent"
+TRACE_ID_HEADER = "X-Trace-Id"
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar("current_span", default=None)
+
+
+class SpanContext:
+    """The part of a span that crosses process boundaries."""
+
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id, span_id, sampled):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @classmethod
+    def parse(cls, header):
+        """Parse a `traceparent` header; returns None if it is missing or invalid."""
+        parts = (header or "").strip().split("-")
+        if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+            return None
+        try:
+            flags = int(parts[3][:2], 16)
+            int(parts[1], 16), int(parts[2], 16)
+        except ValueError:
+            return None
+        if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+            return None
+        return cls(parts[1], parts[2], bool(flags & 1))
+
+
+class Span:
+    """One timed operation within a trace."""
+
+    def __init__(self, tracer, name, parent, kind="internal", attributes=None):
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.parent_id = parent.span_id if parent else None
+        sampled = parent.sampled if parent else random.random() < tracer.sample_rate
+        trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.context = SpanContext(trace_id, os.urandom(8).hex(), sampled)
+        self.attributes = dict(attributes or {})
+        self.status = "ok"
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self.duration = None
+
+    @property
+    def trace_id(self):
+        return self.context.trace_id
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_error(self, error):
+        self.status = "error"
+        self.attributes["error"] = str(error)
+
+    def end(self):
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._started
+        if self.context.sampled:
+            self.tracer.processor.submit(self.to_dict())
+
+    def to_dict(self):
+        return {
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "service": self.tracer.service,
+            "name": self.name,
+            "kind": self.kind,
+            "start": self.start,
+            "duration_ms": round(self.duration * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class FileExporter:
+    """Append spans as JSON lines to TRACE_DIR/<service>.jsonl."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def export(self, spans):
+        data = "".join(json.dumps(span) + "\n" for span in spans)
+        # One O_APPEND write per batch keeps lines from concurrent workers intact.
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data.encode())
+        finally:
+            os.close(fd)
+
+
+class HttpExporter:
+    """POST batches of spans as a JSON list to a collector."""
+
+    def __init__(self, url, timeout=2.0):
+        self.url = url
+        self.timeout = timeout
+
+    def export(self, spans):
+        import requests
+        requests.post(self.url, json=spans, timeout=self.timeout)
+
+
+class BatchSpanProcessor:
+    """Queue finished spans and export them in batches from a background thread."""
+
+    def __init__(self, exporter, max_queue=10000, batch_size=256, interval=1.0):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.interval = interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.exported = 0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def submit(self, span):
+        self._ensure_worker()
+        try:
+            self.queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_worker(self):
+        # Started lazily (and again after a fork) so every worker process exports its own spans.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._run, name="span-exporter", daemon=True).start()
+        atexit.register(self.flush)
+
+    def _drain(self):
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self):
+        """Export everything queued so far."""
+        while True:
+            batch = self._drain()
+            if not batch:
+                return
+            try:
+                self.exporter.export(batch)
+                self.exported += len(batch)
+            except Exception as e:
+                self.dropped += len(batch)
+                logger.debug("Span export failed: %s", e)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+
+class _NullProcessor:
+    dropped = exported = 0
+
+    def submit(self, span):
+        pass
+
+
+def _make_processor(service, exporter):
+    if exporter == "file":
+        return BatchSpanProcessor(FileExporter(os.path.join(TRACE_DIR, f"{service}.jsonl")))
+    if exporter == "http":
+        return BatchSpanProcessor(HttpExporter(TRACE_COLLECTOR_URL))
+    return _NullProcessor()
+
+
+class Tracer:
+    """Creates spans for one component and propagates their context."""
+
+    def __init__(self, service, sample_rate=TRACE_SAMPLE_RATE, exporter=TRACE_EXPORTER):
+        self.service = service
+        self.sample_rate = sample_rate
+        self.processor = _make_processor(service, exporter)
+
+    # -- spans ----------------------------------------------------------
+    def start_span(self, name, parent=None, kind="internal", attributes=None):
+        """Start a span under `parent` (default: the current span); call `end()` on it."""
+        if parent is None:
+            current = _current.get()
+            parent = current.context if current is not None else None
+        return Span(self, name, parent, kind, attributes)
+
+    @contextmanager
+    def span(self, name, parent=None, kind="internal", **attributes):
+        """Run a block inside a span that becomes the current span."""
+        span = self.start_span(name, parent, kind, attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_error(e)
+            raise
+        finally:
+            _current.reset(token)
+            span.end()
+
+    def traced(self, name=None):
+        """Decorator: run the function in a child span (only inside an existing trace)."""
+        def decorator(fn):
+            span_name = name or fn.__name__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if _current.get() is None:
+                    return fn(*args, **kwargs)
+                with self.span(span_name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # -- propagation ----------------------------------------------------
+    @staticmethod
+    def current_span():
+        return _current.get()
+
+    @staticmethod
+    def extract(headers):
+        """Return the remote parent SpanContext from incoming headers, if any."""
+        return SpanContext.parse(headers.get(TRACEPARENT))
+
+    @staticmethod
+    def inject(headers, span=None):
+        """Add `traceparent` for `span` (default: the current span) to a headers dict."""
+        span = span or _current.get()
+        if span is not None:
+            headers[TRACEPARENT] = span.context.traceparent()
+        return headers
+
+    @staticmethod
+    def activate(span):
+        """Make `span` the current span; returns a token for `deactivate`."""
+        return _current.set(span)
+
+    @staticmethod
+    def deactivate(token):
+        _current.reset(token)
+
+    # -- Flask integration ----------------------------------------------
+    def init_app(self, app, skip_paths=("/metrics", "/ready", "/health", "/stats"), parse_json=True):
+        """
+        Open a server span for every request, plus a parse_json span for JSON
+        bodies unless `parse_json` is false (apps that parse bodies lazily).
+        """
+        from flask import g, request
+
+        @app.before_request
+        def _start_server_span():
+            if request.path in skip_paths:
+                return
+            span = self.start_span(f"{request.method} {request.path}", parent=self.extract(request.headers),
+                                   kind="server", attributes={"http.method": request.method})
+            g.trace_token = _current.set(span)
+            g.trace_span = span
+            if parse_json and request.is_json:
+                with self.span("parse_json", bytes=request.content_length):
+                    request.get_json(silent=True)
+
+        @app.after_request
+        def _tag_response(response):
+            span = g.get("trace_span")
+            if span is not None:
+                span.set_attribute("http.status_code", response.status_code)
+                if response.status_code >= 500:
+                    span.status = "error"
+                response.headers[TRACE_ID_HEADER] = span.trace_id
+            return response
+
+        @app.teardown_request
+        def _end_server_span(exc):
+            span = g.pop("trace_span", None)
+            if span is None:
+                return
+            if exc is not None:
+                span.set_error(exc)
+            _current.reset(g.pop("trace_token"))
+            span.end()
+
+    def stats(self):
+        return {"sample_rate": self.sample_rate, "exported": self.processor.exported,
+                "dropped": self.processor.dropped}
+
+
+_tracers = {}
+
+
+def get_tracer(service):
+    """Return the process-wide tracer for a component."""
+    if service not in _tracers:
+        _tracers[service] = Tracer(service)
+    return _tracers[service]
+
+
+# -- tools ----------------------------------------------------------------
+def collect(port, out):
+    """Collector stand-in: accept span batches over HTTP and append them to a file."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    exporter = FileExporter(out)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                spans = json.loads(body)
+            except ValueError:
+                self.send_response(400)
+                self.end_headers()
+                return
+            exporter.export(spans)
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    print(f"Collecting spans on port {port} into {out}")
+    ThreadingHTTPServer(("0.0.0.0", port), Handler).serve_forever()
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def report(paths, top=10):
+    """Print the span names and traces that account for the most latency."""
+    spans = []
+    for path in paths:
+        with open(path) as f:
+            spans.extend(json.loads(line) for line in f if line.strip())
+    if not spans:
+        print("No spans found.")
+        return
+
+    by_name = {}
+    for span in spans:
+        by_name.setdefault((span["service"], span["name"]), []).append(span["duration_ms"])
+    print(f"{'service':<12} {'span':<32} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    rows = sorted(by_name.items(), key=lambda item: -_percentile(item[1], 95))
+    for (service, name), durations in rows[:top]:
+        print(f"{service:<12} {name[:32]:<32} {len(durations):>7} {_percentile(durations, 50):>9.2f} "
+              f"{_percentile(durations, 95):>9.2f} {max(durations):>9.2f}")
+
+    # A trace's root is its first span whose parent was not recorded here.
+    span_ids = {s["span_id"] for s in spans}
+    roots = {}
+    for span in sorted(spans, key=lambda s: s["start"]):
+        if span["parent_id"] not in span_ids:
+            roots.setdefault(span["trace_id"], span)
+    roots = sorted(roots.values(), key=lambda s: -s["duration_ms"])
+    print("\nSlowest traces:")
+    for root in roots[:top]:
+        hops = sorted((s for s in spans if s["trace_id"] == root["trace_id"]), key=lambda s: s["start"])
+        breakdown = ", ".join(f"{s['service']}:{s['name']}={s['duration_ms']:.1f}" for s in hops)
+        print(f"{root['trace_id']} {root['duration_ms']:.1f} ms  [{breakdown}]")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trace collector stand-in and latency report.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    collect_cmd = commands.add_parser("collect", help="Receive spans over HTTP and write them to a file")
+    collect_cmd.add_argument("--port", type=int, default=4318)
+    collect_cmd.add_argument("--out", default=os.path.join(TRACE_DIR, "collector.jsonl"))
+    report_cmd = commands.add_parser("report", help="Summarize recorded spans")
+    report_cmd.add_argument("paths", nargs="*", help="Span files (default: every file in TRACE_DIR)")
+    report_cmd.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == "collect":
+        collect(args.port, args.out)
+    else:
+        report(args.paths or sorted(glob.glob(os.path.join(TRACE_DIR, "*.jsonl"))), args.top)
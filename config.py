@@ -1,5 +1,6 @@
 # config.py
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables from .env (or a file specified by ENV_FILE)
@@ -17,13 +18,71 @@ DATA_DIR = os.path.abspath(_data_dir)
 
 LOG_FILE = os.environ.get("LOG_FILE", os.path.join(DATA_DIR, "app.log"))
 
+# Shared-data object store for passing large arrays by reference
+OBJECT_STORE_DIR = os.path.abspath(os.environ.get("OBJECT_STORE_DIR", os.path.join(DATA_DIR, "objects")))
+OBJECT_STORE_TTL = float(os.environ.get("OBJECT_STORE_TTL", "3600"))
+
+# Logging pipeline: "text" or "json" output, payload truncation, sampling of
+# records below WARNING (1.0 = keep all) and the size of the background queue.
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text").lower()
+LOG_PAYLOAD_LIMIT = int(os.environ.get("LOG_PAYLOAD_LIMIT", "256"))
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", "1.0"))
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+
+# Metrics: where multi-worker servers exchange per-worker snapshots (local to
+# each host/container) and how often each worker writes its own.
+METRICS_DIR = os.environ.get("METRICS_DIR", os.path.join(tempfile.gettempdir(), "modelhub-metrics"))
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", "1"))
+
+# Tracing: share of new traces that are recorded (callers can force one via the
+# traceparent sampled flag), exporter ("file", "http" or "none"), where the
+# file exporter writes and where the http exporter posts span batches.
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0.01"))
+TRACE_EXPORTER = os.environ.get("TRACE_EXPORTER", "file").lower()
+TRACE_DIR = os.path.abspath(os.environ.get("TRACE_DIR", os.path.join(DATA_DIR, "traces")))
+TRACE_COLLECTOR_URL = os.environ.get("TRACE_COLLECTOR_URL", "http://localhost:4318/v1/spans")
+
+# JSON library used by the gateway and services: "auto" (orjson when installed),
+# "orjson" or "json" (standard library).
+JSON_BACKEND = os.environ.get("JSON_BACKEND", "auto").lower()
+
+
+def _env_bool(name, default):
+    """Read a true/false flag from the environment."""
+    return os.environ.get(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
 # -------------------------
 # Mode & Gateway Settings
 # -------------------------
 DOCKER_MODE = os.environ.get("DOCKER_MODE", "false").lower() == "true"
 
+# "development" (Flask dev server) or "production" (multi-worker, multi-threaded servers)
+SERVING_MODE = os.environ.get("SERVING_MODE", "development").lower()
+
 GATEWAY_PORT = int(os.environ.get("GATEWAY_PORT", "5001"))
 GATEWAY_LOG_LEVEL = os.environ.get("GATEWAY_LOG_LEVEL", "INFO")
+# "flask" (WSGI, one thread per request) or "asgi" (asyncio, non-blocking upstream calls)
+GATEWAY_ENGINE = os.environ.get("GATEWAY_ENGINE", "flask").lower()
+# Production serving: worker processes ("auto" = one per core) and threads per worker
+GATEWAY_WORKERS = os.environ.get("GATEWAY_WORKERS", "2")
+GATEWAY_THREADS = int(os.environ.get("GATEWAY_THREADS", "8"))
+# Response cache: max in-memory entries and backend ("memory" or "disk", shared under DATA_DIR)
+GATEWAY_CACHE_SIZE = int(os.environ.get("GATEWAY_CACHE_SIZE", "1024"))
+GATEWAY_CACHE_BACKEND = os.environ.get("GATEWAY_CACHE_BACKEND", "memory").lower()
+# Active health checks of service replicas: seconds between probes of /ready
+# (0 disables them), probe timeout, and consecutive failures before ejection.
+GATEWAY_HEALTH_INTERVAL = float(os.environ.get("GATEWAY_HEALTH_INTERVAL", "5"))
+GATEWAY_HEALTH_TIMEOUT = float(os.environ.get("GATEWAY_HEALTH_TIMEOUT", "1"))
+GATEWAY_HEALTH_EJECT_AFTER = int(os.environ.get("GATEWAY_HEALTH_EJECT_AFTER", "3"))
+# Forward request and response bodies as raw bytes when the gateway does not
+# need to read them (no response cache); otherwise they are parsed once.
+GATEWAY_PASSTHROUGH = _env_bool("GATEWAY_PASSTHROUGH", True)
+# Async jobs (/jobs): worker threads per gateway process, read timeout of a job's
+# service call, seconds finished jobs are kept, and the longest long-poll wait.
+GATEWAY_JOB_WORKERS = int(os.environ.get("GATEWAY_JOB_WORKERS", "4"))
+GATEWAY_JOB_TIMEOUT = float(os.environ.get("GATEWAY_JOB_TIMEOUT", "300"))
+GATEWAY_JOB_TTL = float(os.environ.get("GATEWAY_JOB_TTL", "86400"))
+GATEWAY_JOB_MAX_WAIT = float(os.environ.get("GATEWAY_JOB_MAX_WAIT", "30"))
 
 # -------------------------
 # Service Configurations
@@ -38,18 +97,94 @@ for service in SERVICES_LIST:
         "name": os.environ.get(f"{key}_NAME", service),
         "port": int(os.environ.get(f"{key}_PORT", "5000")),
         "log_level": os.environ.get(f"{key}_LOG_LEVEL", "INFO"),
+        # "remote": its own process, reached over HTTP; "embedded": loaded into the
+        # gateway process and called in-process (see gateway/gateway/embedded.py).
+        "mode": os.environ.get(f"{key}_MODE", "remote").lower(),
+        # Replicas listen on consecutive ports starting at `port`. `urls` (comma
+        # separated) overrides the derived endpoints, e.g. for remote hosts.
+        "replicas": int(os.environ.get(f"{key}_REPLICAS", "1")),
+        "urls": [u.strip() for u in os.environ.get(f"{key}_URLS", "").split(",") if u.strip()],
+        # How the gateway spreads requests over replicas: "round_robin" or "least_outstanding".
+        "lb_policy": os.environ.get(f"{key}_LB_POLICY", "round_robin").lower(),
+        # Production serving: worker processes ("auto" = one per core) and threads per worker.
+        "workers": os.environ.get(f"{key}_WORKERS", "2"),
+        "threads": int(os.environ.get(f"{key}_THREADS", "4")),
+        # Seconds a stopping worker keeps serving in-flight requests.
+        "drain_timeout": float(os.environ.get(f"{key}_DRAIN_TIMEOUT", "10")),
+        # Upstream connection pool used by the gateway to reach this service.
+        "pool_size": int(os.environ.get(f"{key}_POOL_SIZE", "10")),
+        "pool_block": _env_bool(f"{key}_POOL_BLOCK", False),
+        "keep_alive": _env_bool(f"{key}_KEEP_ALIVE", True),
+        "connect_timeout": float(os.environ.get(f"{key}_CONNECT_TIMEOUT", "2")),
+        "read_timeout": float(os.environ.get(f"{key}_READ_TIMEOUT", "5")),
+        # Resilience of gateway calls. Only services marked idempotent (safe to
+        # call twice with the same input) are retried or hedged.
+        "idempotent": _env_bool(f"{key}_IDEMPOTENT", False),
+        "retries": int(os.environ.get(f"{key}_RETRIES", "2")),
+        "retry_backoff_ms": float(os.environ.get(f"{key}_RETRY_BACKOFF_MS", "50")),
+        "retry_backoff_max_ms": float(os.environ.get(f"{key}_RETRY_BACKOFF_MAX_MS", "1000")),
+        # Duplicate calls still pending after the observed p95 latency to a second replica.
+        "hedge": _env_bool(f"{key}_HEDGE", False),
+        # Consecutive failures that open the circuit (0 disables it) and seconds until a trial call.
+        "breaker_failures": int(os.environ.get(f"{key}_BREAKER_FAILURES", "5")),
+        "breaker_reset": float(os.environ.get(f"{key}_BREAKER_RESET", "30")),
+        # Admission control per gateway worker: concurrent calls (0 = unlimited),
+        # callers allowed to wait for a slot and how long; beyond that -> 429.
+        "max_concurrency": int(os.environ.get(f"{key}_MAX_CONCURRENCY", "0")),
+        "queue_size": int(os.environ.get(f"{key}_QUEUE_SIZE", "50")),
+        "queue_timeout_ms": float(os.environ.get(f"{key}_QUEUE_TIMEOUT_MS", "1000")),
+        # Tune the limit between min_concurrency and max_concurrency from observed latency.
+        "adaptive_concurrency": _env_bool(f"{key}_ADAPTIVE_CONCURRENCY", False),
+        "min_concurrency": int(os.environ.get(f"{key}_MIN_CONCURRENCY", "1")),
+        # Cap on concurrent upstream connections in the asgi gateway engine.
+        "max_connections": int(os.environ.get(f"{key}_MAX_CONNECTIONS", "1000")),
+        # Largest list accepted by /route/<service>/batch.
+        "max_batch_size": int(os.environ.get(f"{key}_MAX_BATCH_SIZE", "1024")),
+        # Opt-in dynamic micro-batching of single /process requests inside the service.
+        "microbatch": _env_bool(f"{key}_MICROBATCH", False),
+        "microbatch_max_size": int(os.environ.get(f"{key}_MICROBATCH_MAX_SIZE", "32")),
+        "microbatch_wait_ms": float(os.environ.get(f"{key}_MICROBATCH_WAIT_MS", "5")),
+        # Gateway response cache for deterministic services.
+        "cache": _env_bool(f"{key}_CACHE", False),
+        "cache_ttl": float(os.environ.get(f"{key}_CACHE_TTL", "60")),
+        # Response compression: codec ("gzip", "deflate", "br", "zstd" or "none"), level
+        # (0 = the codec's default) and the smallest body compressed, in bytes.
+        "compression": os.environ.get(f"{key}_COMPRESSION", "gzip").lower(),
+        "compression_level": int(os.environ.get(f"{key}_COMPRESSION_LEVEL", "0")),
+        "compression_min_size": int(os.environ.get(f"{key}_COMPRESSION_MIN_SIZE", "1024")),
+        # Process pool for CPU-bound handler work (common/compute.py): processes per
+        # service worker (0 = run inline, "auto" = one per core) and the smallest
+        # array, in bytes, handed over through shared memory instead of pickled.
+        "compute_workers": os.environ.get(f"{key}_COMPUTE_WORKERS", "0"),
+        "compute_shm_min_bytes": int(os.environ.get(f"{key}_COMPUTE_SHM_MIN_BYTES", "65536")),
+        # Array persistence backend ("npy", "fast" or "chunked") and how source
+        # changes are detected ("mtime" or "hash").
+        "array_format": os.environ.get(f"{key}_ARRAY_FORMAT", "fast"),
+        "array_fingerprint": os.environ.get(f"{key}_ARRAY_FINGERPRINT", "mtime"),
     }
 
-if DOCKER_MODE:
-    GATEWAY_SERVICES = {
-        service: f"http://{service}:{cfg['port']}/process" 
-        for service, cfg in SERVICE_CONFIG.items()
-    }
-else:
-    GATEWAY_SERVICES = {
-        service: f"http://localhost:{cfg['port']}/process" 
-        for service, cfg in SERVICE_CONFIG.items()
-    }
+def _service_endpoints(service, cfg):
+    """Return the /process URLs of every replica of a service."""
+    if cfg["mode"] == "embedded":
+        return [f"embedded://{service}/process"]
+    if cfg["urls"]:
+        return cfg["urls"]
+    if DOCKER_MODE:
+        # Containers are addressed by service name; scale them behind that name.
+        return [f"http://{service}:{cfg['port']}/process"]
+    return [f"http://localhost:{cfg['port'] + i}/process" for i in range(max(1, cfg["replicas"]))]
+
+
+SERVICE_ENDPOINTS = {
+    service: _service_endpoints(service, cfg)
+    for service, cfg in SERVICE_CONFIG.items()
+}
+
+# First endpoint of each service (kept for single-URL callers).
+GATEWAY_SERVICES = {
+    service: endpoints[0]
+    for service, endpoints in SERVICE_ENDPOINTS.items()
+}
 
 # -------------------------
 # Utility: Ensure Data Directories Exist
@@ -75,10 +210,38 @@ CONFIG = {
     "BASE_DIR": BASE_DIR,
     "DATA_DIR": DATA_DIR,
     "LOG_FILE": LOG_FILE,
+    "OBJECT_STORE_DIR": OBJECT_STORE_DIR,
+    "OBJECT_STORE_TTL": OBJECT_STORE_TTL,
+    "LOG_FORMAT": LOG_FORMAT,
+    "LOG_PAYLOAD_LIMIT": LOG_PAYLOAD_LIMIT,
+    "LOG_SAMPLE_RATE": LOG_SAMPLE_RATE,
+    "LOG_QUEUE_SIZE": LOG_QUEUE_SIZE,
+    "METRICS_DIR": METRICS_DIR,
+    "METRICS_FLUSH_INTERVAL": METRICS_FLUSH_INTERVAL,
+    "TRACE_SAMPLE_RATE": TRACE_SAMPLE_RATE,
+    "TRACE_EXPORTER": TRACE_EXPORTER,
+    "TRACE_DIR": TRACE_DIR,
+    "TRACE_COLLECTOR_URL": TRACE_COLLECTOR_URL,
+    "JSON_BACKEND": JSON_BACKEND,
     "DOCKER_MODE": DOCKER_MODE,
+    "SERVING_MODE": SERVING_MODE,
     "GATEWAY_PORT": GATEWAY_PORT,
     "GATEWAY_LOG_LEVEL": GATEWAY_LOG_LEVEL,
+    "GATEWAY_ENGINE": GATEWAY_ENGINE,
+    "GATEWAY_WORKERS": GATEWAY_WORKERS,
+    "GATEWAY_THREADS": GATEWAY_THREADS,
+    "GATEWAY_CACHE_SIZE": GATEWAY_CACHE_SIZE,
+    "GATEWAY_CACHE_BACKEND": GATEWAY_CACHE_BACKEND,
+    "GATEWAY_HEALTH_INTERVAL": GATEWAY_HEALTH_INTERVAL,
+    "GATEWAY_HEALTH_TIMEOUT": GATEWAY_HEALTH_TIMEOUT,
+    "GATEWAY_HEALTH_EJECT_AFTER": GATEWAY_HEALTH_EJECT_AFTER,
+    "GATEWAY_PASSTHROUGH": GATEWAY_PASSTHROUGH,
+    "GATEWAY_JOB_WORKERS": GATEWAY_JOB_WORKERS,
+    "GATEWAY_JOB_TIMEOUT": GATEWAY_JOB_TIMEOUT,
+    "GATEWAY_JOB_TTL": GATEWAY_JOB_TTL,
+    "GATEWAY_JOB_MAX_WAIT": GATEWAY_JOB_MAX_WAIT,
     "SERVICES_LIST": SERVICES_LIST,
     "SERVICE_CONFIG": SERVICE_CONFIG,
     "GATEWAY_SERVICES": GATEWAY_SERVICES,
+    "SERVICE_ENDPOINTS": SERVICE_ENDPOINTS,
 }
\ No newline at end of file
@@ -1,14 +1,27 @@
 from flask import Flask
 from flask_cors import CORS
 from gateway.routes import bp
+from gateway.metrics import tracer
 from gateway.logger import logger
-from gateway.config import GATEWAY_PORT
+from gateway.config import GATEWAY_PORT, ENGINE, SERVING_MODE, WORKERS, THREADS
+from common.serving import serve_asgi, serve_wsgi
+from common import codec
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})  # Allow all requests
 
 app.register_blueprint(bp)
+tracer.init_app(app, parse_json=False)  # trace context and request spans (routes parse bodies)
+codec.init_app(app)  # fast JSON for jsonify
 
 if __name__ == '__main__':
-    logger.info(f"🚀 Starting Gateway API on port {GATEWAY_PORT}...")
-    app.run(host='0.0.0.0', port=GATEWAY_PORT, debug=True)
\ No newline at end of file
+    if ENGINE == "asgi":
+        workers = WORKERS if SERVING_MODE == "production" else 1
+        logger.info("🚀 Starting async Gateway API on port %s (%s workers)...", GATEWAY_PORT, workers)
+        serve_asgi("asgi:app", GATEWAY_PORT, workers=workers)
+    elif SERVING_MODE == "production":
+        logger.info("🚀 Starting Gateway API on port %s (%s workers x %s threads)...", GATEWAY_PORT, WORKERS, THREADS)
+        serve_wsgi(app, GATEWAY_PORT, workers=WORKERS, threads=THREADS)
+    else:
+        logger.info("🚀 Starting Gateway API on port %s...", GATEWAY_PORT)
+        app.run(host='0.0.0.0', port=GATEWAY_PORT, debug=True)
\ No newline at end of file
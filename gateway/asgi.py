@@ -0,0 +1,21 @@
+import asyncio
+from contextlib import asynccontextmanager
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from gateway.aio import routes, close_pools, job_sender
+from gateway.jobs import runner
+
+
+@asynccontextmanager
+async def lifespan(app):
+    runner.start(job_sender(asyncio.get_running_loop()))
+    yield
+    await close_pools()
+
+
+app = Starlette(
+    routes=routes,
+    middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])],
+    lifespan=lifespan,
+)
@@ -0,0 +1,199 @@
+# gateway/gateway/admission.py
+"""
+Per-service admission control for the gateway.
+
+At most `max_concurrency` calls to a service are in flight per gateway
+worker. Up to `queue_size` more wait (first in, first out) for at most
+`queue_timeout_ms`; anything beyond that is rejected at once with Overloaded,
+which the routes turn into 429 + Retry-After. Keeping the queue short bounds
+the time a request can spend waiting, and so the tail latency under overload.
+
+With `adaptive_concurrency` the limit moves between `min_concurrency` and
+`max_concurrency` following a latency gradient: it shrinks when calls get
+slower than their long-term average (the service is queueing) or fail, and
+grows back while latency stays flat.
+"""
+import asyncio
+import math
+import threading
+from collections import deque
+from gateway.config import SERVICE_CONFIG
+
+
+class Overloaded(Exception):
+    """Raised when a call is not admitted; `retry_after` is in seconds."""
+
+    def __init__(self, service, retry_after=1):
+        super().__init__(f"{service} is overloaded")
+        self.service = service
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """Concurrency limit plus bounded FIFO wait queue for one service."""
+
+    TOLERANCE = 2.0    # latency may grow to this multiple of its average before the limit shrinks
+    SMOOTHING = 0.2    # weight of each new limit estimate
+    BACKOFF = 0.9      # limit multiplier after a failed call
+
+    def __init__(self, service, limit, queue_size=50, queue_timeout=1.0,
+                 adaptive=False, min_limit=1):
+        self.service = service
+        self.max_limit = limit
+        self.min_limit = max(1, min(min_limit, limit))
+        self.limit = float(limit)
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.adaptive = adaptive
+        self.in_flight = 0
+        self.avg_latency = None  # recent average, for Retry-After
+        self.baseline = None     # slow long-term average the adaptive limit compares against
+        self._waiters = deque()
+        self._lock = threading.Lock()
+        self.counts = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0}
+
+    # -- admission ------------------------------------------------------
+    def _try_admit(self):
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self.counts["admitted"] += 1
+            return True
+        if len(self._waiters) >= self.queue_size:
+            self.counts["rejected"] += 1
+            raise self._overloaded()
+        return False
+
+    def _overloaded(self):
+        # Roughly how long the current queue needs to drain.
+        latency = self.avg_latency or 0.0
+        retry_after = math.ceil(latency * (len(self._waiters) + 1) / max(1, int(self.limit)))
+        return Overloaded(self.service, max(1, retry_after))
+
+    def _give_up(self, waiter):
+        """Called with the lock held when a queued call times out."""
+        self._waiters.remove(waiter)
+        self.counts["timed_out"] += 1
+        return self._overloaded()
+
+    def acquire(self):
+        """Wait (blocking) for a slot, or raise Overloaded."""
+        with self._lock:
+            if self._try_admit():
+                return
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+            self.counts["queued"] += 1
+        if waiter.wait(self.queue_timeout):
+            return
+        with self._lock:
+            if waiter.is_set():
+                return
+            raise self._give_up(waiter)
+
+    async def acquire_async(self):
+        """Wait (without blocking the event loop) for a slot, or raise Overloaded."""
+        with self._lock:
+            if self._try_admit():
+                return
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            self.counts["queued"] += 1
+        try:
+            done, _ = await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter.done() and not waiter.cancelled()
+                if not granted:
+                    waiter.cancel()
+                    self._waiters.remove(waiter)
+            if granted:
+                # release() already handed us a slot; pass it on.
+                self.release(None, True)
+            raise
+        if done:
+            return
+        with self._lock:
+            if waiter.done():
+                return
+            waiter.cancel()
+            raise self._give_up(waiter)
+
+    def release(self, latency, ok):
+        """Free a slot, hand it to the next queued call and adapt the limit."""
+        with self._lock:
+            self._observe(latency, ok)
+            self.in_flight -= 1
+            while self._waiters and self.in_flight < int(self.limit):
+                waiter = self._waiters.popleft()
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                elif waiter.done():
+                    continue
+                else:
+                    waiter.set_result(None)
+                self.in_flight += 1
+                self.counts["admitted"] += 1
+
+    # -- adaptive limit -------------------------------------------------
+    def _observe(self, latency, ok):
+        if ok and latency is not None:
+            if self.avg_latency is None:
+                self.avg_latency = self.baseline = latency
+            self.avg_latency = 0.9 * self.avg_latency + 0.1 * latency
+            self.baseline = 0.99 * self.baseline + 0.01 * latency
+        if not self.adaptive:
+            return
+        if not ok:
+            new_limit = self.limit * self.BACKOFF
+        elif latency and self.baseline:
+            gradient = max(0.5, min(1.0, self.TOLERANCE * self.baseline / latency))
+            new_limit = self.limit * gradient + math.sqrt(self.limit)
+            if new_limit > self.limit and self.in_flight < self.limit / 2:
+                new_limit = self.limit  # not using the current limit; no evidence to raise it
+            new_limit = (1 - self.SMOOTHING) * self.limit + self.SMOOTHING * new_limit
+        else:
+            return
+        self.limit = min(self.max_limit, max(self.min_limit, new_limit))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "limit": int(self.limit),
+                "max_limit": self.max_limit,
+                "adaptive": self.adaptive,
+                "in_flight": self.in_flight,
+                "waiting": len(self._waiters),
+                "queue_size": self.queue_size,
+                "avg_latency_ms": None if self.avg_latency is None else round(self.avg_latency * 1000, 2),
+                **self.counts,
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(service):
+    """Return the service's limiter, or None if its concurrency is unlimited."""
+    if service in _limiters:
+        return _limiters[service]
+    with _limiters_lock:
+        if service not in _limiters:
+            cfg = SERVICE_CONFIG.get(service, {})
+            limit = cfg.get("max_concurrency", 0)
+            _limiters[service] = ConcurrencyLimiter(
+                service,
+                limit,
+                queue_size=cfg.get("queue_size", 50),
+                queue_timeout=cfg.get("queue_timeout_ms", 1000) / 1000.0,
+                adaptive=cfg.get("adaptive_concurrency", False),
+                min_limit=cfg.get("min_concurrency", 1),
+            ) if limit > 0 else None
+        return _limiters[service]
+
+
+def limiter_stats():
+    """Return the state of every active limiter."""
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {service: limiter.stats() for service, limiter in limiters.items() if limiter is not None}
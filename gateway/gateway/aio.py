@@ -0,0 +1,732 @@
+# gateway/gateway/aio.py
+"""
+Asyncio gateway engine.
+
+Serves the same /route/<service> contract as the Flask blueprint in routes.py,
+but upstream calls go through non-blocking httpx clients, so one process can
+keep thousands of requests in flight. Also adds /fanout, which calls several
+services concurrently and merges their responses.
+"""
+import asyncio
+import contextvars
+import functools
+import time
+import httpx
+from starlette.requests import Request
+from starlette.background import BackgroundTask
+from starlette.responses import JSONResponse as _JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from gateway.config import SERVICES, SERVICE_CONFIG, JOB_MAX_WAIT, PASSTHROUGH
+from gateway.logger import logger
+from common.logs import Payload, dropped_records
+from gateway.cache import cache, cache_key, cache_ttl
+from gateway.admission import Overloaded, get_limiter, limiter_stats
+from gateway.registry import registry
+from gateway.metrics import gateway_metrics, in_flight, record, service_label, tracer, upstream_timing
+from common.tracing import TRACE_ID_HEADER
+from common.metrics import CONTENT_TYPE
+from common.streaming import STREAM_HEADERS, stream_type
+from common.codec import JSON, decode, dumps, encode, is_msgpack, negotiate
+from gateway.resilience import CircuitOpenError, get_policy, policy_stats
+from gateway import jobs
+from gateway import embedded
+
+UPSTREAM_HEADERS = {
+    "Content-Type": "application/json",
+    "Accept": "application/json",
+    "User-Agent": "ModelHub-Client/1.0"
+}
+
+# Headers forwarded unchanged on the binary (non-JSON) path.
+BINARY_HEADERS = ("Content-Type", "X-Array-Dtype", "X-Array-Shape")
+# Request headers forwarded on the pass-through path.
+RAW_HEADERS = ("Content-Type", "Accept")
+# Response headers relayed with a body forwarded as the service encoded it.
+ENCODING_HEADERS = ("Content-Encoding", "Vary")
+
+
+class JSONResponse(_JSONResponse):
+    """JSONResponse encoded with the fast JSON backend (common/codec.py)."""
+
+    def render(self, content):
+        return dumps(content)
+
+# (upstream seconds, service seconds) of the current request's service call
+_upstream = contextvars.ContextVar("upstream", default=None)
+
+
+class AsyncUpstreamPool:
+    """A non-blocking keep-alive connection pool to a single service."""
+
+    def __init__(self, service, url, pool_size=10, max_connections=1000,
+                 keep_alive=True, connect_timeout=2.0, read_timeout=5.0):
+        self.service = service
+        self.url = url
+        self.pool_size = pool_size
+        self.max_connections = max_connections
+        self.keep_alive = keep_alive
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=pool_size if keep_alive else 0,
+            ),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout, pool=connect_timeout),
+            mounts={embedded.PREFIX: embedded.AsyncEmbeddedTransport()},
+        )
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    async def post(self, url=None, raw=False, **kwargs):
+        """
+        POST to the service without blocking the event loop. With `raw`, the
+        body is also kept as it was sent (`response.raw_content`), compressed
+        or not; `response.content` is then unavailable.
+        """
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            if not raw:
+                return await self.client.post(url or self.url, **kwargs)
+            request = self.client.build_request("POST", url or self.url, **kwargs)
+            response = await self.client.send(request, stream=True)
+            try:
+                response.raw_content = b"".join([chunk async for chunk in response.aiter_raw()])
+            finally:
+                await response.aclose()
+            return response
+        except httpx.HTTPError:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    async def send_stream(self, content, headers, url=None, timeout=httpx.USE_CLIENT_DEFAULT):
+        """POST a streamed body; the returned response's body is left unread."""
+        request = self.client.build_request("POST", url or self.url, content=content, headers=headers,
+                                            timeout=timeout)
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            return await self.client.send(request, stream=True)
+        except httpx.HTTPError:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    def stats(self):
+        return {
+            "url": self.url,
+            "pool_size": self.pool_size,
+            "max_connections": self.max_connections,
+            "keep_alive": self.keep_alive,
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+        }
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_pools = {}
+
+
+def get_pool(service):
+    """Return the (lazily created) async upstream pool for a service."""
+    if service not in _pools:
+        cfg = SERVICE_CONFIG.get(service, {})
+        _pools[service] = AsyncUpstreamPool(
+            service,
+            SERVICES[service],
+            pool_size=cfg.get("pool_size", 10),
+            max_connections=cfg.get("max_connections", 1000),
+            keep_alive=cfg.get("keep_alive", True),
+            connect_timeout=cfg.get("connect_timeout", 2.0),
+            read_timeout=cfg.get("read_timeout", 5.0),
+        )
+    return _pools[service]
+
+
+async def close_pools():
+    """Close every upstream client (called on application shutdown)."""
+    pools = list(_pools.values())
+    _pools.clear()
+    await asyncio.gather(*(pool.aclose() for pool in pools))
+
+
+async def _send(service, endpoint, path, stream, kwargs):
+    """POST once to one replica, recording the outcome against it."""
+    pool = get_pool(service)
+    ok = False
+    started = time.monotonic()
+    try:
+        if stream is not None:
+            response = await pool.send_stream(stream, kwargs.get("headers"), url=endpoint.url + path,
+                                              timeout=kwargs.get("timeout", httpx.USE_CLIENT_DEFAULT))
+        else:
+            response = await pool.post(url=endpoint.url + path, **kwargs)
+        ok = response.status_code < 500
+        return response
+    except asyncio.CancelledError:
+        ok = None  # the losing half of a hedged call says nothing about the replica
+        raise
+    finally:
+        registry.release(endpoint, ok)
+        if ok:
+            get_policy(service).latency.add(time.monotonic() - started)
+
+
+async def _attempt(service, path, policy, tried, stream, kwargs):
+    """One attempt, hedged to a second replica if it runs past the p95 latency."""
+    endpoint = registry.acquire(service, exclude=tried)
+    tried.append(endpoint)
+    delay = policy.hedge_delay(stream is None) if len(registry.endpoints[service]) > 1 else None
+    if delay is None:
+        return await _send(service, endpoint, path, stream, kwargs)
+
+    primary = asyncio.ensure_future(_send(service, endpoint, path, stream, kwargs))
+    done, _ = await asyncio.wait({primary}, timeout=delay)
+    if done:
+        return primary.result()
+    policy.count("hedges")
+    backup_endpoint = registry.acquire(service, exclude=tried)
+    tried.append(backup_endpoint)
+    backup = asyncio.ensure_future(_send(service, backup_endpoint, path, stream, kwargs))
+
+    pending = {primary, backup}
+    fallback, error = None, None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    response = task.result()
+                except httpx.HTTPError as e:
+                    error = e
+                    continue
+                if response.status_code >= 500:
+                    if fallback is not None:
+                        await fallback.aclose()  # keep one failed answer; free the other's connection
+                    fallback = response
+                    continue
+                if fallback is not None:
+                    await fallback.aclose()
+                if task is backup:
+                    policy.count("hedge_wins")
+                return response
+    finally:
+        for task in pending:
+            task.cancel()  # the losing call is abandoned
+    if fallback is not None:
+        return fallback
+    raise error
+
+
+async def _call_with_policy(service, path, stream, kwargs):
+    """Run one call under the service's resilience policy."""
+    policy = get_policy(service)
+    policy.count("calls")
+    retries = policy.max_retries(stream is None)
+    tried = []
+    for attempt in range(retries + 1):
+        if attempt:
+            policy.count("retries")
+            await asyncio.sleep(policy.backoff(attempt))
+        ticket = policy.breaker.allow()
+        if ticket is None:
+            raise CircuitOpenError(service)
+        try:
+            response = await _attempt(service, path, policy, tried, stream, kwargs)
+        except httpx.HTTPError:
+            policy.breaker.record(ticket, False)
+            if attempt == retries:
+                policy.count("failures")
+                raise
+            continue
+        except Exception:
+            # Any outcome must be recorded, or a half-open trial slot stays taken for good.
+            policy.breaker.record(ticket, False)
+            policy.count("failures")
+            raise
+        except BaseException:  # cancelled (client gone): no outcome to record
+            policy.breaker.cancel(ticket)
+            raise
+        ok = response.status_code < 500
+        policy.breaker.record(ticket, ok)
+        if ok or attempt == retries:
+            if not ok:
+                policy.count("failures")
+            return response
+        await response.aclose()
+
+
+def _release_on_close(response, release):
+    """Call `release` once, when the (streamed) response is closed."""
+    aclose = response.aclose
+
+    async def aclose_and_release():
+        try:
+            await aclose()
+        finally:
+            if response.aclose is aclose_and_release:
+                response.aclose = aclose
+                release()
+
+    response.aclose = aclose_and_release
+
+
+async def _admitted_call(service, path, stream, kwargs):
+    limiter = get_limiter(service)
+    if limiter is None:
+        return await _call_with_policy(service, path, stream, kwargs)
+    with tracer.span("admission"):
+        await limiter.acquire_async()
+    ok = False
+    started = time.monotonic()
+    try:
+        response = await _call_with_policy(service, path, stream, kwargs)
+        ok = response.status_code < 500
+    except BaseException:
+        limiter.release(time.monotonic() - started, ok)
+        raise
+    latency = time.monotonic() - started
+    if stream is not None:
+        # The body is still being relayed: the slot stays taken until it is closed.
+        _release_on_close(response, lambda: limiter.release(latency, ok))
+    else:
+        limiter.release(latency, ok)
+    return response
+
+
+async def call(service, path="", stream=None, **kwargs):
+    """
+    POST to one replica of a service, chosen by the registry, under the
+    service's admission limit and resilience policy (circuit breaker,
+    retries, hedging).
+
+    `path` is appended to the replica's /process URL (e.g. "/batch"). With
+    `stream` (an async byte iterator) the body is streamed, the response body
+    is left unread, and the call is never retried or hedged. Connection errors
+    and 5xx answers count as failures. Raises Overloaded when the call is not
+    admitted and CircuitOpenError while the service's circuit is open.
+
+    The call runs in an "upstream" span whose context is sent to the service
+    in the `traceparent` header.
+    """
+    with tracer.span("upstream", kind="client", target=service, path=path or "/") as span:
+        kwargs["headers"] = tracer.inject(dict(kwargs.get("headers") or {}))
+        response = await _admitted_call(service, path, stream, kwargs)
+        span.set_attribute("http.status_code", response.status_code)
+        return response
+
+
+def upstream_error(service, error):
+    """Map a failed upstream call to (payload, status_code, headers)."""
+    if isinstance(error, Overloaded):
+        logger.warning("🚦 %s overloaded, rejecting request", service)
+        return {"error": "Service overloaded"}, 429, {"Retry-After": str(error.retry_after)}
+    if isinstance(error, CircuitOpenError):
+        logger.warning("🔌 Circuit open for %s, failing fast", service)
+    else:
+        logger.error("🚨 Error calling %s: %s", service, error)
+    return {"error": "Service unavailable"}, 503, {}
+
+
+async def call_service(service, data, path=""):
+    """Call a service and return (payload, status_code, headers)."""
+    try:
+        response = await call(service, path, content=dumps(data), headers=UPSTREAM_HEADERS)
+        _upstream.set(upstream_timing(response))
+        response.raise_for_status()
+    except (Overloaded, CircuitOpenError, httpx.HTTPError) as e:
+        return upstream_error(service, e)
+    try:
+        return decode(response.content), response.status_code, {}
+    except ValueError as e:
+        logger.error("🚨 Invalid response from %s: %s", service, e)
+        return {"error": "Invalid response from service"}, 502, {}
+
+
+def request_mimetype(request: Request):
+    return request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+
+def is_json(request: Request):
+    mimetype = request_mimetype(request)
+    return not mimetype or mimetype == "application/json" or mimetype.endswith("+json")
+
+
+async def read_payload(request: Request):
+    """Decode the JSON or MessagePack request body; None if it is invalid."""
+    with tracer.span("parse_json"):
+        try:
+            return decode(await request.body(), request_mimetype(request))
+        except ValueError:
+            return None
+
+
+def payload_response(request: Request, payload, status_code=200, headers=None):
+    """A response for `payload`, encoded as the request's Accept header asks."""
+    mimetype = negotiate(request.headers.get("accept"))
+    return Response(encode(payload, mimetype), status_code=status_code, headers=headers, media_type=mimetype)
+
+
+async def forward_raw(service, request: Request, path=""):
+    """
+    Pass-through: send the request body to the service and its answer back
+    as bytes, without decoding or re-encoding either of them. A compressed
+    answer stays compressed: the caller's Accept-Encoding goes to the service.
+    """
+    headers = {h: request.headers[h] for h in RAW_HEADERS if h in request.headers}
+    headers["User-Agent"] = "ModelHub-Client/1.0"
+    headers["Accept-Encoding"] = request.headers.get("accept-encoding", "identity")
+    try:
+        response = await call(service, path, content=await request.body(), headers=headers, raw=True)
+        _upstream.set(upstream_timing(response))
+        response.raise_for_status()
+    except (Overloaded, CircuitOpenError, httpx.HTTPError) as e:
+        payload, status, error_headers = upstream_error(service, e)
+        return JSONResponse(payload, status_code=status, headers=error_headers)
+
+    logger.info("✅ Successfully routed request to %s", service)
+    out_headers = {h: response.headers[h] for h in ENCODING_HEADERS if h in response.headers}
+    return Response(response.raw_content, status_code=response.status_code, headers=out_headers,
+                    media_type=response.headers.get("content-type", JSON))
+
+
+async def forward_binary(service, request: Request):
+    """
+    Stream a non-JSON body (arrays, images, ...) to the service and the answer
+    back to the caller without decoding or buffering either of them.
+    """
+    headers = {h: request.headers[h] for h in BINARY_HEADERS if h in request.headers}
+    headers["User-Agent"] = "ModelHub-Client/1.0"
+    headers["Accept-Encoding"] = request.headers.get("accept-encoding", "identity")
+    if "content-length" in request.headers:
+        headers["Content-Length"] = request.headers["content-length"]
+
+    started = time.monotonic()
+    try:
+        response = await call(service, stream=request.stream(), headers=headers)
+        # A streamed httpx response has no `elapsed` until it is closed; time it here.
+        _upstream.set(upstream_timing(response, elapsed=time.monotonic() - started))
+    except (Overloaded, CircuitOpenError, httpx.HTTPError) as e:
+        payload, status, error_headers = upstream_error(service, e)
+        return JSONResponse(payload, status_code=status, headers=error_headers)
+    if response.is_client_error:
+        # The caller's mistake (e.g. an invalid X-Array-Dtype): pass the service's answer on.
+        try:
+            body = await response.aread()
+        finally:
+            await response.aclose()
+        return Response(body, status_code=response.status_code, media_type=response.headers.get("content-type", JSON))
+    if response.is_error:
+        await response.aclose()
+        logger.error("🚨 Error calling %s: HTTP %s", service, response.status_code)
+        return JSONResponse({"error": "Service unavailable"}, status_code=503)
+
+    logger.info("✅ Streaming binary response from %s", service)
+    out_headers = {h: response.headers[h] for h in BINARY_HEADERS + ENCODING_HEADERS if h in response.headers}
+    return StreamingResponse(
+        response.aiter_raw(),
+        status_code=response.status_code,
+        headers=out_headers,
+        background=BackgroundTask(response.aclose),
+    )
+
+
+async def forward_stream(service, request: Request, mimetype):
+    """
+    Relay a streamed (SSE / NDJSON) answer chunk by chunk, as the service
+    produces it, without buffering it in the gateway.
+    """
+    headers = {**UPSTREAM_HEADERS, "Content-Type": request.headers.get("content-type", JSON), "Accept": mimetype}
+    started = time.monotonic()
+    try:
+        response = await call(service, stream=await request.body(), headers=headers)
+        _upstream.set(upstream_timing(response, elapsed=time.monotonic() - started))
+    except (Overloaded, CircuitOpenError, httpx.HTTPError) as e:
+        payload, status, error_headers = upstream_error(service, e)
+        return JSONResponse(payload, status_code=status, headers=error_headers)
+    if response.is_error:
+        await response.aclose()
+        logger.error("🚨 Error calling %s: HTTP %s", service, response.status_code)
+        return JSONResponse({"error": "Service unavailable"}, status_code=503)
+
+    logger.info("📡 Streaming response from %s", service)
+    out_headers = {h: response.headers[h] for h in STREAM_HEADERS if h in response.headers}
+    return StreamingResponse(
+        response.aiter_raw(),
+        status_code=response.status_code,
+        headers=out_headers,
+        background=BackgroundTask(response.aclose),
+    )
+
+
+def instrumented(handler):
+    """Record request metrics and a server span, and add Server-Timing and X-Trace-Id headers."""
+    @functools.wraps(handler)
+    async def wrapper(request: Request):
+        service = request.path_params.get("service", "fanout")
+        gauge = in_flight.labels(service=service_label(service))
+        gateway_metrics.start_flushing()
+        gauge.inc()
+        started = time.perf_counter()
+        _upstream.set(None)
+        try:
+            with tracer.span(f"POST {request.url.path}", parent=tracer.extract(request.headers),
+                             kind="server") as span:
+                response = await handler(request)
+                span.set_attribute("http.status_code", response.status_code)
+        finally:
+            gauge.dec()
+        response.headers[TRACE_ID_HEADER] = span.trace_id
+        content_length = request.headers.get("content-length")
+        response.headers["Server-Timing"] = record(
+            service, response.status_code, time.perf_counter() - started, _upstream.get(),
+            request_size=int(content_length) if content_length else None,
+            response_size=None if isinstance(response, StreamingResponse) else len(response.body),
+        )
+        return response
+    return wrapper
+
+
+@instrumented
+async def route_request(request: Request):
+    service = request.path_params["service"]
+    logger.info("🔍 Received request for %s", service)
+
+    if service not in SERVICES:
+        logger.warning("❌ Service %s not found", service)
+        return JSONResponse({"error": "Service not found"}, status_code=404)
+
+    if not is_json(request) and not is_msgpack(request_mimetype(request)):
+        return await forward_binary(service, request)
+
+    mimetype = stream_type(request.headers.get("accept"))
+    if mimetype is not None:
+        return await forward_stream(service, request, mimetype)
+    ttl = cache_ttl(service)
+    if ttl is None and PASSTHROUGH:
+        return await forward_raw(service, request)
+
+    # The body is read to build the cache key, but sent on as it came.
+    data = await read_payload(request)
+    if data is None:
+        return JSONResponse({"error": "Invalid request body"}, status_code=400)
+    logger.debug("📩 Data: %s", Payload(data))
+    key = None if ttl is None else cache_key(service, data, await request.body(), request_mimetype(request),
+                                             request.headers.get("content-encoding"))
+    if key is None:
+        # Nothing to cache: relay the answer with the service's Content-Type and Content-Encoding.
+        return await forward_raw(service, request)
+    cached = cache.get(key)
+    if cached is not None:
+        logger.info("⚡ Cache hit for %s", service)
+        return payload_response(request, cached[0], cached[1], {"X-Cache": "HIT"})
+
+    headers = {**UPSTREAM_HEADERS, "Content-Type": request.headers.get("content-type", JSON)}
+    try:
+        response = await call(service, content=await request.body(), headers=headers)
+        _upstream.set(upstream_timing(response))
+        response.raise_for_status()
+    except (Overloaded, CircuitOpenError, httpx.HTTPError) as e:
+        payload, status, error_headers = upstream_error(service, e)
+        return JSONResponse(payload, status_code=status, headers=error_headers)
+
+    logger.info("✅ Successfully routed request to %s", service)
+    try:
+        payload = decode(response.content)
+    except ValueError as e:
+        logger.error("🚨 Invalid response from %s: %s", service, e)
+        return JSONResponse({"error": "Invalid response from service"}, status_code=502)
+    cache.set(key, payload, response.status_code, ttl)
+    if negotiate(request.headers.get("accept")) == JSON:
+        # Already encoded the way the caller wants it.
+        return Response(response.content, status_code=response.status_code, media_type=JSON,
+                        headers={"X-Cache": "MISS"})
+    return payload_response(request, payload, response.status_code, {"X-Cache": "MISS"})
+
+
+@instrumented
+async def route_batch(request: Request):
+    service = request.path_params["service"]
+    logger.info("🔍 Received batch request for %s", service)
+
+    if service not in SERVICES:
+        logger.warning("❌ Service %s not found", service)
+        return JSONResponse({"error": "Service not found"}, status_code=404)
+
+    data = await read_payload(request)
+    inputs = data.get("inputs") if isinstance(data, dict) else None
+    if not isinstance(inputs, list):
+        return JSONResponse({"error": "'inputs' must be a list"}, status_code=400)
+
+    max_batch_size = SERVICE_CONFIG.get(service, {}).get("max_batch_size", 1024)
+    if len(inputs) > max_batch_size:
+        logger.warning("❌ Batch of %s exceeds limit %s for %s", len(inputs), max_batch_size, service)
+        return JSONResponse({"error": f"Batch too large (max {max_batch_size})"}, status_code=413)
+
+    # Checked; the body and the answer are forwarded as they are.
+    logger.info("📦 Routing batch of %s to %s", len(inputs), service)
+    return await forward_raw(service, request, "/batch")
+
+
+@instrumented
+async def fanout(request: Request):
+    """
+    Call several services concurrently with the same payload.
+
+    The body is the payload sent to every service, plus an optional
+    "services" list (defaults to every service in GATEWAY_SERVICES).
+    """
+    data = await read_payload(request)
+    if not isinstance(data, dict):
+        return JSONResponse({"error": "Invalid request body"}, status_code=400)
+    services = data.pop("services", None) or list(SERVICES)
+
+    unknown = [s for s in services if s not in SERVICES]
+    if unknown:
+        logger.warning("❌ Services %s not found", unknown)
+        return JSONResponse({"error": "Service not found", "services": unknown}, status_code=404)
+
+    logger.info("🔀 Fanning out request to %s", services)
+    responses = await asyncio.gather(*(call_service(s, data) for s in services))
+
+    results, errors = {}, {}
+    for service, (payload, status, _) in zip(services, responses):
+        if status < 400:
+            results[service] = payload
+        else:
+            errors[service] = payload.get("error", "Service unavailable")
+
+    status = 200 if results else 503
+    return JSONResponse({"results": results, "errors": errors}, status_code=status)
+
+
+def job_sender(loop):
+    """
+    Job workers are threads; run their service calls on the event loop `loop`
+    so they share the async pools, admission limits and circuit breakers.
+    """
+    def send(service, path, body, headers, timeout):
+        cfg = SERVICE_CONFIG.get(service, {})
+        span = tracer.current_span()  # the job span, opened in the worker thread
+
+        async def send_job():
+            tracer.activate(span)
+            # Sent as a stream so it is never hedged: a duplicate of a long call doubles its cost.
+            response = await call(service, path, stream=body, headers=headers,
+                                  timeout=httpx.Timeout(timeout, connect=cfg.get("connect_timeout", 2.0)))
+            try:
+                return response.status_code, response.headers, await response.aread()
+            finally:
+                await response.aclose()
+
+        future = asyncio.run_coroutine_threadsafe(send_job(), loop)
+        return future.result(timeout + cfg.get("connect_timeout", 2.0) + 5)
+    return send
+
+
+async def submit_job(request: Request, path=""):
+    service = request.path_params["service"]
+    if service not in SERVICES:
+        logger.warning("❌ Service %s not found", service)
+        return JSONResponse({"error": "Service not found"}, status_code=404)
+
+    headers = {h: request.headers[h] for h in jobs.JOB_HEADERS if h in request.headers}
+    record = jobs.submit(service, path, await request.body(), headers)
+    logger.info("🧾 Queued job %s for %s", record["id"], service)
+    return JSONResponse(jobs.public(record), status_code=202, headers={"Location": f"/jobs/{record['id']}"})
+
+
+async def job_request(request: Request):
+    return await submit_job(request)
+
+
+async def job_batch(request: Request):
+    return await submit_job(request, "/batch")
+
+
+async def job_status(request: Request):
+    """Job state; `?wait=N` holds the request until the job finishes (at most N seconds)."""
+    job_id = request.path_params["job_id"]
+    try:
+        timeout = min(float(request.query_params.get("wait", 0)), JOB_MAX_WAIT)
+    except ValueError:
+        return JSONResponse({"error": "'wait' must be a number of seconds"}, status_code=400)
+    record = await jobs.wait_async(job_id, timeout) if timeout > 0 else jobs.store.load(job_id)
+    if record is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    return JSONResponse(jobs.public(record))
+
+
+async def job_result(request: Request):
+    """The service's answer, as it would have been returned by /route (202 while pending)."""
+    job_id = request.path_params["job_id"]
+    record = jobs.store.load(job_id)
+    if record is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    if record["status"] == "cancelled":
+        return JSONResponse({"error": "Job cancelled"}, status_code=409)
+    if record["status"] not in jobs.FINISHED:
+        return JSONResponse(jobs.public(record), status_code=202)
+    if record["result_headers"] is not None:
+        body = await asyncio.to_thread(jobs.store.read_data, job_id, "out")
+        return Response(body, status_code=record["status_code"], headers=record["result_headers"])
+    return JSONResponse(record["result"], status_code=record["status_code"])
+
+
+async def job_cancel(request: Request):
+    job_id = request.path_params["job_id"]
+    record = jobs.store.load(job_id)
+    if record is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    if not jobs.store.cancel(record):
+        return JSONResponse({"error": f"Job is {record['status']}"}, status_code=409)
+    logger.info("🗑️ Cancelled job %s", job_id)
+    return JSONResponse(jobs.public(record))
+
+
+async def stats(request: Request):
+    """Expose gateway runtime statistics (upstream pool usage, ...)."""
+    return JSONResponse({
+        "pool": {s: p.stats() for s, p in _pools.items()},
+        "registry": registry.stats(),
+        "resilience": policy_stats(),
+        "admission": limiter_stats(),
+        "cache": cache.stats(),
+        "jobs": jobs.runner.stats(),
+        "logging": {"dropped": dropped_records()},
+    })
+
+
+async def ready(request: Request):
+    """Readiness probe: the gateway is accepting requests (used by start_local.py)."""
+    return JSONResponse({"status": "ready", "service": "gateway"})
+
+
+async def metrics_endpoint(request: Request):
+    """Expose request metrics in the Prometheus text format."""
+    return Response(gateway_metrics.render(), media_type=CONTENT_TYPE)
+
+
+routes = [
+    Route("/route/{service}", route_request, methods=["POST"]),
+    Route("/route/{service}/batch", route_batch, methods=["POST"]),
+    Route("/fanout", fanout, methods=["POST"]),
+    Route("/jobs/{service}", job_request, methods=["POST"]),
+    Route("/jobs/{service}/batch", job_batch, methods=["POST"]),
+    Route("/jobs/{job_id}", job_status, methods=["GET"]),
+    Route("/jobs/{job_id}", job_cancel, methods=["DELETE"]),
+    Route("/jobs/{job_id}/result", job_result, methods=["GET"]),
+    Route("/stats", stats, methods=["GET"]),
+    Route("/ready", ready, methods=["GET"]),
+    Route("/metrics", metrics_endpoint, methods=["GET"]),
+]
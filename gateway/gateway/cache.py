@@ -0,0 +1,180 @@
+# gateway/gateway/cache.py
+"""
+Gateway response cache.
+
+Responses are keyed by the service name plus a canonical hash of the JSON
+request body (MessagePack bodies: a hash of the bytes as sent, with their
+content type and encoding), and kept for the service's `cache_ttl`. Entries live in a
+bounded in-memory LRU; with the "disk" backend they are also written under
+DATA_DIR/gateway/cache so several gateway workers share hits.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from common.codec import is_msgpack
+from gateway.config import CACHE_SIZE, CACHE_BACKEND, DATA_DIR, SERVICE_CONFIG
+
+
+def cache_key(service, data, body=b"", content_type=None, content_encoding=None):
+    """
+    Build a cache key from the service name and a canonical hash of the decoded
+    JSON body `data`, or None when it cannot be canonicalised (not cached).
+    MessagePack bodies are keyed on their raw `body` bytes instead.
+    """
+    if is_msgpack(content_type):
+        digest = hashlib.sha256(f"{service}\0{content_type}\0{content_encoding or ''}\0".lower().encode("utf-8"))
+        digest.update(body)
+        return digest.hexdigest()
+    try:
+        canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha256(f"{service}\0{canonical}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """A TTL + LRU response cache with an optional shared on-disk backend."""
+
+    SWEEP_EVERY = 256  # disk stores between sweeps of expired files
+
+    def __init__(self, max_entries=1024, disk_dir=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+        self._entries = OrderedDict()  # key -> (expires_at, payload, status)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.skipped = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Return a cached (payload, status) pair, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1], entry[2]
+                del self._entries[key]
+                self.expirations += 1
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._insert(key, entry)
+        return entry[1], entry[2]
+
+    def set(self, key, payload, status, ttl):
+        """Store a response for `ttl` seconds; payloads that are not JSON-serialisable are not cached."""
+        entry = (time.time() + ttl, payload, status)
+        try:
+            # Also what the disk backend writes, and what every cached payload must survive.
+            record = json.dumps({"expires_at": entry[0], "payload": payload, "status": status})
+        except (TypeError, ValueError):
+            with self._lock:
+                self.skipped += 1
+            return
+        with self._lock:
+            self.stores += 1
+            self._insert(key, entry)
+            sweep = self.disk_dir and self.stores % self.SWEEP_EVERY == 0
+        self._write_disk(key, record)
+        if sweep:
+            self.sweep_disk()
+
+    def _insert(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key, now):
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if record["expires_at"] <= now:
+            self._remove(path)
+            with self._lock:
+                self.expirations += 1
+            return None
+        return record["expires_at"], record["payload"], record["status"]
+
+    def _write_disk(self, key, record):
+        if not self.disk_dir:
+            return
+        # Write to a temp file and rename, so other workers never read a partial entry.
+        fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(record)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            self._remove(tmp_path)
+
+    def sweep_disk(self):
+        """Delete expired entries from the disk backend."""
+        now = time.time()
+        for name in os.listdir(self.disk_dir):
+            if name.endswith(".json"):
+                self._read_disk(name[:-len(".json")], now)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "disk" if self.disk_dir else "memory",
+                "max_entries": self.max_entries,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "skipped": self.skipped,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def cache_ttl(service):
+    """Return the cache TTL for a service, or None when caching is disabled for it."""
+    cfg = SERVICE_CONFIG.get(service, {})
+    if not cfg.get("cache", False):
+        return None
+    return cfg.get("cache_ttl", 60.0)
+
+
+cache = ResponseCache(
+    max_entries=CACHE_SIZE,
+    disk_dir=os.path.join(DATA_DIR, "gateway", "cache") if CACHE_BACKEND == "disk" else None,
+)
@@ -4,7 +4,23 @@ from config import CONFIG
 DOCKER_MODE = CONFIG["DOCKER_MODE"]
 GATEWAY_PORT = CONFIG["GATEWAY_PORT"]
 LOG_LEVEL = CONFIG["GATEWAY_LOG_LEVEL"]
+ENGINE = CONFIG["GATEWAY_ENGINE"]
+SERVING_MODE = CONFIG["SERVING_MODE"]
+WORKERS = CONFIG["GATEWAY_WORKERS"]
+THREADS = CONFIG["GATEWAY_THREADS"]
+CACHE_SIZE = CONFIG["GATEWAY_CACHE_SIZE"]
+CACHE_BACKEND = CONFIG["GATEWAY_CACHE_BACKEND"]
 DATA_DIR = CONFIG["DATA_DIR"]
 SERVICES = CONFIG["GATEWAY_SERVICES"]
+SERVICE_ENDPOINTS = CONFIG["SERVICE_ENDPOINTS"]
+HEALTH_INTERVAL = CONFIG["GATEWAY_HEALTH_INTERVAL"]
+HEALTH_TIMEOUT = CONFIG["GATEWAY_HEALTH_TIMEOUT"]
+HEALTH_EJECT_AFTER = CONFIG["GATEWAY_HEALTH_EJECT_AFTER"]
+PASSTHROUGH = CONFIG["GATEWAY_PASSTHROUGH"]
+SERVICE_CONFIG = CONFIG["SERVICE_CONFIG"]
+JOB_WORKERS = CONFIG["GATEWAY_JOB_WORKERS"]
+JOB_TIMEOUT = CONFIG["GATEWAY_JOB_TIMEOUT"]
+JOB_TTL = CONFIG["GATEWAY_JOB_TTL"]
+JOB_MAX_WAIT = CONFIG["GATEWAY_JOB_MAX_WAIT"]
 
 print("Gateway SERVICES configuration:", SERVICES)
\ No newline at end of file
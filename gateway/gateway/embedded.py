@@ -0,0 +1,261 @@
+# gateway/gateway/embedded.py
+"""
+Embedded services: co-located services run inside the gateway process.
+
+A service with `<SERVICE>_MODE=embedded` is not reached over the network.
+The gateway imports the service's own Flask app (services/<name>/app.py)
+and calls it through WSGI, in the calling thread. The service sees the same
+requests and sends the same answers as over HTTP (status, headers, body,
+streaming, compression); only the loopback socket and the HTTP parsing on
+both sides are gone.
+
+The service's endpoint is `embedded://<service>/process`. requests sessions
+(`mount`) and httpx clients (`AsyncEmbeddedTransport`) send that scheme to
+the app, so the registry, resilience policies, admission control and tracing
+treat it like any other replica. Timeouts do not apply to embedded calls.
+
+Each gateway worker process loads its own copy of a service on first use and
+runs its startup hooks (common/lifecycle.py) before the first call. The
+service's dependencies must be installed where the gateway runs, and its
+compute tasks run inline, without a process pool.
+"""
+import asyncio
+import contextvars
+import importlib.util
+import os
+import sys
+import threading
+from urllib.parse import urlsplit
+import httpx
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from werkzeug.test import EnvironBuilder, run_wsgi_app
+from config import CONFIG
+from common import compute
+from gateway.logger import logger
+
+SCHEME = "embedded"
+PREFIX = f"{SCHEME}://"
+SERVICES_DIR = os.path.join(CONFIG["BASE_DIR"], "services")
+
+_modules = {}  # service -> its imported app.py module
+_started = {}  # service -> pid whose startup hooks have run
+_lock = threading.Lock()
+
+
+def _is_service_module(name):
+    return name == "service" or name.startswith("service.")
+
+
+def _import_app(service):
+    """Import services/<service>/app.py without clashing with other services' modules."""
+    path = os.path.join(SERVICES_DIR, service)
+    # The gateway's workers run many threads, which makes forking them unsafe:
+    # embedded services run their compute tasks (common/compute.py) inline.
+    compute.force_inline()
+    # Every service keeps its code in a package called `service`: set aside the
+    # modules another service loaded under that name, then put them back.
+    saved = {name: sys.modules.pop(name) for name in list(sys.modules) if _is_service_module(name)}
+    sys.path.insert(0, path)
+    try:
+        spec = importlib.util.spec_from_file_location(f"{service}_app", os.path.join(path, "app.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(path)
+        for name in [name for name in sys.modules if _is_service_module(name)]:
+            del sys.modules[name]
+        sys.modules.update(saved)
+    logger.info("🧩 Embedded %s from %s", service, path)
+    return module
+
+
+def load(service):
+    """Return a service's Flask app, importing it and running its startup hooks first if needed."""
+    module = _modules.get(service)
+    if module is not None and _started.get(service) == os.getpid():
+        return module.app
+    with _lock:
+        if service not in _modules:
+            _modules[service] = _import_app(service)
+        module = _modules[service]
+        if _started.get(service) != os.getpid():
+            module.lifecycle.start()
+            _started[service] = os.getpid()
+    return module.app
+
+
+def _environ(method, url, headers, body):
+    """The WSGI environ of a request to an embedded service."""
+    parts = urlsplit(url)
+    stream = body if hasattr(body, "read") else None
+    if stream is not None or body is None:
+        data = b""
+    elif isinstance(body, str):
+        data = body.encode("utf-8")
+    elif isinstance(body, (bytes, bytearray)):
+        data = body
+    else:
+        data = b"".join(body)
+    headers = [(k, v) for k, v in headers if k.lower() not in ("host", "transfer-encoding")]
+    environ = EnvironBuilder(path=parts.path, query_string=parts.query, method=method, headers=headers,
+                             base_url=f"http://{parts.netloc}/", data=data).get_environ()
+    if stream is not None:
+        # Streamed straight into the service; without a Content-Length it reads to the end.
+        length = next((v for k, v in headers if k.lower() == "content-length"), None)
+        environ["wsgi.input"] = stream
+        if length is not None:
+            environ["CONTENT_LENGTH"] = str(length)
+        environ["wsgi.input_terminated"] = length is None
+    return environ
+
+
+class _WSGIBody:
+    """File-like view of a WSGI response iterable."""
+
+    def __init__(self, app_iter):
+        self._app_iter = app_iter
+        self._chunks = iter(app_iter)
+        self._buffer = b""
+        self.closed = False
+
+    def chunks(self):
+        """Yield the body as the app produces it."""
+        if self._buffer:
+            yield self._buffer
+            self._buffer = b""
+        for chunk in self._chunks:
+            if chunk:
+                yield chunk
+        self.close()
+
+    def read(self, amt=None):
+        if amt is None or amt < 0:
+            return b"".join(self.chunks())
+        while not self._buffer and not self.closed:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self.close()
+            else:
+                self._buffer = chunk
+        data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        return data
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            close = getattr(self._app_iter, "close", None)
+            if close is not None:
+                close()
+
+
+class _WSGIResponse(urllib3.HTTPResponse):
+    """
+    urllib3 response over a WSGI body. `stream()` yields each chunk as soon as
+    the app produces it (like a chunked HTTP answer), so SSE / NDJSON answers
+    are relayed as they come.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.chunked = True
+
+    def supports_chunked_reads(self):
+        return True
+
+    def read_chunked(self, amt=None, decode_content=None):
+        if decode_content is None:
+            decode_content = self.decode_content
+        self._init_decoder()
+        for chunk in self._fp.chunks():
+            data = self._decode(chunk, decode_content, flush_decoder=False)
+            if data:
+                yield data
+        if decode_content:
+            data = self._flush_decoder()
+            if data:
+                yield data
+
+
+class EmbeddedAdapter(HTTPAdapter):
+    """requests transport adapter that sends `embedded://<service>/...` to the service's app."""
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        try:
+            app = load(urlsplit(request.url).netloc)
+            app_iter, status, headers = run_wsgi_app(
+                app, _environ(request.method, request.url, request.headers.items(), request.body)
+            )
+        except Exception as e:
+            raise requests.exceptions.ConnectionError(e, request=request)
+        code, _, reason = status.partition(" ")
+        raw = _WSGIResponse(
+            body=_WSGIBody(app_iter),
+            headers=urllib3.HTTPHeaderDict(headers.to_wsgi_list()),
+            status=int(code),
+            reason=reason,
+            preload_content=False,
+            request_method=request.method,
+            request_url=request.url,
+        )
+        return self.build_response(request, raw)
+
+
+def mount(session):
+    """Route a requests session's `embedded://` URLs to the embedded services."""
+    session.mount(PREFIX, EmbeddedAdapter())
+    return session
+
+
+# Readiness probes of embedded replicas (see registry.py)
+session = mount(requests.Session())
+
+
+class _AsyncWSGIBody(httpx.AsyncByteStream):
+    """A WSGI response iterable read from worker threads, one chunk at a time."""
+
+    def __init__(self, app_iter, context):
+        self._app_iter = app_iter
+        self._chunks = iter(app_iter)
+        self._context = context
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, self._context.run, fn, *args)
+
+    async def __aiter__(self):
+        while True:
+            chunk = await self._run(next, self._chunks, None)
+            if chunk is None:
+                return
+            if chunk:
+                yield chunk
+
+    async def aclose(self):
+        close = getattr(self._app_iter, "close", None)
+        if close is not None:
+            await self._run(close)
+
+
+class AsyncEmbeddedTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport for `embedded://<service>/...`: the service's app runs in
+    the event loop's default executor, so its handlers never block the loop.
+    """
+
+    async def handle_async_request(self, request):
+        body = await request.aread()
+        # One context for the whole exchange, so the app's context variables
+        # (Flask, tracing) carry over from one chunk to the next.
+        context = contextvars.copy_context()
+
+        def start():
+            app = load(request.url.host)
+            return run_wsgi_app(app, _environ(request.method, str(request.url), request.headers.multi_items(), body))
+
+        try:
+            app_iter, status, headers = await asyncio.get_running_loop().run_in_executor(None, context.run, start)
+        except Exception as e:
+            raise httpx.ConnectError(str(e), request=request) from e
+        return httpx.Response(int(status.partition(" ")[0]), headers=headers.to_wsgi_list(),
+                              stream=_AsyncWSGIBody(app_iter, context), request=request)
@@ -0,0 +1,338 @@
+# gateway/gateway/jobs.py
+"""
+Asynchronous jobs: long-running calls decoupled from HTTP request lifetimes.
+
+`POST /jobs/<service>` stores the request body and queues a job;
+`GET /jobs/<id>` reports its state (optionally long-polling until it is
+finished) and `GET /jobs/<id>/result` returns the service's answer.
+
+Everything lives on disk under DATA_DIR/gateway/jobs, which acts as a local
+broker shared by every gateway worker process:
+
+    records/<id>.json     job state, written atomically
+    data/<id>.in|.out     request body and non-JSON result
+    queue/<ns>-<id>       queued jobs, oldest first
+    running/<ns>-<id>.<pid>
+
+A job is claimed by renaming its queue entry into running/ (atomic, so each
+job runs once), and each gateway process runs JOB_WORKERS threads doing so.
+Jobs of a process that dies are put back in the queue; finished jobs are
+kept for JOB_TTL seconds.
+"""
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from gateway.config import DATA_DIR, JOB_WORKERS, JOB_TIMEOUT, JOB_TTL
+from gateway.logger import logger
+from gateway.admission import Overloaded
+from gateway.metrics import tracer
+from gateway.resilience import CircuitOpenError
+from common.tracing import TRACEPARENT
+
+# Headers kept with a non-JSON result and returned with it
+RESULT_HEADERS = ("Content-Type", "X-Array-Dtype", "X-Array-Shape")
+# Request headers stored with a job and sent to the service; the job runs
+# in a "job" span under the submitter's trace.
+JOB_HEADERS = RESULT_HEADERS + (TRACEPARENT,)
+
+FINISHED = ("done", "failed", "cancelled")
+MAX_ATTEMPTS = 3      # runs of a job whose worker process died
+POLL_INTERVAL = 0.2   # seconds between queue / status checks
+SWEEP_INTERVAL = 60
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobStore:
+    """Job records, payloads and the directory-based queue."""
+
+    def __init__(self, root, ttl=JOB_TTL):
+        self.root = root
+        self.ttl = ttl
+        for name in ("records", "data", "queue", "running"):
+            os.makedirs(os.path.join(root, name), exist_ok=True)
+
+    def _path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    # -- records --------------------------------------------------------
+    def save(self, record):
+        fd, tmp_path = tempfile.mkstemp(dir=self._path("records"), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(record, f)
+        os.replace(tmp_path, self._path("records", f"{record['id']}.json"))
+
+    def load(self, job_id):
+        """Return a job record, or None for an unknown (or invalid) ID."""
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(self._path("records", f"{job_id}.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def read_data(self, job_id, suffix):
+        with open(self._path("data", f"{job_id}.{suffix}"), "rb") as f:
+            return f.read()
+
+    def write_data(self, job_id, suffix, body):
+        with open(self._path("data", f"{job_id}.{suffix}"), "wb") as f:
+            f.write(body)
+
+    # -- queue ----------------------------------------------------------
+    def submit(self, service, path, body, headers):
+        """Store a request and queue it; returns the new job record."""
+        job_id = uuid.uuid4().hex
+        record = {
+            "id": job_id,
+            "service": service,
+            "path": path,
+            "status": "queued",
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+            "attempts": 0,
+            "headers": {h: headers[h] for h in JOB_HEADERS if h in headers},
+            "status_code": None,
+            "result": None,        # JSON answers
+            "result_headers": None,  # set for non-JSON answers, stored in data/<id>.out
+            "error": None,
+        }
+        self.write_data(job_id, "in", body)
+        self.save(record)
+        open(self._path("queue", f"{time.time_ns()}-{job_id}"), "w").close()
+        return record
+
+    def claim(self):
+        """Take the oldest queued job; returns (record, running entry) or None."""
+        for name in sorted(os.listdir(self._path("queue"))):
+            entry = self._path("running", f"{name}.{os.getpid()}")
+            try:
+                os.rename(self._path("queue", name), entry)
+            except FileNotFoundError:
+                continue  # claimed by another worker
+            record = self.load(name.partition("-")[2])
+            if record is None or record["status"] in FINISHED:
+                os.remove(entry)
+                continue
+            return record, entry
+        return None
+
+    def requeue(self, entry):
+        """Put a claimed job back at its original place in the queue."""
+        name = os.path.basename(entry).rsplit(".", 1)[0]
+        os.rename(entry, self._path("queue", name))
+
+    def cancel(self, record):
+        """Cancel a queued job; returns False if it already started."""
+        for name in os.listdir(self._path("queue")):
+            if name.endswith(record["id"]):
+                try:
+                    os.remove(self._path("queue", name))
+                except FileNotFoundError:
+                    return False
+                record.update(status="cancelled", finished=time.time())
+                self.save(record)
+                return True
+        return False
+
+    def recover(self):
+        """Requeue the jobs of gateway processes that died while running them."""
+        for name in os.listdir(self._path("running")):
+            pid = name.rsplit(".", 1)[1]
+            if not pid.isdigit() or _alive(int(pid)):
+                continue
+            record = self.load(name.partition("-")[2].rsplit(".", 1)[0])
+            entry = self._path("running", name)
+            if record is not None and record["attempts"] >= MAX_ATTEMPTS:
+                record.update(status="failed", finished=time.time(), status_code=503,
+                              result={"error": "Worker died while running the job"},
+                              error="Worker died while running the job")
+                self.save(record)
+                os.remove(entry)
+                continue
+            logger.warning("♻️ Requeueing job %s from dead worker %s", name, pid)
+            self.requeue(entry)
+
+    def sweep(self):
+        """Delete finished jobs older than the TTL."""
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self._path("records")):
+            job_id = name.rsplit(".", 1)[0]
+            record = self.load(job_id)
+            if record is None or record["status"] not in FINISHED or record["finished"] > cutoff:
+                continue
+            for path in (self._path("records", name), self._path("data", f"{job_id}.in"),
+                         self._path("data", f"{job_id}.out")):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def depth(self):
+        return {"queued": len(os.listdir(self._path("queue"))), "running": len(os.listdir(self._path("running")))}
+
+
+class JobRunner:
+    """
+    A pool of worker threads running queued jobs, started once per gateway
+    process. `send(service, path, body, headers, timeout)` makes the service
+    call for the engine in use and returns (status_code, headers, body); it
+    raises Overloaded or CircuitOpenError like the engine's `call`.
+    """
+
+    def __init__(self, store, workers=JOB_WORKERS, timeout=JOB_TIMEOUT):
+        self.store = store
+        self.workers = workers
+        self.timeout = timeout
+        self.send = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self.counts = {"completed": 0, "failed": 0, "requeued": 0}
+
+    def start(self, send):
+        # Started lazily (and again after a fork) so every gateway worker runs jobs.
+        if self.workers <= 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.send = send
+        for i in range(self.workers):
+            threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True).start()
+        threading.Thread(target=self._maintain, name="job-maintenance", daemon=True).start()
+        logger.info("🧾 Started %s job workers", self.workers)
+
+    def notify(self):
+        """Wake an idle worker in this process (others find the job by polling)."""
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            claimed = self.store.claim()
+            if claimed is None:
+                self._wake.wait(POLL_INTERVAL)
+                self._wake.clear()
+                continue
+            try:
+                self._execute(*claimed)
+            except Exception as e:
+                logger.error("🚨 Job worker error: %s", e)
+
+    def _maintain(self):
+        while True:
+            try:
+                self.store.recover()
+                self.store.sweep()
+            except OSError as e:
+                logger.error("🚨 Job maintenance error: %s", e)
+            time.sleep(SWEEP_INTERVAL)
+
+    def _execute(self, record, entry):
+        job_id, service = record["id"], record["service"]
+        record.update(status="running", started=time.time(), attempts=record["attempts"] + 1)
+        self.store.save(record)
+        headers = dict(record["headers"], **{"User-Agent": "ModelHub-Client/1.0"})
+        try:
+            with tracer.span("job", parent=tracer.extract(headers), kind="consumer", job=job_id, target=service):
+                status, out_headers, body = self.send(service, record["path"], self.store.read_data(job_id, "in"),
+                                                      headers, self.timeout)
+        except Overloaded as e:
+            # Not a failure: wait for the service to drain, then try again.
+            record.update(status="queued", attempts=record["attempts"] - 1)
+            self.store.save(record)
+            self.store.requeue(entry)
+            with self._lock:
+                self.counts["requeued"] += 1
+            time.sleep(min(e.retry_after, 5))
+            return
+        except Exception as e:
+            if isinstance(e, CircuitOpenError):
+                logger.warning("🔌 Circuit open for %s, failing job %s", service, job_id)
+            else:
+                logger.error("🚨 Job %s failed calling %s: %s", job_id, service, e)
+            record.update(status="failed", status_code=503, result={"error": "Service unavailable"}, error=str(e))
+        else:
+            mimetype = out_headers.get("Content-Type", "").split(";")[0].strip()
+            record.update(status="done" if status < 400 else "failed", status_code=status)
+            try:
+                if mimetype == "application/json":
+                    record["result"] = json.loads(body)
+                else:
+                    self.store.write_data(job_id, "out", body)
+                    record["result_headers"] = {h: out_headers[h] for h in RESULT_HEADERS if h in out_headers}
+            except (ValueError, OSError) as e:
+                # Still finish the job below, or its queue entry would be picked up forever.
+                logger.error("🚨 Job %s: unusable answer from %s: %s", job_id, service, e)
+                record.update(status="failed", status_code=502, result={"error": "Invalid response from service"},
+                              error=str(e))
+        record["finished"] = time.time()
+        self.store.save(record)
+        os.remove(entry)
+        with self._lock:
+            self.counts["completed" if record["status"] == "done" else "failed"] += 1
+        logger.info("🧾 Job %s for %s %s in %.2fs", job_id, service, record["status"],
+                    record["finished"] - record["started"])
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        return {"workers": self.workers, **self.store.depth(), **counts}
+
+
+store = JobStore(os.path.join(DATA_DIR, "gateway", "jobs"))
+runner = JobRunner(store)
+
+
+def submit(service, path, body, headers):
+    """Queue a call to a service and return the job record."""
+    record = store.submit(service, path, body, headers)
+    runner.notify()
+    return record
+
+
+def public(record):
+    """The part of a job record shown to clients."""
+    view = {k: record[k] for k in ("id", "service", "status", "created", "started", "finished",
+                                   "attempts", "status_code", "error")}
+    view["url"] = f"/jobs/{record['id']}"
+    if record["status"] in ("done", "failed"):
+        view["result_url"] = f"/jobs/{record['id']}/result"
+        if record["result_headers"] is None:
+            view["result"] = record["result"]
+    return view
+
+
+def wait(job_id, timeout):
+    """Return the job record once it is finished or `timeout` seconds have passed."""
+    deadline = time.monotonic() + timeout
+    while True:
+        record = store.load(job_id)
+        if record is None or record["status"] in FINISHED or time.monotonic() >= deadline:
+            return record
+        time.sleep(POLL_INTERVAL)
+
+
+async def wait_async(job_id, timeout):
+    """`wait` without blocking the event loop."""
+    deadline = time.monotonic() + timeout
+    while True:
+        record = store.load(job_id)
+        if record is None or record["status"] in FINISHED or time.monotonic() >= deadline:
+            return record
+        await asyncio.sleep(POLL_INTERVAL)
@@ -1,17 +1,9 @@
-import logging
-import sys
 import os
+from common.logs import setup_logging
 from gateway.config import LOG_LEVEL, DATA_DIR
 
 # Define a log file path within the shared data folder
 log_file = os.path.join(DATA_DIR, "gateway.log")
 
-logging.basicConfig(
-    level=LOG_LEVEL,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler(log_file)
-    ]
-)
-logger = logging.getLogger(__name__)
\ No newline at end of file
+# Records are queued and written to stdout and the log file by a background thread
+logger = setup_logging(__name__, LOG_LEVEL, log_file=log_file, service="gateway")
\ No newline at end of file
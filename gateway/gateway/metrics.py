@@ -0,0 +1,61 @@
+# gateway/gateway/metrics.py
+"""
+Gateway request metrics and tracer, shared by both engines.
+
+Each routed request's latency is split into phases, recorded in the
+`request_duration_seconds` histogram and returned in a Server-Timing header:
+
+- total:    the whole request as seen by the gateway
+- gateway:  time spent in the gateway itself (parsing, admission queue, ...)
+- upstream: waiting on the service minus its own processing (network,
+            connection setup, the service's request queue)
+- service:  processing time reported by the service in its Server-Timing header
+"""
+from common.metrics import MetricsRegistry, SIZE_BUCKETS, parse_server_timing, server_timing
+from common.tracing import get_tracer
+from gateway.config import SERVICES
+
+gateway_metrics = MetricsRegistry("gateway")
+tracer = get_tracer("gateway")
+
+requests_total = gateway_metrics.counter("requests_total", "Routed requests", ["service", "code"])
+errors_total = gateway_metrics.counter("errors_total", "Routed requests answered with a 4xx/5xx status", ["service"])
+duration = gateway_metrics.histogram("request_duration_seconds", "Routed request latency by phase", ["service", "phase"])
+in_flight = gateway_metrics.gauge("in_flight", "Routed requests in progress", ["service"])
+request_bytes = gateway_metrics.histogram("request_bytes", "Routed request body size", ["service"], SIZE_BUCKETS)
+response_bytes = gateway_metrics.histogram("response_bytes", "Routed response body size", ["service"], SIZE_BUCKETS)
+
+
+def service_label(service):
+    """Label value for a requested service (unknown names are folded together)."""
+    return service if service in SERVICES or service == "fanout" else "unknown"
+
+
+def upstream_timing(response, elapsed=None):
+    """Return (upstream seconds, service seconds) for a service response."""
+    if elapsed is None:
+        elapsed = response.elapsed.total_seconds()
+    return elapsed, parse_server_timing(response.headers.get("Server-Timing")).get("service")
+
+
+def record(service, status, total, timing=None, request_size=None, response_size=None):
+    """Record one routed request and return its Server-Timing header value."""
+    service = service_label(service)
+    upstream, processing = timing or (None, None)
+    phases = {"total": total}
+    if upstream is not None:
+        phases["gateway"] = max(0.0, total - upstream)
+        phases["upstream"] = max(0.0, upstream - processing) if processing is not None else upstream
+        if processing is not None:
+            phases["service"] = processing
+
+    requests_total.labels(service=service, code=status).inc()
+    if status >= 400:
+        errors_total.labels(service=service).inc()
+    for phase, seconds in phases.items():
+        duration.labels(service=service, phase=phase).observe(seconds)
+    if request_size:
+        request_bytes.labels(service=service).observe(request_size)
+    if response_size is not None:
+        response_bytes.labels(service=service).observe(response_size)
+    return server_timing(**phases)
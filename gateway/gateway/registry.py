@@ -0,0 +1,157 @@
+# gateway/gateway/registry.py
+"""
+Health-checked registry of service replicas.
+
+Every service maps to one or more endpoints (SERVICE_ENDPOINTS in config.py).
+Requests are spread over the healthy ones with the service's `lb_policy`:
+
+- "round_robin": rotate through the replicas.
+- "least_outstanding": pick the replica with the fewest requests in flight.
+
+A background thread polls each replica's /ready endpoint. A replica is
+ejected after `HEALTH_EJECT_AFTER` consecutive failed checks or failed
+requests, and readmitted as soon as a check succeeds. If every replica of a
+service is ejected, all of them are tried again rather than failing outright.
+"""
+import itertools
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from gateway.config import (
+    SERVICE_ENDPOINTS, SERVICE_CONFIG,
+    HEALTH_INTERVAL, HEALTH_TIMEOUT, HEALTH_EJECT_AFTER,
+)
+from gateway.logger import logger
+from gateway import embedded
+
+
+class Endpoint:
+    """One replica of a service."""
+
+    def __init__(self, service, url):
+        self.service = service
+        self.url = url
+        parts = urlsplit(url)
+        self.ready_url = f"{parts.scheme}://{parts.netloc}/ready"
+        self.healthy = True
+        self.outstanding = 0
+        self.failures = 0
+        self.requests = 0
+        self.errors = 0
+        self.ejections = 0
+
+    def stats(self):
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "consecutive_failures": self.failures,
+            "requests": self.requests,
+            "errors": self.errors,
+            "ejections": self.ejections,
+        }
+
+
+class ServiceRegistry:
+    """Pick replicas for requests and keep track of their health."""
+
+    def __init__(self, endpoints, policies=None, interval=5.0, timeout=1.0, eject_after=3):
+        self.endpoints = {s: [Endpoint(s, url) for url in urls] for s, urls in endpoints.items()}
+        self.policies = policies or {}
+        self.interval = interval
+        self.timeout = timeout
+        self.eject_after = eject_after
+        self._counters = {s: itertools.count() for s in self.endpoints}
+        self._lock = threading.Lock()
+        self._checker_pid = None
+
+    def acquire(self, service, exclude=()):
+        """Choose a replica for one request and count it as outstanding."""
+        self._ensure_health_checks()
+        with self._lock:
+            candidates = [e for e in self.endpoints[service] if e not in exclude] or self.endpoints[service]
+            healthy = [e for e in candidates if e.healthy] or candidates
+            if self.policies.get(service) == "least_outstanding":
+                endpoint = min(healthy, key=lambda e: e.outstanding)
+            else:
+                endpoint = healthy[next(self._counters[service]) % len(healthy)]
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def release(self, endpoint, ok):
+        """Finish a request started with `acquire` and record its outcome (None: neither)."""
+        with self._lock:
+            endpoint.outstanding -= 1
+            if ok is None:
+                return
+            if ok:
+                endpoint.failures = 0
+            else:
+                endpoint.errors += 1
+                self._record_failure(endpoint)
+
+    def _record_failure(self, endpoint):
+        endpoint.failures += 1
+        if endpoint.healthy and endpoint.failures >= self.eject_after:
+            endpoint.healthy = False
+            endpoint.ejections += 1
+            logger.warning("⛔ Ejected %s replica %s", endpoint.service, endpoint.url)
+
+    def check(self, endpoint):
+        """Probe one replica's /ready endpoint and update its health."""
+        try:
+            get = embedded.session.get if endpoint.url.startswith(embedded.PREFIX) else requests.get
+            ok = get(endpoint.ready_url, timeout=self.timeout).status_code == 200
+        except requests.exceptions.RequestException:
+            ok = False
+        with self._lock:
+            if ok:
+                endpoint.failures = 0
+                if not endpoint.healthy:
+                    endpoint.healthy = True
+                    logger.info("✅ Readmitted %s replica %s", endpoint.service, endpoint.url)
+            else:
+                self._record_failure(endpoint)
+        return ok
+
+    def check_all(self):
+        for endpoints in self.endpoints.values():
+            for endpoint in endpoints:
+                self.check(endpoint)
+
+    def _ensure_health_checks(self):
+        # Started lazily (and again after a fork) so each gateway worker checks on its own.
+        if self.interval <= 0 or self._checker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._checker_pid == os.getpid():
+                return
+            self._checker_pid = os.getpid()
+        threading.Thread(target=self._run_health_checks, name="health-checks", daemon=True).start()
+
+    def _run_health_checks(self):
+        while True:
+            self.check_all()
+            time.sleep(self.interval)
+
+    def stats(self):
+        with self._lock:
+            return {
+                service: {
+                    "policy": self.policies.get(service, "round_robin"),
+                    "endpoints": [e.stats() for e in endpoints],
+                }
+                for service, endpoints in self.endpoints.items()
+            }
+
+
+registry = ServiceRegistry(
+    SERVICE_ENDPOINTS,
+    policies={s: cfg.get("lb_policy", "round_robin") for s, cfg in SERVICE_CONFIG.items()},
+    interval=HEALTH_INTERVAL,
+    timeout=HEALTH_TIMEOUT,
+    eject_after=HEALTH_EJECT_AFTER,
+)
@@ -0,0 +1,225 @@
+# gateway/gateway/resilience.py
+"""
+Per-service resilience policies for upstream calls.
+
+- Circuit breaker: after `breaker_failures` consecutive failed calls the
+  circuit opens and calls fail fast for `breaker_reset` seconds. Then a single
+  trial call is let through (half-open); its outcome closes or reopens it.
+- Retries: failed calls to services marked `idempotent` are retried up to
+  `retries` times, on another replica when there is one, after a jittered
+  exponential backoff.
+- Hedging: with `hedge` on (idempotent services only), a call still pending
+  after the service's observed p95 latency is duplicated to a second replica,
+  and whichever answer arrives first is used.
+
+The policy objects hold state only; the blocking (upstream.py) and asyncio
+(aio.py) engines drive them.
+"""
+import random
+import threading
+import time
+from collections import deque
+from gateway.config import SERVICE_CONFIG
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit is open."""
+
+    def __init__(self, service):
+        super().__init__(f"circuit open for {service}")
+        self.service = service
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker with a half-open trial call.
+
+    `allow` hands each admitted call a ticket: the breaker's generation (bumped
+    on every state change) and whether the call is the half-open trial. An
+    outcome only counts for the generation it was admitted in, so a slow call
+    started while the circuit was closed cannot close it (or free the trial
+    slot) while the trial is still running.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self.generation = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def _set_state(self, state):
+        self.state = state
+        self.generation += 1
+
+    def allow(self):
+        """Return a ticket for `record` if a call may go ahead now, else None."""
+        if self.failure_threshold <= 0:
+            return (0, False)
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.CLOSED:
+                return (self.generation, False)
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return (self.generation, True)
+            self.rejected += 1
+            return None
+
+    def record(self, ticket, ok):
+        """Record the outcome of a call that `allow` let through with `ticket`."""
+        if self.failure_threshold <= 0:
+            return
+        generation, trial = ticket
+        with self._lock:
+            if trial:
+                self._trial_in_flight = False
+                self.failures = 0 if ok else self.failures + 1
+                if ok:
+                    self._set_state(self.CLOSED)
+                else:
+                    self._open()
+                return
+            if self.state != self.CLOSED or generation != self.generation:
+                return  # admitted before the circuit last changed state; already superseded
+            if ok:
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        if self.state != self.OPEN:
+            self.times_opened += 1
+        self._set_state(self.OPEN)
+        self.opened_at = time.monotonic()
+
+    def cancel(self, ticket):
+        """Give back the slot of an allowed call that was abandoned without an outcome."""
+        if self.failure_threshold <= 0 or not ticket[1]:
+            return
+        with self._lock:
+            self._trial_in_flight = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+            }
+
+
+class LatencyWindow:
+    """Latencies of the most recent successful calls, for percentiles."""
+
+    def __init__(self, size=256):
+        self.samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, pct, min_samples=1):
+        with self._lock:
+            if len(self.samples) < min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class ResiliencePolicy:
+    """Resilience settings and live state for one service."""
+
+    HEDGE_MIN_SAMPLES = 20  # latencies needed before hedging starts
+
+    def __init__(self, service, idempotent=False, retries=2, backoff_ms=50.0, backoff_max_ms=1000.0,
+                 hedge=False, breaker_failures=5, breaker_reset=30.0):
+        self.service = service
+        self.idempotent = idempotent
+        self.retries = retries
+        self.backoff_ms = backoff_ms
+        self.backoff_max_ms = backoff_max_ms
+        self.hedge = hedge
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset)
+        self.latency = LatencyWindow()
+        self._lock = threading.Lock()
+        self.counts = {"calls": 0, "failures": 0, "retries": 0, "hedges": 0, "hedge_wins": 0}
+
+    def max_retries(self, replayable=True):
+        """Number of retries allowed for one call."""
+        return self.retries if self.idempotent and replayable else 0
+
+    def backoff(self, attempt):
+        """Seconds to wait before retry number `attempt` (full jitter)."""
+        cap = min(self.backoff_max_ms, self.backoff_ms * (2 ** (attempt - 1)))
+        return random.uniform(0, cap) / 1000.0
+
+    def hedge_delay(self, replayable=True):
+        """Seconds after which to hedge a call, or None to not hedge it."""
+        if not (self.hedge and self.idempotent and replayable):
+            return None
+        return self.latency.percentile(95, min_samples=self.HEDGE_MIN_SAMPLES)
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def stats(self):
+        p50 = self.latency.percentile(50)
+        p95 = self.latency.percentile(95)
+        with self._lock:
+            counts = dict(self.counts)
+        return {
+            "idempotent": self.idempotent,
+            "hedge": self.hedge,
+            "breaker": self.breaker.stats(),
+            "latency_ms": {
+                "p50": None if p50 is None else round(p50 * 1000, 2),
+                "p95": None if p95 is None else round(p95 * 1000, 2),
+            },
+            **counts,
+        }
+
+
+_policies = {}
+_policies_lock = threading.Lock()
+
+
+def get_policy(service):
+    """Return the (lazily created) resilience policy for a service."""
+    policy = _policies.get(service)
+    if policy is not None:
+        return policy
+    with _policies_lock:
+        if service not in _policies:
+            cfg = SERVICE_CONFIG.get(service, {})
+            _policies[service] = ResiliencePolicy(
+                service,
+                idempotent=cfg.get("idempotent", False),
+                retries=cfg.get("retries", 2),
+                backoff_ms=cfg.get("retry_backoff_ms", 50.0),
+                backoff_max_ms=cfg.get("retry_backoff_max_ms", 1000.0),
+                hedge=cfg.get("hedge", False),
+                breaker_failures=cfg.get("breaker_failures", 5),
+                breaker_reset=cfg.get("breaker_reset", 30.0),
+            )
+        return _policies[service]
+
+
+def policy_stats():
+    """Return the state of every policy created so far."""
+    with _policies_lock:
+        policies = dict(_policies)
+    return {service: policy.stats() for service, policy in policies.items()}
@@ -1,33 +1,350 @@
-from flask import Blueprint, request, jsonify
+import time
+from flask import Blueprint, Response, g, request, jsonify
 import requests
-from gateway.config import SERVICES
+import urllib3
+from gateway.config import SERVICES, SERVICE_CONFIG, JOB_MAX_WAIT, PASSTHROUGH
 from gateway.logger import logger
+from common.logs import Payload, dropped_records
+from gateway.upstream import SizedStream, call, pool_stats
+from gateway.registry import registry
+from gateway.resilience import CircuitOpenError, policy_stats
+from gateway.admission import Overloaded, limiter_stats
+from gateway.metrics import gateway_metrics, in_flight, record, service_label, tracer, upstream_timing
+from common.metrics import CONTENT_TYPE
+from common.codec import JSON, decode, is_msgpack, negotiate, payload_response
+from common.streaming import STREAM_HEADERS, stream_type
+from gateway.cache import cache, cache_key, cache_ttl
+from gateway import jobs
 
 bp = Blueprint('gateway', __name__)
 
+# Headers forwarded unchanged on the binary (non-JSON) path.
+BINARY_HEADERS = ("Content-Type", "X-Array-Dtype", "X-Array-Shape")
+# Request headers forwarded on the pass-through path.
+RAW_HEADERS = ("Content-Type", "Accept")
+# Response headers relayed with a body forwarded as the service encoded it.
+ENCODING_HEADERS = ("Content-Encoding", "Vary")
+STREAM_CHUNK_SIZE = 64 * 1024
+
+@bp.before_request
+def start_timer():
+    service = (request.view_args or {}).get("service")
+    if service is None or not request.path.startswith("/route/"):
+        return
+    g.started = time.perf_counter()
+    g.upstream = None
+    gateway_metrics.start_flushing()
+    in_flight.labels(service=service_label(service)).inc()
+
+@bp.after_request
+def record_metrics(response):
+    started = g.pop("started", None)
+    if started is None:
+        return response
+    service = request.view_args["service"]
+    in_flight.labels(service=service_label(service)).dec()
+    # calculate_content_length() would buffer a streamed body; skip those.
+    response_size = None if response.is_streamed else response.calculate_content_length()
+    response.headers["Server-Timing"] = record(
+        service, response.status_code, time.perf_counter() - started, g.upstream,
+        request_size=request.content_length, response_size=response_size,
+    )
+    return response
+
+@bp.teardown_request
+def abandon_timer(exc):
+    # after_request is skipped when a view raises; keep the in-flight gauge right.
+    if g.pop("started", None) is not None:
+        in_flight.labels(service=service_label(request.view_args["service"])).dec()
+
+def upstream_error(service, error):
+    """Turn a failed upstream call into the gateway's error response."""
+    if isinstance(error, Overloaded):
+        logger.warning("🚦 %s overloaded, rejecting request", service)
+        return jsonify({"error": "Service overloaded"}), 429, {"Retry-After": str(error.retry_after)}
+    if isinstance(error, CircuitOpenError):
+        logger.warning("🔌 Circuit open for %s, failing fast", service)
+    else:
+        logger.error("🚨 Error calling %s: %s", service, error)
+    return jsonify({"error": "Service unavailable"}), 503
+
+def forward_binary(service):
+    """
+    Stream a non-JSON body (arrays, images, ...) to the service and the answer
+    back to the caller without decoding or buffering either of them.
+    """
+    headers = {h: request.headers[h] for h in BINARY_HEADERS if h in request.headers}
+    headers["User-Agent"] = "ModelHub-Client/1.0"
+    headers["Accept-Encoding"] = request.headers.get("Accept-Encoding", "identity")
+    if request.content_length is not None:
+        body = SizedStream(request.stream, request.content_length)
+    else:
+        body = request.get_data()
+
+    try:
+        response = call(service, data=body, headers=headers, stream=True, replayable=isinstance(body, bytes))
+    except (Overloaded, CircuitOpenError, requests.exceptions.RequestException) as e:
+        return upstream_error(service, e)
+    g.upstream = upstream_timing(response)
+    if 400 <= response.status_code < 500:
+        # The caller's mistake (e.g. an invalid X-Array-Dtype): pass the service's answer on.
+        with response:
+            return Response(response.content, status=response.status_code,
+                            content_type=response.headers.get("Content-Type", JSON))
+    try:
+        response.raise_for_status()
+    except requests.exceptions.HTTPError as e:
+        response.close()
+        return upstream_error(service, e)
+
+    def relay():
+        try:
+            # As the service encoded it: a compressed body is not decoded here.
+            yield from response.raw.stream(STREAM_CHUNK_SIZE, decode_content=False)
+        finally:
+            response.close()
+
+    logger.info("✅ Streaming binary response from %s", service)
+    out_headers = {h: response.headers[h] for h in BINARY_HEADERS + ENCODING_HEADERS if h in response.headers}
+    relayed = Response(relay(), status=response.status_code, headers=out_headers)
+    relayed.call_on_close(response.close)  # also when the client leaves before the first chunk
+    return relayed
+
+def forward_stream(service, mimetype):
+    """
+    Relay a streamed (SSE / NDJSON) answer chunk by chunk, as the service
+    produces it, without buffering it in the gateway.
+    """
+    headers = {
+        "Content-Type": request.headers.get("Content-Type", JSON),
+        "Accept": mimetype,
+        "User-Agent": "ModelHub-Client/1.0"
+    }
+    try:
+        response = call(service, data=request.get_data(), headers=headers, stream=True, replayable=False)
+    except (Overloaded, CircuitOpenError, requests.exceptions.RequestException) as e:
+        return upstream_error(service, e)
+    g.upstream = upstream_timing(response)
+    try:
+        response.raise_for_status()
+    except requests.exceptions.HTTPError as e:
+        response.close()
+        return upstream_error(service, e)
+
+    def relay():
+        try:
+            yield from response.iter_content(None)  # each chunk as soon as it arrives
+        finally:
+            response.close()
+
+    logger.info("📡 Streaming response from %s", service)
+    out_headers = {h: response.headers[h] for h in STREAM_HEADERS if h in response.headers}
+    relayed = Response(relay(), status=response.status_code, headers=out_headers)
+    relayed.call_on_close(response.close)  # also when the client leaves before the first chunk
+    return relayed
+
+def forward_raw(service, path=""):
+    """
+    Pass-through: send the request body to the service and its answer back
+    as bytes, without decoding or re-encoding either of them. A compressed
+    answer stays compressed: the caller's Accept-Encoding goes to the service.
+    """
+    headers = {h: request.headers[h] for h in RAW_HEADERS if h in request.headers}
+    headers["User-Agent"] = "ModelHub-Client/1.0"
+    headers["Accept-Encoding"] = request.headers.get("Accept-Encoding", "identity")
+    try:
+        response = call(service, path, data=request.get_data(), headers=headers, stream=True)
+    except (Overloaded, CircuitOpenError, requests.exceptions.RequestException) as e:
+        return upstream_error(service, e)
+    with response:
+        g.upstream = upstream_timing(response)
+        try:
+            response.raise_for_status()
+            body = response.raw.read(decode_content=False)
+        except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as e:
+            return upstream_error(service, e)
+
+    logger.info("✅ Successfully routed request to %s", service)
+    out_headers = {h: response.headers[h] for h in ENCODING_HEADERS if h in response.headers}
+    return Response(body, status=response.status_code, headers=out_headers,
+                    content_type=response.headers.get("Content-Type", JSON))
+
+def read_payload():
+    """Decode the JSON or MessagePack request body; None if it is invalid."""
+    with tracer.span("parse_json", bytes=request.content_length):
+        try:
+            return decode(request.get_data(), request.mimetype)
+        except ValueError:
+            return None
+
 @bp.route('/route/<service>', methods=['POST'])
 def route_request(service):
-    logger.info(f"🔍 Received request for {service}")
-    logger.info(f"📥 Headers: {request.headers}")
-    logger.info(f"📩 Data: {request.json}")
+    logger.info("🔍 Received request for %s", service)
+    # Headers are only rendered (and truncated) when DEBUG logging is on.
+    logger.debug("📥 Headers: %s", Payload(request.headers))
 
     if service not in SERVICES:
-        logger.warning(f"❌ Service {service} not found")
+        logger.warning("❌ Service %s not found", service)
         return jsonify({"error": "Service not found"}), 404
 
-    data = request.json
+    if request.mimetype and not request.is_json and not is_msgpack(request.mimetype):
+        return forward_binary(service)
+
+    mimetype = stream_type(request.headers.get("Accept"))
+    if mimetype is not None:
+        return forward_stream(service, mimetype)
+    ttl = cache_ttl(service)
+    if ttl is None and PASSTHROUGH:
+        return forward_raw(service)
+
+    # The body is read to build the cache key, but sent on as it came.
+    data = read_payload()
+    if data is None:
+        return jsonify({"error": "Invalid request body"}), 400
+    logger.debug("📩 Data: %s", Payload(data))
+    key = None if ttl is None else cache_key(service, data, request.get_data(), request.mimetype,
+                                             request.headers.get("Content-Encoding"))
+    if key is None:
+        # Nothing to cache: relay the answer with the service's Content-Type and Content-Encoding.
+        return forward_raw(service)
+    cached = cache.get(key)
+    if cached is not None:
+        logger.info("⚡ Cache hit for %s", service)
+        return payload_response(cached[0], cached[1], {"X-Cache": "HIT"})
+
     headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json",
+        "Content-Type": request.headers.get("Content-Type", JSON),
+        "Accept": JSON,
         "User-Agent": "ModelHub-Client/1.0"
     }
 
     try:
-        response = requests.post(SERVICES[service], json=data, headers=headers, timeout=5)
+        response = call(service, data=request.get_data(), headers=headers)
+        g.upstream = upstream_timing(response)
         response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        logger.error(f"🚨 Error calling {service}: {str(e)}")
-        return jsonify({"error": "Service unavailable"}), 503
+    except (Overloaded, CircuitOpenError, requests.exceptions.RequestException) as e:
+        return upstream_error(service, e)
+
+    logger.info("✅ Successfully routed request to %s", service)
+    try:
+        payload = decode(response.content)
+    except ValueError as e:
+        logger.error("🚨 Invalid response from %s: %s", service, e)
+        return jsonify({"error": "Invalid response from service"}), 502
+    cache.set(key, payload, response.status_code, ttl)
+    if negotiate(request.headers.get("Accept")) == JSON:
+        # Already encoded the way the caller wants it.
+        return Response(response.content, status=response.status_code, content_type=JSON,
+                        headers={"X-Cache": "MISS"})
+    return payload_response(payload, response.status_code, {"X-Cache": "MISS"})
+
+@bp.route('/route/<service>/batch', methods=['POST'])
+def route_batch(service):
+    logger.info("🔍 Received batch request for %s", service)
+
+    if service not in SERVICES:
+        logger.warning("❌ Service %s not found", service)
+        return jsonify({"error": "Service not found"}), 404
+
+    data = read_payload()
+    inputs = data.get("inputs") if isinstance(data, dict) else None
+    if not isinstance(inputs, list):
+        return jsonify({"error": "'inputs' must be a list"}), 400
+
+    max_batch_size = SERVICE_CONFIG.get(service, {}).get("max_batch_size", 1024)
+    if len(inputs) > max_batch_size:
+        logger.warning("❌ Batch of %s exceeds limit %s for %s", len(inputs), max_batch_size, service)
+        return jsonify({"error": f"Batch too large (max {max_batch_size})"}), 413
+
+    # Checked; the body and the answer are forwarded as they are.
+    logger.info("📦 Routing batch of %s to %s", len(inputs), service)
+    return forward_raw(service, "/batch")
+
+def send_job(service, path, body, headers, timeout):
+    """Make a job's service call for the job workers (see jobs.JobRunner)."""
+    connect_timeout = SERVICE_CONFIG.get(service, {}).get("connect_timeout", 2.0)
+    # Not replayable: a job is never hedged, since a duplicate of a long call doubles its cost.
+    response = call(service, path, data=body, headers=headers, timeout=(connect_timeout, timeout), replayable=False)
+    return response.status_code, response.headers, response.content
+
+@bp.before_app_request
+def start_job_workers():
+    jobs.runner.start(send_job)
+
+def submit_job(service, path=""):
+    if service not in SERVICES:
+        logger.warning("❌ Service %s not found", service)
+        return jsonify({"error": "Service not found"}), 404
+
+    headers = {h: request.headers[h] for h in jobs.JOB_HEADERS if h in request.headers}
+    record = jobs.submit(service, path, request.get_data(), headers)
+    logger.info("🧾 Queued job %s for %s", record["id"], service)
+    return jsonify(jobs.public(record)), 202, {"Location": f"/jobs/{record['id']}"}
+
+@bp.route('/jobs/<service>', methods=['POST'])
+def job_request(service):
+    return submit_job(service)
+
+@bp.route('/jobs/<service>/batch', methods=['POST'])
+def job_batch(service):
+    return submit_job(service, "/batch")
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Job state; `?wait=N` holds the request until the job finishes (at most N seconds)."""
+    try:
+        timeout = min(float(request.args.get("wait", 0)), JOB_MAX_WAIT)
+    except ValueError:
+        return jsonify({"error": "'wait' must be a number of seconds"}), 400
+    record = jobs.wait(job_id, timeout) if timeout > 0 else jobs.store.load(job_id)
+    if record is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(jobs.public(record))
+
+@bp.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """The service's answer, as it would have been returned by /route (202 while pending)."""
+    record = jobs.store.load(job_id)
+    if record is None:
+        return jsonify({"error": "Job not found"}), 404
+    if record["status"] == "cancelled":
+        return jsonify({"error": "Job cancelled"}), 409
+    if record["status"] not in jobs.FINISHED:
+        return jsonify(jobs.public(record)), 202
+    if record["result_headers"] is not None:
+        return Response(jobs.store.read_data(job_id, "out"), status=record["status_code"],
+                        headers=record["result_headers"])
+    return jsonify(record["result"]), record["status_code"]
+
+@bp.route('/jobs/<job_id>', methods=['DELETE'])
+def job_cancel(job_id):
+    record = jobs.store.load(job_id)
+    if record is None:
+        return jsonify({"error": "Job not found"}), 404
+    if not jobs.store.cancel(record):
+        return jsonify({"error": f"Job is {record['status']}"}), 409
+    logger.info("🗑️ Cancelled job %s", job_id)
+    return jsonify(jobs.public(record))
+
+@bp.route('/stats', methods=['GET'])
+def stats():
+    """Expose gateway runtime statistics (upstream pool usage, ...)."""
+    return jsonify({
+        "pool": pool_stats(),
+        "registry": registry.stats(),
+        "resilience": policy_stats(),
+        "admission": limiter_stats(),
+        "cache": cache.stats(),
+        "jobs": jobs.runner.stats(),
+        "logging": {"dropped": dropped_records()},
+    })
+
+@bp.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe: the gateway is accepting requests (used by start_local.py)."""
+    return jsonify({"status": "ready", "service": "gateway"})
 
-    logger.info(f"✅ Successfully routed request to {service}")
-    return response.json(), response.status_code
\ No newline at end of file
+@bp.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Expose request metrics in the Prometheus text format."""
+    return Response(gateway_metrics.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,317 @@
+# gateway/gateway/upstream.py
+"""
+Pooled, keep-alive HTTP client layer used by the gateway to reach services.
+
+Each service gets its own requests.Session with a dedicated connection pool,
+sized and timed from SERVICE_CONFIG, so proxied calls reuse TCP connections
+instead of opening a new one per request. `call` picks the replica for each
+request from the health-checked registry and applies the service's
+resilience policy (resilience.py).
+"""
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import requests
+from requests.adapters import HTTPAdapter
+from gateway.config import SERVICES, SERVICE_CONFIG, SERVICE_ENDPOINTS
+from gateway.admission import get_limiter
+from gateway.registry import registry
+from gateway.resilience import CircuitOpenError, get_policy
+from gateway.metrics import tracer
+from gateway import embedded
+
+
+class SizedStream:
+    """
+    Wrap a request body stream with its known length.
+
+    requests sends file-like bodies with a Content-Length (instead of chunked
+    encoding) when it can find their length, while still streaming them.
+    """
+
+    def __init__(self, stream, length):
+        self.stream = stream
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        return self.stream.read(size)
+
+
+class UpstreamPool:
+    """A keep-alive connection pool to a single service."""
+
+    def __init__(self, service, url, pool_size=10, pool_block=False,
+                 keep_alive=True, connect_timeout=2.0, read_timeout=5.0, replicas=1):
+        self.service = service
+        self.url = url
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.timeout = (connect_timeout, read_timeout)
+
+        self.adapter = HTTPAdapter(
+            pool_connections=replicas,  # one urllib3 pool per replica host
+            pool_maxsize=pool_size,
+            pool_block=pool_block,
+            max_retries=0,
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        embedded.mount(self.session)
+        if url.startswith(embedded.PREFIX):
+            self.session.trust_env = False  # no proxy / netrc lookups for in-process calls
+
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.overflows = 0  # requests started while every pooled connection was busy
+
+    def post(self, url=None, **kwargs):
+        """POST to the service through the pool, tracking usage."""
+        headers = dict(kwargs.pop("headers", None) or {})
+        if not self.keep_alive:
+            headers["Connection"] = "close"
+        kwargs.setdefault("timeout", self.timeout)
+
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            if self.in_flight > self.pool_size:
+                self.overflows += 1
+        try:
+            return self.session.post(url or self.url, headers=headers, **kwargs)
+        except requests.exceptions.RequestException:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def stats(self):
+        """Return a snapshot of pool usage for sizing."""
+        opened = 0
+        idle = 0
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened += pool.num_connections
+            idle += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+        with self._lock:
+            return {
+                "url": self.url,
+                "pool_size": self.pool_size,
+                "keep_alive": self.keep_alive,
+                "requests": self.requests,
+                "errors": self.errors,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "overflows": self.overflows,
+                "connections_opened": opened,
+                "idle_connections": idle,
+            }
+
+    def close(self):
+        self.session.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+# Runs the duplicate calls of hedged requests.
+_hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+
+
+def get_pool(service):
+    """Return the (lazily created) upstream pool for a service."""
+    pool = _pools.get(service)
+    if pool is not None:
+        return pool
+    with _pools_lock:
+        if service not in _pools:
+            cfg = SERVICE_CONFIG.get(service, {})
+            _pools[service] = UpstreamPool(
+                service,
+                SERVICES[service],
+                pool_size=cfg.get("pool_size", 10),
+                pool_block=cfg.get("pool_block", False),
+                keep_alive=cfg.get("keep_alive", True),
+                connect_timeout=cfg.get("connect_timeout", 2.0),
+                read_timeout=cfg.get("read_timeout", 5.0),
+                replicas=len(SERVICE_ENDPOINTS.get(service, [])) or 1,
+            )
+        return _pools[service]
+
+
+def pool_stats():
+    """Return usage statistics for every pool created so far."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {service: pool.stats() for service, pool in pools.items()}
+
+
+def _send(service, endpoint, path, kwargs):
+    """POST once to one replica, recording the outcome against it."""
+    ok = False
+    started = time.monotonic()
+    try:
+        response = get_pool(service).post(url=endpoint.url + path, **kwargs)
+        ok = response.status_code < 500
+        return response
+    finally:
+        registry.release(endpoint, ok)
+        if ok:
+            get_policy(service).latency.add(time.monotonic() - started)
+
+
+def _close_response(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def _attempt(service, path, policy, tried, replayable, kwargs):
+    """One attempt, hedged to a second replica if it runs past the p95 latency."""
+    endpoint = registry.acquire(service, exclude=tried)
+    tried.append(endpoint)
+    delay = policy.hedge_delay(replayable) if len(registry.endpoints[service]) > 1 else None
+    if delay is None:
+        return _send(service, endpoint, path, kwargs)
+
+    primary = _hedge_executor.submit(_send, service, endpoint, path, kwargs)
+    if wait([primary], timeout=delay).done:
+        return primary.result()
+    policy.count("hedges")
+    backup_endpoint = registry.acquire(service, exclude=tried)
+    tried.append(backup_endpoint)
+    backup = _hedge_executor.submit(_send, service, backup_endpoint, path, kwargs)
+
+    pending = {primary, backup}
+    fallback, error = None, None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                response = future.result()
+            except requests.exceptions.RequestException as e:
+                error = e
+                continue
+            if response.status_code >= 500:
+                if fallback is not None:
+                    fallback.close()
+                fallback = response
+                continue
+            for other in pending:
+                other.add_done_callback(_close_response)
+            if fallback is not None:
+                fallback.close()
+            if future is backup:
+                policy.count("hedge_wins")
+            return response
+    if fallback is not None:
+        return fallback
+    raise error
+
+
+def _call_with_policy(service, path, replayable, kwargs):
+    """Run one call under the service's resilience policy."""
+    policy = get_policy(service)
+    policy.count("calls")
+    retries = policy.max_retries(replayable)
+    tried = []
+    for attempt in range(retries + 1):
+        if attempt:
+            policy.count("retries")
+            time.sleep(policy.backoff(attempt))
+        ticket = policy.breaker.allow()
+        if ticket is None:
+            raise CircuitOpenError(service)
+        try:
+            response = _attempt(service, path, policy, tried, replayable, kwargs)
+        except requests.exceptions.RequestException:
+            policy.breaker.record(ticket, False)
+            if attempt == retries:
+                policy.count("failures")
+                raise
+            continue
+        except Exception:
+            # Any outcome must be recorded, or a half-open trial slot stays taken for good.
+            policy.breaker.record(ticket, False)
+            policy.count("failures")
+            raise
+        except BaseException:
+            policy.breaker.cancel(ticket)
+            raise
+        ok = response.status_code < 500
+        policy.breaker.record(ticket, ok)
+        if ok or attempt == retries:
+            if not ok:
+                policy.count("failures")
+            return response
+        response.close()
+
+
+def _release_on_close(response, release):
+    """Call `release` once, when the (streamed) response is closed."""
+    close = response.close
+
+    def close_and_release():
+        try:
+            close()
+        finally:
+            if response.close is close_and_release:
+                response.close = close
+                release()
+
+    response.close = close_and_release
+
+
+def _admitted_call(service, path, replayable, kwargs):
+    limiter = get_limiter(service)
+    if limiter is None:
+        return _call_with_policy(service, path, replayable, kwargs)
+    with tracer.span("admission"):
+        limiter.acquire()
+    ok = False
+    started = time.monotonic()
+    try:
+        response = _call_with_policy(service, path, replayable, kwargs)
+        ok = response.status_code < 500
+    except BaseException:
+        limiter.release(time.monotonic() - started, ok)
+        raise
+    latency = time.monotonic() - started
+    if kwargs.get("stream"):
+        # The body is still being relayed: the slot stays taken until it is closed.
+        _release_on_close(response, lambda: limiter.release(latency, ok))
+    else:
+        limiter.release(latency, ok)
+    return response
+
+
+def call(service, path="", replayable=True, **kwargs):
+    """
+    POST to one replica of a service, chosen by the registry, under the
+    service's admission limit and resilience policy (circuit breaker,
+    retries, hedging).
+
+    `path` is appended to the replica's /process URL (e.g. "/batch"). Pass
+    `replayable=False` for bodies that can only be sent once (streams); those
+    are never retried or hedged. Connection errors and 5xx answers count as
+    failures. Raises Overloaded when the call is not admitted and
+    CircuitOpenError while the service's circuit is open.
+
+    The call runs in an "upstream" span whose context is sent to the service
+    in the `traceparent` header.
+    """
+    with tracer.span("upstream", kind="client", target=service, path=path or "/") as span:
+        kwargs["headers"] = tracer.inject(dict(kwargs.get("headers") or {}))
+        response = _admitted_call(service, path, replayable, kwargs)
+        span.set_attribute("http.status_code", response.status_code)
+        return response
@@ -7,5 +7,21 @@ SERVICE_NAME = service_cfg.get("name", "service2")
 PORT = service_cfg.get("port", 5003)  # default fallback if not set in .env
 LOG_LEVEL = service_cfg.get("log_level", "INFO")
 
+# Production serving
+SERVING_MODE = CONFIG["SERVING_MODE"]
+WORKERS = service_cfg.get("workers", "2")
+THREADS = service_cfg.get("threads", 4)
+DRAIN_TIMEOUT = service_cfg.get("drain_timeout", 10)
+
+# Dynamic micro-batching of single /process requests
+MICROBATCH = service_cfg.get("microbatch", False)
+MICROBATCH_MAX_SIZE = service_cfg.get("microbatch_max_size", 32)
+MICROBATCH_WAIT_MS = service_cfg.get("microbatch_wait_ms", 5)
+
+# Response compression (see common/compression.py)
+COMPRESSION = service_cfg.get("compression", "gzip")
+COMPRESSION_LEVEL = service_cfg.get("compression_level", 0)
+COMPRESSION_MIN_SIZE = service_cfg.get("compression_min_size", 1024)
+
 # Use the global DATA_DIR from config
 DATA_DIR = CONFIG["DATA_DIR"]
\ No newline at end of file
@@ -1,16 +1,83 @@
+import re
 from flask import Blueprint, request, jsonify
 from service.logger import logger
-from service.config import SERVICE_NAME
+from common.logs import Payload
+from service.config import SERVICE_NAME, MICROBATCH, MICROBATCH_MAX_SIZE, MICROBATCH_WAIT_MS, DRAIN_TIMEOUT
+from service.config import COMPRESSION, COMPRESSION_LEVEL, COMPRESSION_MIN_SIZE
+from common.batching import MicroBatcher
+from common.lifecycle import Lifecycle
+from common.metrics import ServiceMetrics
+from common.compression import Compressor
+from common.tracing import get_tracer
+from common.streaming import stream_response, stream_type
+from common.codec import payload_response, request_inputs, request_payload
 
 bp = Blueprint('service', __name__)
 
+# Startup hooks and shared resources, loaded once per worker before it serves traffic
+lifecycle = Lifecycle(SERVICE_NAME, drain_timeout=DRAIN_TIMEOUT)
+
+# Request counts, latency and sizes on /metrics, plus a Server-Timing header
+metrics = ServiceMetrics(SERVICE_NAME)
+
+# Compression of large responses for callers that accept it (Accept-Encoding)
+compressor = Compressor(SERVICE_NAME, COMPRESSION, COMPRESSION_LEVEL, COMPRESSION_MIN_SIZE, registry=metrics.registry)
+
+# Spans for each request, its JSON parsing and the handler work
+tracer = get_tracer(SERVICE_NAME)
+
+@tracer.traced()
+def handle_batch(inputs):
+    """Process a list of inputs in one call and return the list of outputs."""
+    return [item.upper() for item in inputs]
+
+# Optional micro-batching stage: concurrent single requests are grouped into
+# one handle_batch call.
+batcher = MicroBatcher(handle_batch, MICROBATCH_MAX_SIZE, MICROBATCH_WAIT_MS) if MICROBATCH else None
+
+def handle(item):
+    """Process a single input, through the micro-batcher when enabled."""
+    if batcher is not None:
+        return batcher(item)
+    return handle_batch([item])[0]
+
+def handle_stream(item):
+    """Yield partial outputs for one input, word by word; joined they equal handle(item)."""
+    for token in re.findall(r"\S+\s*", item):
+        yield handle_batch([token])[0]
+
 @bp.route('/process', methods=['POST'])
 def process():
     try:
-        data = request.json
-        result = {"service": SERVICE_NAME, "output": data.get("input", "").upper()}
-        logger.info(f"Processed request: {data}")
-        return jsonify(result)
+        data = request_payload(request)
+        mimetype = stream_type(request.headers.get("Accept"))
+        if mimetype is not None:
+            logger.info("Streaming response for: %s", Payload(data))
+            return stream_response(handle_stream(data.get("input", "")), mimetype)
+        result = {"service": SERVICE_NAME, "output": handle(data.get("input", ""))}
+        logger.info("Processed request: %s", Payload(data))
+        return payload_response(result)
+    except Exception as e:
+        logger.error("Processing error: %s", e)
+        return jsonify({"error": "Internal server error"}), 500
+
+@bp.route('/process/batch', methods=['POST'])
+def process_batch():
+    try:
+        inputs = request_inputs(request)
+        if inputs is None:
+            return jsonify({"error": "'inputs' must be a list"}), 400
+        result = {"service": SERVICE_NAME, "outputs": handle_batch(inputs)}
+        logger.info("Processed batch of %s inputs", len(inputs))
+        return payload_response(result)
     except Exception as e:
-        logger.error(f"Processing error: {str(e)}")
-        return jsonify({"error": "Internal server error"}), 500
\ No newline at end of file
+        logger.error("Processing error: %s", e)
+        return jsonify({"error": "Internal server error"}), 500
+
+@bp.route('/stats', methods=['GET'])
+def stats():
+    """Expose service runtime statistics (micro-batching, ...)."""
+    return jsonify({
+        "microbatch": batcher.stats() if batcher is not None else None,
+        "compression": compressor.stats(),
+    })
\ No newline at end of file
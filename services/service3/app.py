@@ -1,11 +1,22 @@
 from flask import Flask
-from service.routes import bp
+from service.routes import bp, compressor, lifecycle, metrics, tracer
 from service.logger import logger
-from service.config import PORT, SERVICE_NAME
+from service.config import PORT, SERVICE_NAME, SERVING_MODE, WORKERS, THREADS
+from common.serving import serve_wsgi
+from common import codec
 
 app = Flask(__name__)
 app.register_blueprint(bp)
+lifecycle.init_app(app)  # /ready, /health and in-flight tracking
+metrics.init_app(app)    # /metrics and Server-Timing
+tracer.init_app(app)     # trace context and request spans
+codec.init_app(app)      # fast JSON for request.json and jsonify
+compressor.init_app(app) # Content-Encoding of large responses
 
 if __name__ == '__main__':
-    logger.info(f"Starting {SERVICE_NAME} on port {PORT}...")
-    app.run(host='0.0.0.0', port=PORT)
\ No newline at end of file
+    if SERVING_MODE == "production":
+        logger.info("Starting %s on port %s (%s workers x %s threads)...", SERVICE_NAME, PORT, WORKERS, THREADS)
+        serve_wsgi(app, PORT, workers=WORKERS, threads=THREADS, hooks=lifecycle.gunicorn_hooks())
+    else:
+        logger.info("Starting %s on port %s...", SERVICE_NAME, PORT)
+        lifecycle.run_dev(app, host='0.0.0.0', port=PORT)
\ No newline at end of file
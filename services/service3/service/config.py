@@ -7,5 +7,31 @@ SERVICE_NAME = service_cfg.get("name", "service3")
 PORT = service_cfg.get("port", 5005)  # default fallback if not set in .env
 LOG_LEVEL = service_cfg.get("log_level", "INFO")
 
+# Production serving
+SERVING_MODE = CONFIG["SERVING_MODE"]
+WORKERS = service_cfg.get("workers", "2")
+THREADS = service_cfg.get("threads", 4)
+DRAIN_TIMEOUT = service_cfg.get("drain_timeout", 10)
+
+# Dynamic micro-batching of single /process requests
+MICROBATCH = service_cfg.get("microbatch", False)
+MICROBATCH_MAX_SIZE = service_cfg.get("microbatch_max_size", 32)
+MICROBATCH_WAIT_MS = service_cfg.get("microbatch_wait_ms", 5)
+
+# Response compression (see common/compression.py)
+COMPRESSION = service_cfg.get("compression", "gzip")
+COMPRESSION_LEVEL = service_cfg.get("compression_level", 0)
+COMPRESSION_MIN_SIZE = service_cfg.get("compression_min_size", 1024)
+
+# Process pool for CPU-bound work (see common/compute.py)
+COMPUTE_WORKERS = service_cfg.get("compute_workers", "0")
+COMPUTE_SHM_MIN_BYTES = service_cfg.get("compute_shm_min_bytes", 65536)
+# A task still running when the gateway stops waiting for the answer is given up
+COMPUTE_TIMEOUT = service_cfg.get("read_timeout", 5)
+
+# Array persistence (see common/storage.py)
+ARRAY_FORMAT = service_cfg.get("array_format", "fast")
+ARRAY_FINGERPRINT = service_cfg.get("array_fingerprint", "mtime")
+
 # Use the global DATA_DIR from config
 DATA_DIR = CONFIG["DATA_DIR"]
\ No newline at end of file
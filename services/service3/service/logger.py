@@ -1,12 +1,10 @@
-import logging
-import sys
+from common.logs import setup_logging
 from service.config import LOG_LEVEL, SERVICE_NAME
 
-# Configure logging
-logging.basicConfig(
-    level=LOG_LEVEL,
-    format=f"%(asctime)s - {SERVICE_NAME} - %(levelname)s - %(message)s",
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
-
-logger = logging.getLogger(SERVICE_NAME)
\ No newline at end of file
+# Configure logging (records are written to stdout by a background thread)
+logger = setup_logging(
+    SERVICE_NAME,
+    LOG_LEVEL,
+    service=SERVICE_NAME,
+    fmt=f"%(asctime)s - {SERVICE_NAME} - %(levelname)s - %(message)s",
+)
\ No newline at end of file
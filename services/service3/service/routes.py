@@ -1,29 +1,166 @@
+import re
 from flask import Blueprint, request, jsonify
 from service.logger import logger
-from service.config import SERVICE_NAME
+from service.config import SERVICE_NAME, MICROBATCH, MICROBATCH_MAX_SIZE, MICROBATCH_WAIT_MS, DRAIN_TIMEOUT
+from service.config import COMPRESSION, COMPRESSION_LEVEL, COMPRESSION_MIN_SIZE
+from service.config import ARRAY_FORMAT, ARRAY_FINGERPRINT
+from service.config import COMPUTE_WORKERS, COMPUTE_SHM_MIN_BYTES, COMPUTE_TIMEOUT
+from common.batching import MicroBatcher
+from common.lifecycle import Lifecycle
+from common.metrics import ServiceMetrics
+from common.compression import Compressor
+from common.compute import ComputePool, ComputeTimeout
+from common.tracing import get_tracer
+from common.streaming import stream_response, stream_type
+from common.codec import payload_response, request_inputs, request_payload
+from common.logs import Payload
+from common.arrays import is_binary, array_from_request, array_response
+from common.objstore import ObjectNotFound, get_store
+from common.storage import get_storage, save_if_changed
 
 import os
-from PIL import Image
-import numpy as np
 
 import config
 
 bp = Blueprint('service', __name__)
 
-@bp.route('/process', methods=['POST'])
-def process():
+# Startup hooks and shared resources, loaded once per worker before it serves traffic
+lifecycle = Lifecycle(SERVICE_NAME, drain_timeout=DRAIN_TIMEOUT)
+
+# Request counts, latency and sizes on /metrics, plus a Server-Timing header
+metrics = ServiceMetrics(SERVICE_NAME)
+
+# Compression of large responses for callers that accept it (Accept-Encoding)
+compressor = Compressor(SERVICE_NAME, COMPRESSION, COMPRESSION_LEVEL, COMPRESSION_MIN_SIZE, registry=metrics.registry)
+
+# Worker processes for CPU-bound array work, so it does not hold the request threads' GIL
+compute = ComputePool(SERVICE_NAME, COMPUTE_WORKERS, COMPUTE_SHM_MIN_BYTES, COMPUTE_TIMEOUT,
+                      registry=metrics.registry)
+lifecycle.on_startup(compute.start)
+lifecycle.on_shutdown(compute.shutdown)
+
+# Spans for each request, its JSON parsing and the handler work
+tracer = get_tracer(SERVICE_NAME)
+
+storage = get_storage(ARRAY_FORMAT)
+
+@lifecycle.on_startup
+def convert_sample():
+    """Save sample.jpeg as an array; skipped while the image is unchanged."""
+    source = os.path.join(config.DATA_DIR, 'sample.jpeg')
+    target = os.path.join(config.DATA_DIR, 'sample' + storage.extension)
+
+    def load_image():
+        # Imported here: PIL and NumPy are only needed when the sample has changed.
+        from PIL import Image
+        import numpy as np
+
+        return np.array(Image.open(source))
+
+    save_if_changed(storage, source, target, load_image, method=ARRAY_FINGERPRINT)
+
+@tracer.traced()
+def handle_batch(inputs):
+    """Process a list of inputs in one call and return the list of outputs."""
+    logger.debug("Working directory: %s, DATA_DIR: %s", os.getcwd(), config.DATA_DIR)
+
+    # Shared by the whole batch; while sample.jpeg is unchanged this is two stat() calls, no lock.
+    convert_sample()
+
+    return [item.upper() for item in inputs]
+
+# Optional micro-batching stage: concurrent single requests are grouped into
+# one handle_batch call.
+batcher = MicroBatcher(handle_batch, MICROBATCH_MAX_SIZE, MICROBATCH_WAIT_MS) if MICROBATCH else None
+
+def handle(item):
+    """Process a single input, through the micro-batcher when enabled."""
+    if batcher is not None:
+        return batcher(item)
+    return handle_batch([item])[0]
+
+def handle_stream(item):
+    """Yield partial outputs for one input, word by word; joined they equal handle(item)."""
+    for token in re.findall(r"\S+\s*", item):
+        yield handle_batch([token])[0]
+
+@tracer.traced()
+@compute.task
+def handle_array(array):
+    """
+    Process a binary input; image bodies arrive already decoded into their pixel array.
+    Runs in the compute pool when COMPUTE_WORKERS is set.
+    """
+    return array
+
+def process_array():
     try:
-        data = request.json
-        result = {"service": SERVICE_NAME, "output": data.get("input", "").upper()}
+        array = array_from_request(request)
+        logger.info("Processed array input: shape=%s dtype=%s", array.shape, array.dtype)
+        return array_response(handle_array(array))
+    except ValueError as e:
+        logger.error("Invalid array input: %s", e)
+        return jsonify({"error": "Invalid array input"}), 400
+    except ComputeTimeout as e:
+        logger.error("Processing error: %s", e)
+        return jsonify({"error": "Processing timed out"}), 504
+    except Exception as e:
+        logger.error("Processing error: %s", e)
+        return jsonify({"error": "Internal server error"}), 500
 
-        print(os.listdir())
-        print(config.DATA_DIR)
+def process_ref(object_id):
+    """Process an array handed over by reference through the shared object store."""
+    store = get_store()
+    try:
+        array = store.open(object_id)  # memory-mapped, nothing is loaded up front
+    except ObjectNotFound:
+        logger.warning("Unknown input_ref: %s", object_id)
+        return jsonify({"error": "Unknown input_ref"}), 404
+    output_ref = store.put(handle_array(array))
+    logger.info("Processed input_ref %s -> %s", object_id, output_ref)
+    return payload_response({"service": SERVICE_NAME, "output_ref": output_ref})
 
-        img = Image.open(os.path.join(config.DATA_DIR, 'sample.jpeg'))
-        np.savez_compressed(os.path.join(config.DATA_DIR, 'sample.npz'), arr=np.array(img))
+@bp.route('/process', methods=['POST'])
+def process():
+    # Arrays and images arrive as raw bytes (see common/arrays.py), everything else as JSON.
+    if is_binary(request.mimetype):
+        return process_array()
+    try:
+        data = request_payload(request)
+        mimetype = stream_type(request.headers.get("Accept"))
+        if mimetype is not None:
+            logger.info("Streaming response for: %s", Payload(data))
+            return stream_response(handle_stream(data.get("input", "")), mimetype)
+        if "input_ref" in data:
+            return process_ref(data["input_ref"])
+        result = {"service": SERVICE_NAME, "output": handle(data.get("input", ""))}
+        logger.info("Processed request: %s", Payload(data))
+        return payload_response(result)
+    except ComputeTimeout as e:
+        logger.error("Processing error: %s", e)
+        return jsonify({"error": "Processing timed out"}), 504
+    except Exception as e:
+        logger.error("Processing error: %s", e)
+        return jsonify({"error": "Internal server error"}), 500
 
-        logger.info(f"Processed request: {data}")
-        return jsonify(result)
+@bp.route('/process/batch', methods=['POST'])
+def process_batch():
+    try:
+        inputs = request_inputs(request)
+        if inputs is None:
+            return jsonify({"error": "'inputs' must be a list"}), 400
+        result = {"service": SERVICE_NAME, "outputs": handle_batch(inputs)}
+        logger.info("Processed batch of %s inputs", len(inputs))
+        return payload_response(result)
     except Exception as e:
-        logger.error(f"Processing error: {str(e)}")
-        return jsonify({"error": "Internal server error"}), 500
\ No newline at end of file
+        logger.error("Processing error: %s", e)
+        return jsonify({"error": "Internal server error"}), 500
+
+@bp.route('/stats', methods=['GET'])
+def stats():
+    """Expose service runtime statistics (micro-batching, ...)."""
+    return jsonify({
+        "microbatch": batcher.stats() if batcher is not None else None,
+        "compression": compressor.stats(),
+        "compute": compute.stats(),
+    })
\ No newline at end of file
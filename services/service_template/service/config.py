@@ -2,4 +2,26 @@ import os
 
 SERVICE_NAME = os.getenv("SERVICE_NAME", "default_service")
 PORT = int(os.getenv("PORT", 5001))
-LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
\ No newline at end of file
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+# Production serving
+SERVING_MODE = os.getenv("SERVING_MODE", "development").lower()
+WORKERS = os.getenv("WORKERS", "2")
+THREADS = int(os.getenv("THREADS", 4))
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", 10))
+
+# Dynamic micro-batching of single /process requests
+MICROBATCH = os.getenv("MICROBATCH", "false").lower() == "true"
+MICROBATCH_MAX_SIZE = int(os.getenv("MICROBATCH_MAX_SIZE", 32))
+MICROBATCH_WAIT_MS = float(os.getenv("MICROBATCH_WAIT_MS", 5))
+
+# Response compression (see common/compression.py)
+COMPRESSION = os.getenv("COMPRESSION", "gzip").lower()
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", 0))
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+
+# Process pool for CPU-bound work (see common/compute.py)
+COMPUTE_WORKERS = os.getenv("COMPUTE_WORKERS", "0")
+COMPUTE_SHM_MIN_BYTES = int(os.getenv("COMPUTE_SHM_MIN_BYTES", 65536))
+# A task still running when the gateway stops waiting for the answer is given up
+COMPUTE_TIMEOUT = float(os.getenv("READ_TIMEOUT", 5))
\ No newline at end of file
@@ -1,46 +1,92 @@
 # start_local.py
+"""
+Start the gateway and every service locally.
+
+All processes are launched at once, then the script waits until each one
+answers its /ready probe (services report ready once their startup hooks have
+run). A process that crashes afterwards is restarted with an exponential
+backoff. Every process runs in its own process group, so stopping the script
+(CTRL+C or SIGTERM) also stops the workers and reloader children it spawned.
+"""
 import subprocess
 import time
 import sys
 import os
 import signal
-from typing import List, Dict
+import argparse
+import urllib.request
+from typing import List, Dict, Optional
 from config import CONFIG, DATA_DIR, ensure_data_dirs
 
+# Seconds between readiness probes while starting up
+PROBE_INTERVAL = 0.2
+# Restart delay after a crash; doubled after each crash, up to MAX_RESTART_BACKOFF
+RESTART_BACKOFF = 1.0
+MAX_RESTART_BACKOFF = 30.0
+# A process that stays up this long is considered healthy again (backoff reset)
+STABLE_AFTER = 30.0
+# Seconds a stopping process gets to drain before it is killed
+STOP_TIMEOUT = 15.0
+
 def build_gateway_dict() -> Dict[str, any]:
     """Return gateway configuration for local startup."""
+    port = CONFIG["GATEWAY_PORT"]
     return {
         "name": "gateway",
         "path": "gateway",
-        "port": CONFIG["GATEWAY_PORT"],
+        "port": port,
+        "ready_url": f"http://localhost:{port}/ready",
         "env_vars": {
-            "GATEWAY_PORT": str(CONFIG["GATEWAY_PORT"]),
+            "GATEWAY_PORT": str(port),
             "DOCKER_MODE": "false",  # For local mode, force false.
         },
     }
 
-def build_service_dict(service: str) -> Dict[str, any]:
-    """Return microservice configuration for local startup."""
+def build_service_dict(service: str, replica: int = 0) -> Dict[str, any]:
+    """Return microservice configuration for local startup (replicas use consecutive ports)."""
     cfg = CONFIG["SERVICE_CONFIG"].get(service, {})
+    port = cfg.get("port", 5000) + replica
     return {
-        "name": service,
+        "name": service if replica == 0 else f"{service}#{replica}",
+        "data_dir": service,
         "path": f"services/{service}",
-        "port": cfg.get("port", 5000),
+        "port": port,
+        "ready_url": f"http://localhost:{port}/ready",
         "env_vars": {
             f"{service.upper()}_NAME": cfg.get("name", service),
-            f"{service.upper()}_PORT": str(cfg.get("port", 5000)),
+            f"{service.upper()}_PORT": str(port),
         },
     }
 
-def load_services_from_config() -> List[Dict[str, any]]:
+def load_services_from_config(replicas: Dict[str, int]) -> List[Dict[str, any]]:
     """Build a list of service dictionaries for startup: gateway then microservices."""
     services = [build_gateway_dict()]
     for service in CONFIG["SERVICES_LIST"]:
-        services.append(build_service_dict(service))
+        if CONFIG["SERVICE_CONFIG"][service]["mode"] == "embedded":
+            print(f"🧩 {service} runs embedded in the gateway")
+            continue
+        for replica in range(replicas[service]):
+            services.append(build_service_dict(service, replica))
+    ports = {}
+    for svc in services:
+        if svc["port"] in ports:
+            sys.exit(f"❌ Port {svc['port']} is used by both {ports[svc['port']]} and {svc['name']}; "
+                     "space out the service ports to make room for the replicas.")
+        ports[svc["port"]] = svc["name"]
     return services
 
+def parse_replicas(values: List[str]) -> Dict[str, int]:
+    """Merge --replicas SERVICE=N overrides with the per-service `replicas` setting."""
+    replicas = {s: max(1, cfg.get("replicas", 1)) for s, cfg in CONFIG["SERVICE_CONFIG"].items()}
+    for value in values:
+        service, _, count = value.partition("=")
+        if service not in replicas or not count.isdigit() or int(count) < 1:
+            sys.exit(f"❌ Invalid --replicas value {value!r} (expected SERVICE=N for a configured service)")
+        replicas[service] = int(count)
+    return replicas
+
 def start_service(service: Dict[str, any]) -> subprocess.Popen:
-    """Start a service subprocess."""
+    """Start a service subprocess (without waiting for it to be ready)."""
     env = os.environ.copy()
     env.update(service["env_vars"])
     env["DATA_DIR"] = DATA_DIR
@@ -48,35 +94,146 @@ def start_service(service: Dict[str, any]) -> subprocess.Popen:
     # Add project root to PYTHONPATH so that "from config import CONFIG" works.
     env["PYTHONPATH"] = CONFIG["BASE_DIR"]
     print(f"🚀 Starting {service['name']} on port {service['port']} (local)...")
-    proc = subprocess.Popen(
+    return subprocess.Popen(
         [sys.executable, "app.py"],
         cwd=service["path"],
         env=env,
         stdout=None,   # let output go to the console
         stderr=None,
         text=True,
+        start_new_session=True,  # own process group: stopped together with its children
     )
-    time.sleep(2)  # Give the process time to start up
-    return proc
 
-def stop_services(*args) -> None:
-    print("\n⛔ Stopping all services...")
-    for p in processes:
-        p.terminate()
-    sys.exit(0)
+def is_ready(url: str) -> bool:
+    """Probe a /ready endpoint; anything but a 200 answer means not ready yet."""
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status == 200
+    except OSError:  # connection refused, 503 while starting, timeouts
+        return False
+
+def signal_group(proc: subprocess.Popen, signum: int) -> None:
+    try:
+        os.killpg(proc.pid, signum)
+    except ProcessLookupError:
+        pass
+
+class Supervisor:
+    """Run the local processes: parallel start, readiness wait, restarts and shutdown."""
+
+    def __init__(self, services: List[Dict[str, any]], restart: bool = True):
+        self.services = services
+        self.restart = restart
+        self.processes: Dict[str, Optional[subprocess.Popen]] = {}
+        self.started: Dict[str, float] = {}
+        self.backoff = {svc["name"]: RESTART_BACKOFF for svc in services}
+        self.restart_at: Dict[str, float] = {}
+
+    def start(self, service: Dict[str, any]) -> None:
+        self.processes[service["name"]] = start_service(service)
+        self.started[service["name"]] = time.monotonic()
+
+    def start_all(self) -> None:
+        for svc in self.services:
+            self.start(svc)
+
+    def wait_ready(self, timeout: float) -> bool:
+        """Wait until every process answers its readiness probe; False on a crash or timeout."""
+        started = time.monotonic()
+        pending = list(self.services)
+        while pending:
+            for svc in list(pending):
+                code = self.processes[svc["name"]].poll()
+                if code is not None:
+                    print(f"❌ {svc['name']} exited during startup (code {code})")
+                    return False
+                if is_ready(svc["ready_url"]):
+                    print(f"✅ {svc['name']} ready on port {svc['port']} ({time.monotonic() - started:.1f}s)")
+                    pending.remove(svc)
+            if pending and time.monotonic() - started > timeout:
+                print(f"❌ Not ready after {timeout:.0f}s: {', '.join(svc['name'] for svc in pending)}")
+                return False
+            time.sleep(PROBE_INTERVAL)
+        return True
+
+    def check(self) -> None:
+        """Restart crashed processes once their backoff delay has passed."""
+        now = time.monotonic()
+        for svc in self.services:
+            name = svc["name"]
+            proc = self.processes[name]
+            if proc is None:
+                if now >= self.restart_at[name]:
+                    self.start(svc)
+                continue
+            code = proc.poll()
+            if code is None:
+                if now - self.started[name] > STABLE_AFTER:
+                    self.backoff[name] = RESTART_BACKOFF
+                continue
+            signal_group(proc, signal.SIGKILL)  # leftover workers would hold the port
+            if not self.restart:
+                sys.exit(f"❌ {name} exited (code {code})")
+            delay = self.backoff[name]
+            print(f"💥 {name} exited (code {code}); restarting in {delay:.0f}s...")
+            self.processes[name] = None
+            self.restart_at[name] = now + delay
+            self.backoff[name] = min(delay * 2, MAX_RESTART_BACKOFF)
+
+    def stop(self) -> None:
+        """Ask every process group to drain (SIGTERM), then kill what is left."""
+        running = [p for p in self.processes.values() if p is not None and p.poll() is None]
+        for proc in running:
+            signal_group(proc, signal.SIGTERM)
+        deadline = time.monotonic() + STOP_TIMEOUT
+        for proc in running:
+            try:
+                proc.wait(timeout=max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                pass
+            signal_group(proc, signal.SIGKILL)  # also reaps workers the parent left behind
+
+def stop_services(signum, frame) -> None:
+    raise SystemExit(0)
 
 if __name__ == "__main__":
-    print("🚀 Starting API Hub Locally...\n")
-    SERVICES = load_services_from_config()
-    # Ensure data directories exist for each service
-    ensure_data_dirs([s["name"] for s in SERVICES])
-    
-    processes = []
-    for svc in SERVICES:
-        proc = start_service(svc)
-        processes.append(proc)
-    
+    parser = argparse.ArgumentParser(description="Start the API Hub gateway and services locally.")
+    parser.add_argument("--mode", choices=["development", "production"], default=CONFIG["SERVING_MODE"],
+                        help="Serving mode (defaults to SERVING_MODE from config.py)")
+    parser.add_argument("--replicas", action="append", default=[], metavar="SERVICE=N",
+                        help="Run N replicas of a service on consecutive ports (repeatable)")
+    parser.add_argument("--startup-timeout", type=float, default=60.0,
+                        help="Seconds to wait for every process to be ready (default 60)")
+    parser.add_argument("--no-restart", action="store_true",
+                        help="Stop everything when a process crashes instead of restarting it")
+    args = parser.parse_args()
+    sys.stdout.reconfigure(line_buffering=True)  # progress lines show up at once, even through a pipe
+    os.environ["SERVING_MODE"] = args.mode
+    replicas = parse_replicas(args.replicas)
+    # The gateway reads the replica counts from the environment to find every endpoint.
+    for service, count in replicas.items():
+        os.environ[f"{service.upper()}_REPLICAS"] = str(count)
+
+    print(f"🚀 Starting API Hub Locally ({args.mode} mode)...\n")
+    SERVICES = load_services_from_config(replicas)
+    # Ensure data directories exist for each service (embedded ones included)
+    ensure_data_dirs(sorted({s.get("data_dir", s["name"]) for s in SERVICES} | set(CONFIG["SERVICES_LIST"])))
+
+    supervisor = Supervisor(SERVICES, restart=not args.no_restart)
+    # Installed before anything starts, so an early CTRL+C still stops what was started.
     signal.signal(signal.SIGINT, stop_services)
-    print("\n✅ All services are running locally. Press CTRL+C to stop.")
-    while True:
-        time.sleep(1)
\ No newline at end of file
+    signal.signal(signal.SIGTERM, stop_services)
+    try:
+        started = time.monotonic()
+        supervisor.start_all()
+        if not supervisor.wait_ready(args.startup_timeout):
+            sys.exit(1)
+        print(f"\n✅ All services are ready ({time.monotonic() - started:.1f}s). Press CTRL+C to stop.")
+        while True:
+            time.sleep(1)
+            supervisor.check()
+    finally:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        print("\n⛔ Stopping all services...")
+        supervisor.stop()
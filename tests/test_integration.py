@@ -3,14 +3,17 @@ import time
 import signal
 import subprocess
 import sys
+import threading
 import requests
 import pytest
 
 # We'll import your APIClient to test
-from client.api_client import APIClient
+from client.api_client import APIClient, ServiceNotFound
 
 # Provide up to 2 minutes for environment spin-up
 MAX_WAIT = 5
+# start_local.py waits on every process's readiness probe itself
+LOCAL_STARTUP_TIMEOUT = 60
 
 @pytest.fixture(params=["local", "docker"])
 def environment(request):
@@ -20,10 +23,10 @@ def environment(request):
         proc = subprocess.Popen(
             [os.sys.executable, "start_local.py"],
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
             text=True
         )
-        wait_for_gateway(port=5001)
+        wait_for_local_stack(proc)
         yield mode
         print("\n=== Tearing down LOCAL environment... ===")
         proc.send_signal(signal.SIGINT)
@@ -38,6 +41,28 @@ def environment(request):
         subprocess.run(["docker", "compose", "down"], check=True)
 
 
+def wait_for_local_stack(proc):
+    """
+    Wait until start_local.py reports that the gateway and every service are ready.
+    Its output keeps being read in the background so the pipe never fills up.
+    """
+    ready = threading.Event()
+
+    def drain():
+        for line in proc.stdout:
+            if "All services are ready" in line:
+                ready.set()
+
+    threading.Thread(target=drain, daemon=True).start()
+    start_time = time.time()
+    while not ready.wait(0.5):
+        if proc.poll() is not None:
+            raise RuntimeError(f"start_local.py exited before the stack was ready (code {proc.returncode}).")
+        if time.time() - start_time > LOCAL_STARTUP_TIMEOUT:
+            raise RuntimeError(f"Local stack not ready after {LOCAL_STARTUP_TIMEOUT} seconds.")
+    print(f"Local stack ready after {time.time() - start_time:.1f}s")
+
+
 def wait_for_gateway(port):
     """
     Repeatedly calls the gateway endpoint until a valid response is received.
@@ -65,9 +90,11 @@ def wait_for_gateway(port):
 def client():
     """
     Return a client pointing to the gateway at localhost:5001.
-    Same config in local and docker mode.
+    Same config in local and docker mode. It is closed before the environment
+    is torn down, so no idle keep-alive connection holds up the gateway's exit.
     """
-    return APIClient(gateway_url="http://localhost:5001")
+    with APIClient(gateway_url="http://localhost:5001") as client:
+        yield client
 
 
 def test_service1(environment, client):
@@ -98,11 +125,138 @@ def test_service2(environment, client):
     assert resp["output"] == "WORLD"
 
 
+def test_service1_batch(environment, client):
+    """
+    Test calling service1's batch endpoint with more inputs than one chunk.
+    environment -> "local" or "docker"
+    client -> calls http://localhost:5001
+    """
+    inputs = [f"item{i}" for i in range(5)]
+    resp = client.call_service_batch("service1", inputs, batch_size=2)
+    # We expect {"service": "service1", "outputs": ["ITEM0", ..., "ITEM4"]}
+    assert "outputs" in resp, f"No 'outputs' key in response: {resp}"
+    assert resp["outputs"] == [i.upper() for i in inputs]
+
+
+def test_latency_breakdown(environment, client):
+    """
+    Test that the gateway reports per-hop timing for a routed request.
+    environment -> "local" or "docker"
+    client -> calls http://localhost:5001
+    """
+    client.call_service("service1", "Hello")
+    timing = client.last_timing
+    # The gateway's Server-Timing header splits its total into phases.
+    for phase in ("total", "gateway", "upstream", "service"):
+        assert phase in timing, f"No '{phase}' phase in timing: {timing}"
+    assert timing["client"] >= timing["total"] >= timing["service"]
+
+
+def test_trace_propagation(environment, client):
+    """
+    Test that the gateway continues the caller's trace.
+    environment -> "local" or "docker"
+    client -> calls http://localhost:5001
+    """
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    response = requests.post(
+        "http://localhost:5001/route/service1",
+        json={"input": "Hello"},
+        headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-00"},
+        timeout=5,
+    )
+    assert response.status_code == 200
+    assert response.headers.get("X-Trace-Id") == trace_id
+
+
 def test_unknown_service(environment, client):
     """
-    Test calling an unknown service, expecting error -> 404 from gateway, 
-    which your client interprets as {"error": "Service unavailable"}.
+    Test calling an unknown service, expecting error -> 404 from gateway,
+    which the client raises as ServiceNotFound.
+    """
+    with pytest.raises(ServiceNotFound) as excinfo:
+        client.call_service("no_such_service", "???")
+    assert excinfo.value.status == 404
+
+
+def test_map(environment, client):
     """
-    resp = client.call_service("no_such_service", "???")
-    assert "error" in resp, "Expected 'error' key for unknown service"
-    assert resp["error"] == "Service unavailable"
\ No newline at end of file
+    Test sending many inputs with bounded concurrency, in input order.
+    """
+    inputs = [f"item {i}" for i in range(20)]
+    outputs = list(client.map("service1", inputs, concurrency=4))
+    assert outputs == [item.upper() for item in inputs]
+
+
+def test_stream(environment, client):
+    """
+    Test consuming a streamed response, chunk by chunk, through the gateway.
+    """
+    chunks = list(client.stream("service1", "hello streaming world"))
+    assert len(chunks) == 3
+    assert "".join(chunks) == "HELLO STREAMING WORLD"
+
+
+def test_job(environment, client):
+    """
+    Test queueing an asynchronous job through the gateway and long-polling its result.
+    """
+    job_id = client.submit_job("service1", "Hello")
+    result = client.wait_job(job_id, timeout=30)
+    assert result["output"] == "HELLO"
+
+
+def test_compression(environment, client):
+    """
+    Test that a large answer is relayed compressed by the gateway and decoded by the client.
+    """
+    text = "compress me " * 500
+    response = requests.post(f"{client.gateway_url}/route/service1", json={"input": text},
+                             headers={"Accept-Encoding": "gzip"})
+    assert response.headers.get("Content-Encoding") == "gzip"
+    assert response.json()["output"] == text.upper()
+    assert client.call_service("service1", text)["output"] == text.upper()
+
+
+def test_compute_array(environment, client):
+    """
+    Test a large array through service3, whose array work runs in its compute pool.
+    """
+    import numpy as np
+
+    array = np.arange(512 * 512, dtype=np.float32).reshape(512, 512)
+    assert np.array_equal(client.call_service_array("service3", array), array)
+
+
+def test_array_bad_dtype(environment, client):
+    """
+    Test that a raw array with an invalid or object dtype is rejected with a 400.
+    """
+    for dtype in ("not-a-dtype", "object"):
+        response = requests.post(f"{client.gateway_url}/route/service3", data=b"\x00" * 16,
+                                 headers={"Content-Type": "application/octet-stream", "X-Array-Dtype": dtype})
+        assert response.status_code == 400
+
+
+def test_job_recover_gives_up(tmp_path):
+    """
+    Test that a job whose worker process died on its last attempt fails with a status code.
+    """
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gateway"))
+    from gateway.jobs import MAX_ATTEMPTS, JobStore
+
+    store = JobStore(str(tmp_path))
+    record = store.submit("service1", "", b'{"input": "x"}', {})
+    record, entry = store.claim()
+    record.update(status="running", attempts=MAX_ATTEMPTS)
+    store.save(record)
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    os.rename(entry, f"{entry.rsplit('.', 1)[0]}.{dead.pid}")
+
+    store.recover()
+    record = store.load(record["id"])
+    assert record["status"] == "failed"
+    assert record["status_code"] == 503
+    assert record["result"] == {"error": "Worker died while running the job"}
+    assert store.depth() == {"queued": 0, "running": 0}